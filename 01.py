@@ -12,6 +12,8 @@ import warnings
 import pandas as pd
 from fyers_apiv3 import fyersModel
 import pandas_ta as ta
+from candle_utils import candles_to_dataframe
+from history_downloader import download_history
 
 # Suppress warnings for cleaner output
 warnings.filterwarnings('ignore')
@@ -107,9 +109,7 @@ def strategy(ticker):
     }
 
     candle_data = fyers.history(data=data)
-    data = pd.DataFrame(candle_data['candles'],columns=['date','open','high','low','close','volume'])
-    data['date'] = data["date"].apply(pd.Timestamp,unit='s',tzinfo = pytz.timezone('Asia/Kolkata'))
-    data = data.sort_values(by='date')
+    data = candles_to_dataframe(candle_data['candles'], set_index=False)
     print(data)
 
 
@@ -120,35 +120,21 @@ def strategy(ticker):
 def fetchOHLC(ticker,interval,duration):
     """extracts historical data and outputs in the form of dataframe"""
     instrument = ticker
-    data = {"symbol":instrument,"resolution":interval,"date_format":"1","range_from":datetime.date.today()-datetime.timedelta(duration),"range_to":datetime.date.today(),"cont_flag":"1"}
+    data = {"symbol":instrument,"resolution":interval,"date_format":"1","range_from":str((datetime.now() - timedelta(days=duration)).date()),"range_to":str(datetime.now().date()),"cont_flag":"1"}
     sdata=fyers.history(data)
     # print(sdata)
-    sdata=pd.DataFrame(sdata['candles'])
-    sdata.columns=['date','open','high','low','close','volume']
-    sdata['date']=pd.to_datetime(sdata['date'], unit='s')
-    sdata.date=(sdata.date.dt.tz_localize('UTC').dt.tz_convert('Asia/Kolkata'))
-    sdata['date'] = sdata['date'].dt.tz_localize(None)
-    sdata=sdata.set_index('date')
+    sdata=candles_to_dataframe(sdata['candles'])
+    sdata.index=sdata.index.tz_localize(None)
     return sdata
 
 
 def gethistory(symbol1,type,duration):
+    """Downloads `duration` days of 1-minute history in parallel 100-day windows"""
     symbol="NSE:"+symbol1+"-"+type
-    start=datetime.date.today()-datetime.timedelta(duration)
-    end=datetime.date.today()-datetime.timedelta()
-    sdata=pd.DataFrame()
-    while start <= end:
-        end2=start+datetime.timedelta(60)
-        data = {"symbol":symbol,"resolution":"1","date_format":"1","range_from":start,"range_to":end2,"cont_flag":"1"}
-        s=fyers.history(data)
-        s=pd.DataFrame(s['candles'])
-        sdata=pd.concat([sdata,s],ignore_index=True)
-        start=end2+datetime.timedelta(1)
-    sdata.columns=['date','open','high','low','close','volume']
-    sdata["date"]=pd.to_datetime(sdata['date'], unit='s')
-    sdata.date=(sdata.date.dt.tz_localize('UTC').dt.tz_convert('Asia/Kolkata'))
-    sdata['date'] = sdata['date'].dt.tz_localize(None)
-    sdata=sdata.set_index('date')
+    end=datetime.now().date()
+    start=end-timedelta(days=duration)
+    sdata=download_history(fyers, symbol, start, end, resolution="1")
+    sdata.index=sdata.index.tz_localize(None)
     return sdata
 
 ###########################################
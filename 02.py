@@ -1,4 +1,7 @@
 from config_utils import load_config,read_auth_tokens
+from token_manager import TokenManager
+from candle_utils import candles_to_dataframe
+from symbol_master import SymbolMaster
 
 import os
 import pytz
@@ -36,12 +39,10 @@ def doLogin():
         token = config['fyers']['token']
         pin = config['fyers']['pin']
 
-        auth_code, access_token = read_auth_tokens()
-        # Step 8: Initialize FyersModel and fetch profile
-        fyers = fyersModel.FyersModel(client_id=client_id, is_async=False, token=access_token, log_path=os.getcwd())
-
-        profile = fyers.get_profile()
-        print("Fyers Profile : ", profile)
+        # Step 8: FyersModel from the cached token, refreshed in the background before expiry
+        token_manager = TokenManager(config)
+        token_manager.start_auto_refresh()
+        fyers = token_manager.get_fyers()
 
 
 import pandas as pd
@@ -80,20 +81,26 @@ def fetch_candle_data(ticker, start_date, end_date):
 # Function to process the raw candle data into a DataFrame
 def process_candle_data(candle_data):
     try:
-        data = pd.DataFrame(candle_data, columns=['date', 'open', 'high', 'low', 'close', 'volume'])
-        # Convert Unix timestamp to timezone-aware datetime
-        data['date'] = data["date"].apply(pd.Timestamp, unit='s', tzinfo=pytz.timezone('Asia/Kolkata'))
-        # Sort data by the date
-        data = data.sort_values(by='date')
+        # Vectorized conversion of Unix timestamps to timezone-aware datetimes, sorted by date
+        data = candles_to_dataframe(candle_data, set_index=False)
         return data
     except Exception as e:
         print(f"Error in processing candle data: {e}")
         raise
 
 # Function to construct the ticker string
-def construct_ticker(exchange, symbol, sec_type):
+def construct_ticker(exchange, symbol, sec_type, master=None):
     try:
-        return f"{exchange}:{symbol}-{sec_type}"
+        ticker = f"{exchange}:{symbol}-{sec_type}"
+        # Checked against the Fyers symbol master when one is given and available;
+        # offline without a cached copy the ticker is used unchecked
+        if master is not None:
+            index = master.index or master.load()
+            if len(index):
+                master.validate(ticker)
+            else:
+                print(f"Symbol master unavailable, {ticker} not checked")
+        return ticker
     except Exception as e:
         print(f"Error in constructing ticker: {e}")
         raise
@@ -106,7 +113,7 @@ def main():
         symbol = "NIFTYBANK"  # Example: SBIN, TCS, NIFTYBANK
 
         # Construct ticker
-        ticker = construct_ticker(exchange, symbol, sec_type)
+        ticker = construct_ticker(exchange, symbol, sec_type, master=SymbolMaster(segments=("NSE_CM",)))
         print(f"Ticker: {ticker}")
 
         # Get date range for the last 2 days
@@ -1,5 +1,8 @@
 from config_utils import load_config,read_auth_tokens
+from token_manager import TokenManager
 from broker_utils import send_message_to_telegram
+from market_data import CandleCache
+from rate_limiter import ScheduledFyers
 
 import sys
 import os
@@ -30,6 +33,7 @@ pd.set_option('display.max_columns', None)
 
 # Add fyers as a global variable
 fyers = None
+candle_cache = None
 
 def Config_reading():
     print("Reading Config file...\n")
@@ -61,12 +65,10 @@ def Config_reading():
             print(f"Error reading the config file: {exc}")
             sys.exit(1)  # Exit on YAML parsing error
 
-# Call the config reading function
-Config_reading()
 
 
 def doLogin():
-        global fyers
+        global fyers, candle_cache
         # Step 1: Load config
         config = load_config()
 
@@ -78,36 +80,17 @@ def doLogin():
         token = config['fyers']['token']
         pin = config['fyers']['pin']
 
-        auth_code, access_token = read_auth_tokens()
-        # Step 8: Initialize FyersModel and fetch profile
-        fyers = fyersModel.FyersModel(client_id=client_id, is_async=False, token=access_token, log_path=os.getcwd())
-
-        profile = fyers.get_profile()
-        print("Fyers Profile : ", profile)
+        # Step 8: FyersModel from the cached token, refreshed in the background before expiry
+        token_manager = TokenManager(config)
+        token_manager.start_auto_refresh()
+        fyers = ScheduledFyers(token_manager.get_fyers())
+        candle_cache = CandleCache(fyers)
 
 
 def fetchOHLC(ticker,interval,duration):
     """extracts historical data and outputs in the form of dataframe"""
-    instrument = ticker
-
-    data = {
-                "symbol":instrument,#"NSE:SBIN-EQ",
-                "resolution":interval,#"1",
-                "date_format":"1",
-                "range_from":str((datetime.now() - timedelta(days=duration)).date()),
-                "range_to":str(datetime.now().date()),
-                "cont_flag":"1",
-                'oi_flag':"1"
-            }
-    candle_data = fyers.history(data=data)
-    data = pd.DataFrame(candle_data['candles'],columns=['date','open','high','low','close','volume'])
-    #data['date']=pd.to_datetime(data['date'], unit='s')
-    #sdata.date=(sdata.date.dt.tz_localize('UTC').dt.tz_convert('Asia/Kolkata'))
-    #sdata['date'] = sdata['date'].dt.tz_localize(None)
-    data['date'] = data["date"].apply(pd.Timestamp,unit='s',tzinfo = timezone('Asia/Kolkata'))
-    data=data.set_index('date')
-    #data = data.sort_values(by='date')
-    return data
+    # Only the bars after the last cached candle are requested from Fyers
+    return candle_cache.get_ohlc(ticker, interval, duration)
 
 #data=fetchOHLC(ticker="NSE:SBIN-EQ",interval='1',duration=5)
     
@@ -133,6 +116,9 @@ def strategy():
 
 if __name__ == "__main__":
 
+    # Call the config reading function
+    Config_reading()
+
     doLogin()
 
     # Send message to Telegram
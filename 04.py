@@ -1,5 +1,19 @@
 from config_utils import load_config, read_auth_tokens
-from broker_utils import send_message_to_telegram
+from token_manager import TokenManager
+from broker_utils import TelegramNotifier
+from http_utils import install_fyers_transport
+from rate_limiter import ScheduledFyers
+from market_data import CandleCache, RESOLUTION_SECONDS
+from history_store import HistoryStore
+from streaming_indicators import EmaCrossoverEngine
+from market_feed import FyersFeed
+from ring_buffer import RingBufferAggregator
+from tick_recorder import TickRecorder
+from order_manager import OrderManager
+from market_clock import MarketClock
+from strategy_runtime import EmaCrossoverStrategy, StrategyRuntime
+from metrics import start_exporters, timer
+from log_utils import setup_logging
 
 import sys
 import os
@@ -12,14 +26,13 @@ import yaml
 from urllib.parse import parse_qs, urlparse
 
 from datetime import datetime, timedelta
-from time import sleep
+from time import sleep, perf_counter
 
 import warnings
 
 import pandas as pd
-import pandas_ta as ta
 
-from logzero import logger, logfile
+from logzero import logger
 from fyers_apiv3 import fyersModel
 
 # Suppress warnings for cleaner output
@@ -28,20 +41,27 @@ pd.set_option('display.max_columns', None)
 
 # Set up logger
 def setup_logger():
-    logfile("fyers_strategy.log")  # Log file name
+    # JSON lines, written by a background thread so logging never blocks the strategy;
+    # per-bar debug lines are sampled
+    setup_logging("fyers_strategy.log", sample_every=20)
     logger.info("Logger is initialized.")
 
-setup_logger()
-
 # Add fyers as a global variable
 fyers = None
-
-def Config_reading():
+client_id = None
+access_token = None
+candle_cache = None
+notifier = None
+order_manager = None
+trading_config = {}
+market_clock = None
+metrics_exporter = None
+ema_engine = EmaCrossoverEngine(short_length=3, long_length=30)
+
+def Config_reading(config_path='Config.yaml'):
     logger.info("Reading Config file...")
     global userid
-    global TelegramBotCredential, ReceiverTelegramID
-
-    config_path = 'Config.yaml'
+    global TelegramBotCredential, ReceiverTelegramID, trading_config, market_clock, metrics_exporter
 
     if not os.path.exists(config_path):
         logger.error(f"Config file not found at {config_path}")
@@ -55,6 +75,14 @@ def Config_reading():
             userid = databaseConfig.get('userid', None)            
             TelegramBotCredential = databaseConfig['Telegram']['TelegramBotCredential']
             ReceiverTelegramID = databaseConfig['Telegram']['Chat_Id']
+            # Optional: trading: {enabled: true, symbol: NSE:BANKNIFTY24JUNFUT, quantity: 15,
+            #                   product_type: INTRADAY, long_only: false, sync_interval: 300}
+            # `symbol` is what gets traded, the index ticker is only the data feed
+            trading_config = databaseConfig.get('trading') or {}
+            # Optional: market: {holidays: [YYYY-MM-DD, ...], grace: 1.0}
+            market_clock = MarketClock.from_config(databaseConfig)
+            # Optional: metrics: {port: 9102, json_path: metrics.json, interval: 60}
+            metrics_exporter = start_exporters(databaseConfig)
 
             if userid is None:
                 logger.error("'userid' not found in the config file.")
@@ -64,16 +92,14 @@ def Config_reading():
             logger.error(f"Error reading the config file: {exc}")
             sys.exit(1)  # Exit on YAML parsing error
 
-# Call the config reading function
-Config_reading()
 
-def doLogin():
-    global fyers
+def doLogin(config_path='Config.yaml'):
+    global fyers, candle_cache, client_id, access_token
     try:
         logger.info("Starting Fyers login...")
 
         # Step 1: Load config
-        config = load_config()
+        config = load_config(config_path)
 
         # Extract sensitive data from config
         username = config['fyers']['username']
@@ -83,13 +109,18 @@ def doLogin():
         token = config['fyers']['token']
         pin = config['fyers']['pin']
 
-        auth_code, access_token = read_auth_tokens()
+        # Step 8: FyersModel over the pooled HTTP session from the cached token,
+        # refreshed in the background before it expires. Every call goes through
+        # the shared request scheduler so orders are never starved by data calls.
+        install_fyers_transport()
+        token_manager = TokenManager(config)
+        token_manager.start_auto_refresh()
+        fyers = ScheduledFyers(token_manager.get_fyers())
+        access_token = token_manager.access_token
 
-        # Step 8: Initialize FyersModel and fetch profile
-        fyers = fyersModel.FyersModel(client_id=client_id, is_async=False, token=access_token, log_path=os.getcwd())
-
-        profile = fyers.get_profile()
-        logger.info(f"Fyers Profile: {profile}")
+        # Previous sessions are read from the on-disk store, only today's bars hit the API
+        candle_cache = CandleCache(fyers, store=HistoryStore())
+        logger.info("Fyers client ready.")
 
     except Exception as e:
         logger.error(f"Error during Fyers login: {e}")
@@ -98,89 +129,144 @@ def doLogin():
 def fetchOHLC(ticker, interval, duration):
     """Extracts historical data and outputs it in the form of a DataFrame"""
     try:
-        logger.info(f"Fetching OHLC data for {ticker} with interval {interval} and duration {duration} days...")
-
-        data = {
-            "symbol": ticker,
-            "resolution": interval,
-            "date_format": "1",
-            "range_from": str((datetime.now() - timedelta(days=duration)).date()),
-            "range_to": str(datetime.now().date()),
-            "cont_flag": "1",
-            'oi_flag': "1"
-        }
-
-        candle_data = fyers.history(data=data)
-        if 'candles' not in candle_data:
-            logger.error("No candles data received from Fyers API.")
-            return pd.DataFrame()
-
-        data = pd.DataFrame(candle_data['candles'], columns=['date', 'open', 'high', 'low', 'close', 'volume'])
-        data['date'] = data["date"].apply(pd.Timestamp, unit='s', tzinfo=timezone('Asia/Kolkata'))
-        data = data.set_index('date')
-
-        logger.info(f"Successfully fetched OHLC data for {ticker}.")
+        logger.debug("Fetching OHLC data for %s with interval %s and duration %s days...", ticker, interval, duration)
+
+        # Only the bars after the last cached candle are requested from Fyers
+        data = candle_cache.get_ohlc(ticker, interval, duration)
+
+        logger.debug("Fetched %d bars for %s.", len(data), ticker)
         return data
 
     except Exception as e:
         logger.error(f"Error fetching OHLC data: {e}")
         return pd.DataFrame()
 
-def strategy():
+def create_order_manager(ticker="NSE:NIFTYBANK-INDEX"):
+    """OrderManager from the trading config, trading trading.symbol on signals computed on `ticker`"""
+    trade_symbol = trading_config.get('symbol')
+    if not trade_symbol:
+        logger.error("trading.symbol must name the instrument to trade, e.g. the current BANKNIFTY future.")
+        sys.exit(1)
+    manager = OrderManager(fyers, quantity=trading_config.get('quantity', 1),
+                           product_type=trading_config.get('product_type', "INTRADAY"),
+                           long_only=trading_config.get('long_only', False), symbol_map={ticker: trade_symbol})
+    logger.info(f"Order placement enabled: {ticker} signals trade {trade_symbol} ({trading_config})")
+    return manager
+
+def on_signal_event(event):
+    """Acts on a crossover: the order goes out first, logging and Telegram come after"""
+    signal_time = perf_counter()
+    order = order_manager.on_signal(event, signal_time=signal_time) if order_manager is not None else None
+    logger.info(f"EMA crossover signal: {event}")
+    message = f"{event['symbol']} EMA crossover: signal {event['signal']} at {event['close']}"
+    if order is not None:
+        message += f", order {order['id']} {order['side'] * order['qty']} ({order['latency'] * 1000:.0f} ms)"
+    notifier.send(message)
+
+def strategy(ticker="NSE:NIFTYBANK-INDEX", interval='5'):
     logger.info("##### Inside Strategy #####")
+    last_bar_time = None
+    clock = market_clock or MarketClock()
+    bar_length = pd.Timedelta(seconds=RESOLUTION_SECONDS[interval])
+    # Broker positions are compared with the local ones every sync_interval seconds
+    sync_interval = trading_config.get('sync_interval', 300)
+    last_sync = perf_counter()
 
     while True:
         try:
-            logger.debug("Inside strategy loop.")
-
-            # Print current time
-            current_time = datetime.now(timezone("Asia/Kolkata")).time()
-            logger.info(f"Current Time: {current_time}")
-
-            data = fetchOHLC(ticker="NSE:NIFTYBANK-INDEX", interval='5', duration=5)
-            if data.empty:
-                logger.warning("No data received for strategy evaluation.")
-            else:
-                data = ema_crossover_strategy(data)
-                logger.debug(f"Data with EMA Strategy:{data.tail(5)}")
-                #logger.debug(f"Data for strategy:{data}")
-
-            sleep(10)
+            logger.debug("Current Time: %s", datetime.now(timezone("Asia/Kolkata")).time())
+
+            # Each phase of the iteration is timed into strategy_loop_seconds{phase=...}
+            with timer("strategy_loop_seconds", phase="total"):
+                with timer("strategy_loop_seconds", phase="fetch"):
+                    data = fetchOHLC(ticker=ticker, interval=interval, duration=5)
+                if data.empty:
+                    logger.warning("No data received for strategy evaluation.")
+                else:
+                    with timer("strategy_loop_seconds", phase="evaluate"):
+                        # Only bars that have ended are traded, as in the stream and runtime paths;
+                        # each closed bar goes through the O(1) EMA update exactly once
+                        closed = data[data.index + bar_length <= pd.Timestamp.now(tz='Asia/Kolkata')]
+                        new_bars = closed if last_bar_time is None else closed[closed.index > last_bar_time]
+                        for bar_time, close in zip(new_bars.index, new_bars['close'].to_numpy()):
+                            event = ema_engine.on_bar(ticker, bar_time, close, closed=True)
+                            # The first batch only warms the EMAs up
+                            if event and last_bar_time is not None:
+                                on_signal_event(event)
+                        if not closed.empty:
+                            last_bar_time = closed.index[-1]
+
+                    if order_manager is not None:
+                        # Only trades not seen before are applied, rejected orders are released
+                        with timer("strategy_loop_seconds", phase="reconcile"):
+                            order_manager.reconcile()
+                            if perf_counter() - last_sync >= sync_interval:
+                                order_manager.sync_positions()
+                                last_sync = perf_counter()
+
+                logger.debug("EMA Short: %s, EMA Long: %s, Signal: %s", *ema_engine.values(ticker))
+
+            # One fetch per bar: sleep until it closes on the exchange, idle outside market hours
+            clock.wait_for_bar_close([interval])
 
         except Exception as e:
             logger.error(f"Error in strategy execution: {e}")
 
+def stream_strategy(ticker="NSE:NIFTYBANK-INDEX", interval='5', record_path=None):
+    """Runs the EMA crossover on bars built from the Fyers data socket, optionally recording every tick"""
+    logger.info("##### Inside Streaming Strategy #####")
 
-def ema_crossover_strategy(data):
-    """Implements EMA Crossover Strategy"""
-    logger.info("Calculating EMA Crossover Strategy.")
-    try:
-        # Calculate EMAs
-        data['EMA_Short'] = ta.ema(data['close'], length=3)
-        data['EMA_Long'] = ta.ema(data['close'], length=30)
+    # Seed the EMAs with history so the first live bar already has a signal
+    data = fetchOHLC(ticker=ticker, interval=interval, duration=5)
+    if not data.empty:
+        ema_engine.warm_up(ticker, data)
 
-        # Generate signals
-        data['Signal'] = 0
-        data.loc[data['EMA_Short'] > data['EMA_Long'], 'Signal'] = 1  # Buy signal
-        data.loc[data['EMA_Short'] < data['EMA_Long'], 'Signal'] = -1  # Sell signal
+    def on_bar(symbol, resolution, bar):
+        bar_time = pd.Timestamp(bar['date'], unit='s', tz='Asia/Kolkata')
+        event = ema_engine.on_bar(symbol, bar_time, bar['close'], closed=True)
+        logger.debug("Closed %s bar for %s: %s", resolution, symbol, bar)
+        if event:
+            on_signal_event(event)
 
-        logger.info("EMA Crossover strategy calculated.")
-        return data
+    # Bars live in preallocated ring buffers, ticks update them in place
+    aggregator = RingBufferAggregator(resolutions=(interval,), on_bar=on_bar)
+    recorder = TickRecorder(record_path) if record_path else None
+    FyersFeed(client_id, access_token, [ticker], aggregator, recorder=recorder).run_forever()
+
+def runtime_strategy(ticker="NSE:NIFTYBANK-INDEX", interval='5'):
+    """Runs the EMA crossover as a plug-in of the shared strategy runtime, more strategies can be added alongside"""
+    logger.info("##### Inside Strategy Runtime #####")
+    runtime = StrategyRuntime(candle_cache, clock=market_clock, on_event=on_signal_event)
+    runtime.add(EmaCrossoverStrategy([(ticker, interval)]))
+    runtime.run()
 
-    except Exception as e:
-        logger.error(f"Error in EMA Crossover Strategy: {e}")
-        return data
 
 if __name__ == "__main__":
+    setup_logger()
+
+    # Call the config reading function
+    Config_reading()
+
     try:
         doLogin()
 
         # Send message to Telegram
         message = "Login successfully!"
-        send_message_to_telegram(message, TelegramBotCredential, ReceiverTelegramID)
-        logger.info("Login message sent to Telegram.")
-
-        strategy()
+        notifier = TelegramNotifier(TelegramBotCredential, ReceiverTelegramID)
+        notifier.send(message)
+        logger.info("Login message queued for Telegram.")
+
+        if trading_config.get('enabled'):
+            order_manager = create_order_manager()
+
+        # python 04.py stream -> websocket bars, python 04.py runtime -> strategy runtime,
+        # otherwise the history polling loop
+        if len(sys.argv) > 1 and sys.argv[1] == "stream":
+            stream_strategy()
+        elif len(sys.argv) > 1 and sys.argv[1] == "runtime":
+            runtime_strategy()
+        else:
+            strategy()
 
     except Exception as e:
         logger.error(f"Error in main execution: {e}")
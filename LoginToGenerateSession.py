@@ -1,3 +1,4 @@
+import asyncio
 import os
 import pytz
 import json
@@ -11,6 +12,13 @@ from time import sleep
 import warnings
 import pandas as pd
 from fyers_apiv3 import fyersModel
+from candle_utils import candles_to_dataframe
+from async_client import AsyncFyersClient
+from http_utils import get_session, get_latency_stats, install_fyers_transport
+from market_clock import seconds_to_boundary
+from log_utils import Lazy, setup_logging
+from token_manager import TokenManager
+from logzero import logger
 
 # Suppress warnings for cleaner output
 warnings.filterwarnings('ignore')
@@ -22,18 +30,6 @@ def load_config(file_path='Config.yaml'):
         config = yaml.safe_load(file)
     return config
 
-def save_auth_tokens(auth_code, access_token, file_path='auth_tokens.json'):
-    """Save the auth_code and access_token to a JSON file."""
-    tokens = {
-        "auth_code": auth_code,
-        "access_token": access_token
-    }
-    
-    with open(file_path, 'w') as file:
-        json.dump(tokens, file, indent=4)
-    print(f"Auth tokens saved to {file_path}")
-
-
 def read_auth_tokens(file_path='auth_tokens.json'):
     """Read the auth_code and access_token from a JSON file."""
     if os.path.exists(file_path):
@@ -60,7 +56,7 @@ def send_login_otp(username):
     """Send OTP for login."""
     url = "https://api-t2.fyers.in/vagator/v2/send_login_otp_v2"
     payload = {"fy_id": get_encoded_string(username), "app_id": "2"}
-    response = requests.post(url, json=payload)
+    response = get_session().post(url, json=payload)
     
     if response.status_code == 200:
         return response.json()
@@ -69,10 +65,12 @@ def send_login_otp(username):
     
 def verify_otp(request_key, token):
     """Verify OTP sent to the user."""
+    # Don't send a TOTP that expires before the request reaches Fyers
+    wait_for_next_interval()
     otp = pyotp.TOTP(token).now()
     url = "https://api-t2.fyers.in/vagator/v2/verify_otp"
     payload = {"request_key": request_key, "otp": otp}
-    response = requests.post(url, json=payload)
+    response = get_session().post(url, json=payload)
     
     if response.status_code == 200:
         return response.json()
@@ -86,7 +84,7 @@ def verify_pin(request_key, pin):
     pin_str = str(pin)  # Convert pin to string
     url = "https://api-t2.fyers.in/vagator/v2/verify_pin_v2"
     payload = {"request_key": request_key, "identity_type": "pin", "identifier": get_encoded_string(pin_str)}
-    response = requests.post(url, json=payload)
+    response = get_session().post(url, json=payload)
     
     if response.status_code == 200:
         return response.json()
@@ -94,14 +92,11 @@ def verify_pin(request_key, pin):
         raise Exception(f"Failed to verify PIN: {response.status_code}, {response.text}")
 
 
-from datetime import datetime
-from time import sleep
-
-def wait_for_next_interval():
-    """Wait until the next 30-second mark."""
-    current_second = datetime.now().second
-    if current_second > 27:  # if the current second is in the last 3 seconds of the minute
-        sleep(5)
+def wait_for_next_interval(margin=3):
+    """Waits for the next 30-second TOTP window if the current one ends within `margin` seconds."""
+    remaining = seconds_to_boundary(30)
+    if remaining < margin:
+        sleep(remaining + 0.2)
 
 
 
@@ -137,104 +132,105 @@ def authenticate_with_fyers(auth_code, client_id, secret_key, redirect_uri):
 
 
 
-def main():
-    
-    try:
-        # Step 1: Load config
-        config = load_config()
+def generate_access_token(config):
+    """Runs the OTP/PIN/TOTP login flow and returns (auth_code, access_token)."""
+    # Extract sensitive data from config
+    username = config['fyers']['username']
+    secret_key = config['fyers']['secret_key']
+    client_id = config['fyers']['client_id']
+    redirect_uri = config['fyers']['redirect_uri']
+    token = config['fyers']['token']
+    pin = config['fyers']['pin']
 
-        # Extract sensitive data from config
-        username = config['fyers']['username']
-        secret_key = config['fyers']['secret_key']
-        client_id = config['fyers']['client_id']
-        redirect_uri = config['fyers']['redirect_uri']
-        token = config['fyers']['token']
-        pin = config['fyers']['pin']
-
-        # Step 2: Send login OTP
-        otp_response = send_login_otp(username)
-        #print("OTP Sent: ", otp_response)
-
-        # Step 3: Verify OTP
-        otp_verification = verify_otp(otp_response['request_key'], token)
-        #print("OTP Verified: ", otp_verification)
-
-        # Step 4: Verify PIN
-        pin_verification = verify_pin(otp_verification['request_key'], pin)
-        #print("PIN Verified: ", pin_verification)
-
-        # Initialize session
-        ses = requests.Session()
-        # Check if access_token exists
-        if 'data' in pin_verification and 'access_token' in pin_verification['data']:
-            ses.headers.update({
-            'authorization': f"Bearer {pin_verification['data']['access_token']}"
-            })
-        else:
-            print("Error: No access token found in the OTP verification response.")
-            exit()
+    # Step 2: Send login OTP
+    otp_response = send_login_otp(username)
+    #print("OTP Sent: ", otp_response)
+
+    # Step 3: Verify OTP
+    otp_verification = verify_otp(otp_response['request_key'], token)
+    #print("OTP Verified: ", otp_verification)
 
-        TOKENURL="https://api-t1.fyers.in/api/v3/token"
-        payload3 = {"fyers_id":username,
-           "app_id":client_id[:-4],
-           "redirect_uri":redirect_uri,
-           "appType":"100","code_challenge":"",
-           "state":"None","scope":"","nonce":"","response_type":"code","create_cookie":True}
+    # Step 4: Verify PIN
+    pin_verification = verify_pin(otp_verification['request_key'], pin)
+    #print("PIN Verified: ", pin_verification)
 
-        res3 = ses.post(url=TOKENURL, json= payload3).json()  
-        #print(res3)
+    # Reuse the pooled session, the bearer token only goes on the token request
+    ses = get_session()
+    # Check if access_token exists
+    if 'data' in pin_verification and 'access_token' in pin_verification['data']:
+        headers = {
+        'authorization': f"Bearer {pin_verification['data']['access_token']}"
+        }
+    else:
+        raise Exception("No access token found in the PIN verification response.")
 
-        auth_url = res3['Url']
+    TOKENURL="https://api-t1.fyers.in/api/v3/token"
+    payload3 = {"fyers_id":username,
+       "app_id":client_id[:-4],
+       "redirect_uri":redirect_uri,
+       "appType":"100","code_challenge":"",
+       "state":"None","scope":"","nonce":"","response_type":"code","create_cookie":True}
 
-        # Step 6: Extract Authorization Code
-        auth_code = get_auth_code_from_url(auth_url)
-        #print("Authorization Code: ", auth_code)
+    res3 = ses.post(url=TOKENURL, json= payload3, headers=headers).json()  
+    #print(res3)
 
-        # Step 7: Authenticate and get access token
-        access_token = authenticate_with_fyers(auth_code, client_id, secret_key, redirect_uri)
-        #print("Access Token: ", access_token)
+    auth_url = res3['Url']
 
-        # Save the auth_code and access_token to a file
-        save_auth_tokens(auth_code, access_token)
-        
-        # Step 8: Initialize FyersModel and fetch profile
-        fyers = fyersModel.FyersModel(client_id=client_id, is_async=False, token=access_token, log_path=os.getcwd())
-        profile = fyers.get_profile()
-        print("Fyers Profile : ", profile)
+    # Step 6: Extract Authorization Code
+    auth_code = get_auth_code_from_url(auth_url)
+    #print("Authorization Code: ", auth_code)
 
-        # Make a request to get the funds information
-        funds = fyers.funds()
-        print("Fyers Funds : ",funds)
+    # Step 7: Authenticate and get access token
+    access_token = authenticate_with_fyers(auth_code, client_id, secret_key, redirect_uri)
+    #print("Access Token: ", access_token)
 
-        holdings = fyers.holdings()
-        print("Fyers Holdings : ",holdings)
+    return auth_code, access_token
 
-        trdBook = fyers.tradebook()
-        print("Fyers TradeBook : ",trdBook)
 
-        data = {
-            "symbols":"NSE:SBIN-EQ,NSE:IDEA-EQ"
-        }
+def main():
+    
+    try:
+        # Fyers SDK calls share the pooled keep-alive session with the login requests
+        install_fyers_transport()
 
-        quotes = fyers.quotes(data=data)
-        print(quotes)
+        # Step 1: Load config
+        config = load_config()
+        client_id = config['fyers']['client_id']
 
-        data = {
-            "symbol":"NSE:SBIN-EQ",
-            "resolution":"1",
-            "date_format":"1",
-            "range_from":str((datetime.now() - timedelta(days=2)).date()),
-            "range_to":str(datetime.now().date()),
-            "cont_flag":"1"
-        }
+        # Steps 2-7: OTP, PIN and authorization code exchange, saved with the token's
+        # expiry so later TokenManager starts reuse it instead of logging in again
+        token_manager = TokenManager(config)
+        token_manager.refresh()
+        access_token = token_manager.access_token
+        
+        # Step 8: Fetch profile, funds, holdings, tradebook, quotes and history concurrently
+        client = AsyncFyersClient(client_id, access_token)
+        snapshot = asyncio.run(client.snapshot(quote_symbols=["NSE:SBIN-EQ", "NSE:IDEA-EQ"],
+                                               history_symbol="NSE:SBIN-EQ"))
+        # Calls are gathered with return_exceptions, a failed one holds its exception
+        for key, label in (('profile', "Fyers Profile"), ('funds', "Fyers Funds"), ('holdings', "Fyers Holdings"),
+                           ('tradebook', "Fyers TradeBook"), ('quotes', "Quotes")):
+            if isinstance(snapshot[key], Exception):
+                logger.error("%s failed: %s", label, snapshot[key])
+            else:
+                logger.info("%s : %s", label, snapshot[key])
+
+        history = snapshot['history']
+        if isinstance(history, Exception) or 'candles' not in history:
+            logger.error("History failed: %s", history)
+        else:
+            # A summary line instead of the whole frame, the bars themselves only at debug level
+            data = candles_to_dataframe(history['candles'], set_index=False)
+            if not data.empty:
+                logger.info("History : %d candles from %s to %s", len(data), data['date'].iat[0],
+                            data['date'].iat[-1])
+            logger.debug("History bars:\n%s", Lazy(data.to_string))
 
-        candle_data = fyers.history(data=data)
-        data = pd.DataFrame(candle_data['candles'],columns=['date','open','high','low','close','volume'])
-        data['date'] = data["date"].apply(pd.Timestamp,unit='s',tzinfo = pytz.timezone('Asia/Kolkata'))
-        data = data.sort_values(by='date')
-        print(data)
+        logger.info("Login SuccessFul....")
 
-        print("Login SuccessFul....")
+        for endpoint, stats in get_latency_stats().items():
+            logger.info("%s: %d calls, mean %.0f ms, max %.0f ms", endpoint, stats['count'], stats['mean'] * 1000,
+                        stats['max'] * 1000)
 
 
         # Step 5: Get Authorization Code URL
@@ -244,7 +240,8 @@ def main():
         
 
     except Exception as e:
-        print(f"Error: {e}")
+        logger.error(f"Error: {e}")
 
 if __name__ == "__main__":
+    setup_logging("login.log")
     main()
\ No newline at end of file
@@ -11,6 +11,7 @@ from time import sleep
 import warnings
 import pandas as pd
 from fyers_apiv3 import fyersModel
+from token_manager import TokenManager
 
 # Suppress warnings for cleaner output
 warnings.filterwarnings('ignore')
@@ -68,11 +69,11 @@ def main():
         token = config['fyers']['token']
         pin = config['fyers']['pin']
 
-        auth_code, access_token = read_auth_tokens()
-        # Step 8: Initialize FyersModel and fetch profile
-        fyers = fyersModel.FyersModel(client_id=client_id, is_async=False, token=access_token, log_path=os.getcwd())
+        # Step 8: Cached token -> FyersModel, validate() logs in again if Fyers rejects it
+        token_manager = TokenManager(config)
+        fyers = token_manager.get_fyers()
 
-        profile = fyers.get_profile()
+        profile = token_manager.validate()
         print("Fyers Profile : ", profile)
         
     
@@ -0,0 +1,126 @@
+import asyncio
+import os
+from datetime import datetime, timedelta
+
+from logzero import logger
+
+from config_utils import load_config
+from market_data import MAX_QUOTES_PER_REQUEST, batched
+from token_manager import TokenManager
+
+
+class AsyncFyersClient:
+    """
+    Awaitable wrapper around FyersModel(is_async=True).
+
+    Independent calls are issued concurrently with asyncio.gather, bounded by
+    `max_concurrency`, so a full account snapshot costs roughly one round-trip.
+    """
+
+    def __init__(self, client_id, access_token, name=None, max_concurrency=8, log_path=None):
+        from fyers_apiv3 import fyersModel
+
+        self.name = name or client_id
+        self.fyers = fyersModel.FyersModel(client_id=client_id, is_async=True, token=access_token,
+                                           log_path=log_path if log_path is not None else os.getcwd())
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def _call(self, method, *args, **kwargs):
+        async with self._semaphore:
+            return await getattr(self.fyers, method)(*args, **kwargs)
+
+    async def profile(self):
+        return await self._call('get_profile')
+
+    async def funds(self):
+        return await self._call('funds')
+
+    async def holdings(self):
+        return await self._call('holdings')
+
+    async def positions(self):
+        return await self._call('positions')
+
+    async def orderbook(self):
+        return await self._call('orderbook')
+
+    async def tradebook(self):
+        return await self._call('tradebook')
+
+    async def quotes(self, symbols):
+        """Quotes for any number of symbols, 50-symbol batches requested concurrently. Returns symbol -> values."""
+        responses = await asyncio.gather(*[
+            self._call('quotes', data={"symbols": ",".join(batch)})
+            for batch in batched(list(symbols), MAX_QUOTES_PER_REQUEST)
+        ])
+        quotes = {}
+        for response in responses:
+            if response.get('s') != 'ok':
+                logger.error(f"Quotes request failed on {self.name}: {response}")
+                continue
+            for item in response.get('d', []):
+                if item.get('s') == 'ok':
+                    quotes[item['n']] = item['v']
+        return quotes
+
+    async def history(self, symbol, resolution="1", range_from=None, range_to=None, days=2):
+        """Raw history response, by default the last `days` days."""
+        data = {
+            "symbol": symbol,
+            "resolution": resolution,
+            "date_format": "1",
+            "range_from": str(range_from or (datetime.now() - timedelta(days=days)).date()),
+            "range_to": str(range_to or datetime.now().date()),
+            "cont_flag": "1"
+        }
+        return await self._call('history', data=data)
+
+    async def snapshot(self, quote_symbols=(), history_symbol=None):
+        """Profile, funds, holdings, positions, tradebook (plus optional quotes/history) in one concurrent round."""
+        calls = {
+            "profile": self.profile(),
+            "funds": self.funds(),
+            "holdings": self.holdings(),
+            "positions": self.positions(),
+            "tradebook": self.tradebook(),
+        }
+        if quote_symbols:
+            calls["quotes"] = self.quotes(quote_symbols)
+        if history_symbol:
+            calls["history"] = self.history(history_symbol)
+        results = await asyncio.gather(*calls.values(), return_exceptions=True)
+        snapshot = dict(zip(calls.keys(), results))
+        for key, value in snapshot.items():
+            if isinstance(value, Exception):
+                logger.error(f"{key} failed on {self.name}: {value}")
+        return snapshot
+
+
+def clients_from_config(config=None):
+    """
+    Builds one AsyncFyersClient per account in Config.yaml.
+
+    Accounts are read from an optional `accounts` list, each entry holding a
+    `fyers` section like the top-level one plus a `name` and `token_file`.
+    Without it the top-level `fyers` section and auth_tokens.json are used.
+    """
+    config = config if config is not None else load_config()
+    accounts = config.get('accounts') or [{"name": "default", "fyers": config['fyers'],
+                                           "token_file": 'auth_tokens.json'}]
+    clients = []
+    for account in accounts:
+        manager = TokenManager({"fyers": account['fyers']}, token_file=account.get('token_file', 'auth_tokens.json'))
+        clients.append(AsyncFyersClient(account['fyers']['client_id'], manager.access_token,
+                                        name=account.get('name')))
+    return clients
+
+
+async def snapshot_all(clients, quote_symbols=()):
+    """Portfolio snapshots of several accounts concurrently, returns name -> snapshot."""
+    snapshots = await asyncio.gather(*[client.snapshot(quote_symbols) for client in clients])
+    return {client.name: snapshot for client, snapshot in zip(clients, snapshots)}
+
+
+if __name__ == "__main__":
+    for name, snapshot in asyncio.run(snapshot_all(clients_from_config())).items():
+        logger.info(f"{name}: funds {snapshot['funds']}, positions {snapshot['positions']}")
@@ -0,0 +1,142 @@
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+
+import numpy as np
+import pandas as pd
+from logzero import logger
+
+from strategy_utils import crossover_signals, ema
+
+# 5-minute bars in an NSE session (09:15-15:30) times trading days per year
+DEFAULT_PERIODS_PER_YEAR = 75 * 252
+
+
+def run_backtest(close, signal, quantity=1, slippage_bps=1.0, brokerage=20.0, long_only=False,
+                 periods_per_year=DEFAULT_PERIODS_PER_YEAR):
+    """
+    Vectorized backtest of a signal series.
+
+    The signal of bar t is traded at the close of bar t and held over bar t+1.
+    Every position change pays `slippage_bps` of the traded value plus a flat
+    `brokerage` per order. Returns (summary dict, per-bar DataFrame columns as dict).
+    """
+    close = np.asarray(close, dtype=np.float64)
+    position = np.asarray(signal, dtype=np.float64)
+    if long_only:
+        position = np.maximum(position, 0)
+
+    held = np.concatenate(([0.0], position[:-1]))
+    gross = held * np.diff(close, prepend=close[0]) * quantity
+
+    change = np.abs(np.diff(position, prepend=0.0))
+    orders = change > 0
+    costs = change * quantity * close * slippage_bps / 1e4 + orders * brokerage
+    net = gross - costs
+    equity = np.cumsum(net)
+    drawdown = np.maximum.accumulate(np.maximum(equity, 0)) - equity
+
+    # One trade per holding period. A bar's PnL belongs to the position held over it,
+    # i.e. to the trade opened by the last order before the bar; the cost of an order
+    # is split into the exit of the held trade and the entry of the new one.
+    opened = np.cumsum(orders)
+    held_id = np.concatenate(([0], opened[:-1]))
+    exit_size = np.where(np.sign(position) != np.sign(held), np.abs(held),
+                         np.maximum(np.abs(held) - np.abs(position), 0))
+    exits = orders & (exit_size > 0)
+    exit_costs = exit_size * quantity * close * slippage_bps / 1e4 + exits * brokerage
+    trades = opened[-1] + 1 if len(opened) else 1
+    trade_pnl = (np.bincount(held_id, weights=gross - exit_costs, minlength=trades)
+                 - np.bincount(opened, weights=costs - exit_costs, minlength=trades))
+    in_market = np.bincount(held_id, weights=np.abs(held), minlength=trades) > 0
+    trade_pnl = trade_pnl[in_market]
+
+    std = net.std()
+    summary = {
+        "net_pnl": float(equity[-1]) if len(equity) else 0.0,
+        "gross_pnl": float(gross.sum()),
+        "costs": float(costs.sum()),
+        "trades": int(len(trade_pnl)),
+        "win_rate": float((trade_pnl > 0).mean()) if len(trade_pnl) else 0.0,
+        "max_drawdown": float(drawdown.max()) if len(drawdown) else 0.0,
+        "sharpe": float(net.mean() / std * np.sqrt(periods_per_year)) if std > 0 else 0.0,
+    }
+    bars = {"position": position, "gross": gross, "costs": costs, "net": net, "equity": equity}
+    return summary, bars
+
+
+def backtest_ema_crossover(data, short_length=3, long_length=30, **costs):
+    """Backtests ema_crossover_strategy on a candle DataFrame, returns (summary, per-bar DataFrame)."""
+    close = data['close'].to_numpy(dtype=np.float64)
+    signal = crossover_signals(ema(close, short_length), ema(close, long_length))
+    summary, bars = run_backtest(close, signal, **costs)
+    summary.update(short_length=short_length, long_length=long_length)
+    return summary, pd.DataFrame(bars, index=data.index)
+
+
+_sweep_close = None
+
+
+def _init_sweep_worker(close):
+    global _sweep_close
+    _sweep_close = close
+
+
+def _run_sweep_chunk(combos, costs):
+    """Runs a chunk of (short, long) combos, computing each EMA length only once."""
+    emas = {}
+    results = []
+    for short_length, long_length in combos:
+        for length in (short_length, long_length):
+            if length not in emas:
+                emas[length] = ema(_sweep_close, length)
+        signal = crossover_signals(emas[short_length], emas[long_length])
+        summary, _ = run_backtest(_sweep_close, signal, **costs)
+        summary.update(short_length=short_length, long_length=long_length)
+        results.append(summary)
+    return results
+
+
+def parameter_sweep(close, short_lengths, long_lengths, max_workers=None, chunk_size=64, **costs):
+    """
+    Backtests every short < long EMA combination across a process pool.
+
+    The close series is sent to each worker once at start-up; combos are
+    grouped by short length so a chunk reuses its EMAs. Returns a results
+    table sorted by net PnL.
+    """
+    close = np.ascontiguousarray(close, dtype=np.float64)
+    combos = [(s, l) for s, l in product(sorted(set(short_lengths)), sorted(set(long_lengths))) if s < l]
+    chunks = [combos[i:i + chunk_size] for i in range(0, len(combos), chunk_size)]
+    logger.info(f"Sweeping {len(combos)} EMA combinations over {len(close)} bars in {len(chunks)} chunks.")
+
+    results = []
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_sweep_worker,
+                             initargs=(close,)) as pool:
+        for chunk_results in pool.map(_run_sweep_chunk, chunks, [costs] * len(chunks)):
+            results.extend(chunk_results)
+
+    table = pd.DataFrame(results)
+    if table.empty:
+        return table
+    columns = ['short_length', 'long_length'] + [c for c in table.columns if c not in ('short_length', 'long_length')]
+    return table[columns].sort_values('net_pnl', ascending=False).reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    from history_store import HistoryStore
+
+    # python backtest.py NSE:NIFTYBANK-INDEX 5 2024-01-01 2024-12-31
+    if len(sys.argv) < 5:
+        print("Usage: python backtest.py <symbol> <resolution> <from YYYY-MM-DD> <to YYYY-MM-DD>")
+        sys.exit(1)
+    symbol, resolution, range_from, range_to = sys.argv[1:5]
+
+    data = HistoryStore().read_dataframe(symbol, resolution, range_from, range_to, columns=['close'])
+    if data.empty:
+        logger.error(f"No stored history for {symbol} ({resolution}) between {range_from} and {range_to}.")
+        sys.exit(1)
+
+    table = parameter_sweep(data['close'].to_numpy(), range(2, 21), range(10, 101, 5), max_workers=os.cpu_count())
+    print(table.head(20).to_string())
@@ -0,0 +1,56 @@
+"""
+Micro-benchmark: legacy per-row pd.Timestamp apply vs candle_utils.candles_to_dataframe.
+
+Run from the repository root:
+    python benchmarks/bench_candle_parsing.py --rows 200000
+"""
+import argparse
+import os
+import sys
+import timeit
+
+import numpy as np
+import pandas as pd
+import pytz
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from candle_utils import candles_to_dataframe
+
+
+def make_candles(rows, start=1700000000, step=60):
+    """Builds a synthetic Fyers `candles` list of 1-minute bars."""
+    rng = np.random.default_rng(0)
+    close = 45000 + np.cumsum(rng.normal(0, 5, rows)).round(2)
+    volume = rng.integers(1000, 100000, rows)
+    return [
+        [start + i * step, float(close[i]), float(close[i]) + 5, float(close[i]) - 5, float(close[i]), int(volume[i])]
+        for i in range(rows)
+    ]
+
+
+def legacy_parse(candles):
+    """The conversion used by fetchOHLC/process_candle_data before candle_utils."""
+    data = pd.DataFrame(candles, columns=['date', 'open', 'high', 'low', 'close', 'volume'])
+    data['date'] = data["date"].apply(pd.Timestamp, unit='s', tzinfo=pytz.timezone('Asia/Kolkata'))
+    return data.sort_values(by='date')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    candles = make_candles(args.rows)
+    legacy = min(timeit.repeat(lambda: legacy_parse(candles), number=1, repeat=args.repeat))
+    vectorized = min(timeit.repeat(lambda: candles_to_dataframe(candles, set_index=False), number=1, repeat=args.repeat))
+
+    print(f"rows={args.rows}")
+    print(f"legacy apply     : {legacy * 1000:10.1f} ms")
+    print(f"candle_utils     : {vectorized * 1000:10.1f} ms")
+    print(f"speedup          : {legacy / vectorized:10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
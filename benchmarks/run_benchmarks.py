@@ -0,0 +1,226 @@
+"""
+Benchmark suite for the data and strategy hot paths.
+
+Everything runs offline: history comes from the recorded Fyers responses in
+benchmarks/fixtures, config and tokens from the dummy files next to them.
+Results are compared against benchmarks/baseline.json and the run fails when
+a benchmark is slower than its baseline by more than --tolerance.
+
+Run from the repository root:
+    python benchmarks/run_benchmarks.py                  # compare with the baseline
+    python benchmarks/run_benchmarks.py -k ema           # only benchmarks matching 'ema'
+    python benchmarks/run_benchmarks.py --save-baseline  # record new baseline timings
+
+Baselines are machine specific, re-record them when the benchmark machine changes.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import sys
+import timeit
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import logzero
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURES = os.path.join(BENCH_DIR, 'fixtures')
+BASELINE_PATH = os.path.join(BENCH_DIR, 'baseline.json')
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from bench_candle_parsing import legacy_parse, make_candles
+from candle_utils import candles_to_dataframe
+from config_utils import load_config
+from history_downloader import download_many, split_date_range
+from market_data import CandleCache
+from rate_limiter import TokenBucket
+from strategy_utils import ema_crossover_strategy
+from token_manager import TokenManager
+
+BENCHMARKS = {}
+
+
+def benchmark(name, repeat=5):
+    """Registers `setup()`, which prepares fixtures and returns the callable to time."""
+    def register(setup):
+        BENCHMARKS[name] = (setup, repeat)
+        return setup
+    return register
+
+
+def load_history_fixture(symbol="NSE:NIFTYBANK-INDEX", resolution="1"):
+    name = f"history_{symbol.replace(':', '_')}_{resolution}.json"
+    with open(os.path.join(FIXTURES, name), 'r') as file:
+        return json.load(file)
+
+
+class FixtureFyers:
+    """
+    Serves history requests from a recorded response instead of the API.
+
+    The recording is shifted by whole days so its last session is today,
+    which keeps CandleCache's "last N days" windows populated.
+    """
+
+    def __init__(self, response):
+        candles = np.asarray(response['candles'], dtype=np.float64)
+        last_day = datetime.fromtimestamp(candles[-1, 0]).date()
+        candles[:, 0] += (date.today() - last_day).days * 86400
+        self.candles = candles
+        self.epochs = candles[:, 0].astype(np.int64)
+        self.calls = 0
+
+    def _bounds(self, data):
+        if data.get('date_format') == "0":
+            return int(float(data['range_from'])), int(float(data['range_to']))
+        start = datetime.strptime(data['range_from'], "%Y-%m-%d")
+        end = datetime.strptime(data['range_to'], "%Y-%m-%d") + timedelta(days=1)
+        return int(start.timestamp()), int(end.timestamp()) - 1
+
+    def history(self, data):
+        self.calls += 1
+        start, end = self._bounds(data)
+        lo, hi = np.searchsorted(self.epochs, start, 'left'), np.searchsorted(self.epochs, end, 'right')
+        if lo == hi:
+            return {"s": "no_data", "candles": [], "code": 200, "message": ""}
+        return {"s": "ok", "candles": self.candles[lo:hi].tolist(), "code": 200, "message": ""}
+
+
+@benchmark('parse/legacy_apply_1875')
+def _legacy_parse():
+    candles = load_history_fixture()['candles']
+    return lambda: legacy_parse(candles)
+
+
+@benchmark('parse/candles_to_dataframe_1875')
+def _parse_fixture():
+    candles = load_history_fixture()['candles']
+    return lambda: candles_to_dataframe(candles)
+
+
+@benchmark('parse/candles_to_dataframe_200k', repeat=3)
+def _parse_large():
+    candles = make_candles(200000)
+    return lambda: candles_to_dataframe(candles)
+
+
+@benchmark('fetch/fetchOHLC_cold')
+def _fetch_cold():
+    fyers = FixtureFyers(load_history_fixture())
+    return lambda: CandleCache(fyers).get_ohlc("NSE:NIFTYBANK-INDEX", "1", 10)
+
+
+@benchmark('fetch/fetchOHLC_warm', repeat=20)
+def _fetch_warm():
+    cache = CandleCache(FixtureFyers(load_history_fixture()))
+    cache.get_ohlc("NSE:NIFTYBANK-INDEX", "1", 10)
+    return lambda: cache.get_ohlc("NSE:NIFTYBANK-INDEX", "1", 10)
+
+
+def _close_frame(bars):
+    rng = np.random.default_rng(0)
+    index = pd.date_range("2024-01-01 09:15", periods=bars, freq="min", tz="Asia/Kolkata")
+    return pd.DataFrame({"close": 45000 + np.cumsum(rng.normal(0, 5, bars))}, index=index)
+
+
+for _bars, _repeat in ((1_000, 20), (100_000, 5), (1_000_000, 3)):
+    def _ema_setup(bars=_bars):
+        data = _close_frame(bars)
+        return lambda: ema_crossover_strategy(data.copy())
+    benchmark(f'strategy/ema_crossover_{_bars}', repeat=_repeat)(_ema_setup)
+
+
+@benchmark('history/split_date_range_5y', repeat=20)
+def _split():
+    return lambda: split_date_range(date(2020, 1, 1), date(2024, 12, 31), "1")
+
+
+@benchmark('history/gethistory_chunked_5y')
+def _download():
+    fyers = FixtureFyers(load_history_fixture())
+    end = date.today()
+    limiter = TokenBucket(1e9)
+    return lambda: download_many(fyers, ["NSE:NIFTYBANK-INDEX"], end - timedelta(days=5 * 365), end, "1",
+                                 limiter=limiter)
+
+
+@benchmark('startup/config_and_token_load', repeat=20)
+def _config_token():
+    config_path = os.path.join(FIXTURES, 'Config.yaml')
+    token_path = os.path.join(FIXTURES, 'auth_tokens.json')
+
+    def load():
+        manager = TokenManager(load_config(config_path), token_file=token_path)
+        return manager.access_token
+    return load
+
+
+def run(selected):
+    results = {}
+    for name, (setup, repeat) in BENCHMARKS.items():
+        if selected and not any(pattern in name for pattern in selected):
+            continue
+        func = setup()
+        func()  # warm-up, also catches broken benchmarks before timing
+        results[name] = min(timeit.repeat(func, number=1, repeat=repeat))
+        print(f"{name:40s} {results[name] * 1000:12.3f} ms")
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Prints the change against the baseline and returns the names that regressed."""
+    regressions = []
+    for name, seconds in results.items():
+        reference = baseline.get(name)
+        if reference is None:
+            print(f"{name:40s} no baseline")
+            continue
+        change = seconds / reference - 1
+        flag = "REGRESSION" if change > tolerance else ""
+        print(f"{name:40s} {reference * 1000:12.3f} -> {seconds * 1000:12.3f} ms  {change:+7.1%} {flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('-k', dest='selected', action='append', default=[], help="run benchmarks containing this")
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--tolerance', type=float, default=0.25, help="allowed slowdown, 0.25 = 25%%")
+    args = parser.parse_args()
+
+    logzero.loglevel(logging.WARNING)
+    results = run(args.selected)
+
+    if args.save_baseline:
+        baseline = {"results": {}}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, 'r') as file:
+                baseline = json.load(file)
+        baseline['machine'] = f"{platform.machine()} {platform.processor()} python {platform.python_version()}"
+        baseline['results'].update(results)
+        with open(args.baseline, 'w') as file:
+            json.dump(baseline, file, indent=2, sort_keys=True)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("No baseline yet, run with --save-baseline first.")
+        return 0
+    with open(args.baseline, 'r') as file:
+        baseline = json.load(file)['results']
+    print()
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print(f"\n{len(regressions)} benchmark(s) slower than baseline by more than {args.tolerance:.0%}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,12 @@
-import requests
+import atexit
+import queue
+import threading
+import time
+
 from logzero import logger
 
+from http_utils import get_session
+
 def send_message_to_telegram(message, telegram_bot_credential, receiver_telegram_id):
     """
     Sends a text message to a specified Telegram chat.
@@ -8,7 +14,7 @@ def send_message_to_telegram(message, telegram_bot_credential, receiver_telegram
     try:
         url = f"https://api.telegram.org/bot{telegram_bot_credential}/sendMessage"
         params = {"chat_id": receiver_telegram_id, "text": message}
-        response = requests.post(url, params=params)
+        response = get_session().post(url, params=params)
         response.raise_for_status()
         logger.info(f"Telegram message sent successfully: {message}")
     except Exception as e:
@@ -23,9 +29,137 @@ def send_telegram_file(file_name, telegram_bot_credential, receiver_telegram_id)
         with open(file_name, 'rb') as file:
             files = {'document': file}
             params = {"chat_id": receiver_telegram_id}
-            response = requests.post(url, files=files, params=params)
+            response = get_session().post(url, files=files, params=params, timeout=30)
             response.raise_for_status()
             logger.info(f"Telegram file sent successfully: {file_name}")
     except Exception as e:
         logger.error(f"Failed to send Telegram file: {e}")
 
+
+
+class TelegramNotifier:
+    """
+    Background Telegram sender so alerts never block the trading loop.
+
+    send() and send_file() only enqueue. A worker thread drains the bounded
+    queue over one keep-alive session, coalesces text messages arriving within
+    `coalesce_window` seconds into a single message, spaces requests to stay
+    under Telegram's per-chat limit and honours `retry_after` on HTTP 429.
+    Requests go through the shared pooled session from http_utils.
+    When the queue is full, `drop_policy` decides: 'drop_new' discards the new
+    message, 'drop_oldest' discards the oldest queued one, 'block' waits.
+    close() runs at exit, so messages queued just before shutdown still go out.
+    """
+
+    MAX_MESSAGE_LENGTH = 4096
+
+    def __init__(self, telegram_bot_credential, receiver_telegram_id, max_queue=1000, coalesce_window=1.0,
+                 min_interval=1.0, drop_policy='drop_oldest', timeout=10, max_retries=3):
+        self.base_url = f"https://api.telegram.org/bot{telegram_bot_credential}"
+        self.chat_id = receiver_telegram_id
+        self.coalesce_window = coalesce_window
+        self.min_interval = min_interval
+        self.drop_policy = drop_policy
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.dropped = 0
+        self.session = get_session()
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._last_sent = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="telegram-notifier", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def _enqueue(self, item):
+        if self.drop_policy == 'block':
+            self._queue.put(item)
+            return True
+        while True:
+            try:
+                self._queue.put_nowait(item)
+                return True
+            except queue.Full:
+                self.dropped += 1
+                if self.drop_policy == 'drop_new':
+                    return False
+                try:
+                    self._queue.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def send(self, message):
+        """Queues a text message, returns False if it was dropped."""
+        return self._enqueue(('text', str(message)))
+
+    def send_file(self, file_name):
+        """Queues a document upload, returns False if it was dropped."""
+        return self._enqueue(('file', file_name))
+
+    def _post(self, method, **kwargs):
+        for attempt in range(self.max_retries + 1):
+            wait = self._last_sent + self.min_interval - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            self._last_sent = time.monotonic()
+            # A failed attempt leaves uploaded files at EOF
+            for file in kwargs.get('files', {}).values():
+                file.seek(0)
+            try:
+                response = self.session.post(f"{self.base_url}/{method}", timeout=self.timeout, **kwargs)
+                if response.status_code == 429:
+                    retry_after = response.json().get('parameters', {}).get('retry_after', 1)
+                    logger.warning(f"Telegram rate limited, retrying in {retry_after}s")
+                    time.sleep(retry_after)
+                    continue
+                response.raise_for_status()
+                return True
+            except Exception as e:
+                logger.error(f"Failed to send Telegram {method} (attempt {attempt + 1}): {e}")
+        return False
+
+    def _send_text(self, text):
+        for i in range(0, len(text), self.MAX_MESSAGE_LENGTH):
+            self._post("sendMessage", params={"chat_id": self.chat_id, "text": text[i:i + self.MAX_MESSAGE_LENGTH]})
+
+    def _send_file(self, file_name):
+        try:
+            with open(file_name, 'rb') as file:
+                self._post("sendDocument", files={'document': file}, params={"chat_id": self.chat_id})
+        except OSError as e:
+            logger.error(f"Failed to send Telegram file: {e}")
+
+    def _run(self):
+        while not (self._stop.is_set() and self._queue.empty()):
+            try:
+                kind, payload = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            if kind == 'file':
+                self._send_file(payload)
+                continue
+
+            # Coalesce a burst of text messages into one request
+            texts = [payload]
+            deadline = time.monotonic() + self.coalesce_window
+            pending_file = None
+            while pending_file is None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    kind, payload = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if kind == 'file':
+                    pending_file = payload
+                else:
+                    texts.append(payload)
+            self._send_text("\n".join(texts))
+            if pending_file is not None:
+                self._send_file(pending_file)
+
+    def close(self, timeout=10):
+        """Sends what is still queued (up to timeout seconds) and stops the worker."""
+        self._stop.set()
+        self._thread.join(timeout)
@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+
+from metrics import timed
+
+CANDLE_COLUMNS = ['date', 'open', 'high', 'low', 'close', 'volume']
+CANDLE_OI_COLUMNS = CANDLE_COLUMNS + ['oi']
+
+# Prices stay float64: float32 steps are ~0.004 near 45000, coarser than a 0.05 tick,
+# and the error would carry into EMAs, PnL and crossover comparisons. Volume/OI need int64.
+CANDLE_DTYPE = np.dtype([
+    ('date', np.int64),
+    ('open', np.float64),
+    ('high', np.float64),
+    ('low', np.float64),
+    ('close', np.float64),
+    ('volume', np.int64),
+])
+CANDLE_OI_DTYPE = np.dtype(CANDLE_DTYPE.descr + [('oi', np.int64)])
+
+
+def candles_to_records(candles, with_oi=False):
+    """
+    Converts the raw Fyers `candles` list into a NumPy structured array.
+
+    The list is converted to a 2D float64 array in one C-level pass and then
+    split into typed columns, no Python work is done per row.
+    """
+    dtype = CANDLE_OI_DTYPE if with_oi else CANDLE_DTYPE
+    if len(candles) == 0:
+        return np.empty(0, dtype=dtype)
+
+    raw = np.asarray(candles, dtype=np.float64)
+    if raw.ndim != 2 or raw.shape[1] < len(CANDLE_COLUMNS):
+        raise ValueError(f"Expected candles with at least {len(CANDLE_COLUMNS)} fields, got shape {raw.shape}")
+
+    records = np.zeros(len(raw), dtype=dtype)
+    # Indices and equities carry no OI even when oi_flag is set, leave it at 0
+    for i, name in enumerate(dtype.names[:raw.shape[1]]):
+        records[name] = raw[:, i]
+    return records
+
+
+def records_to_dataframe(records, set_index=True, tz='Asia/Kolkata'):
+    """Builds an OHLCV DataFrame from a candle structured array with timezone-aware dates."""
+    columns = {name: records[name] for name in records.dtype.names}
+    columns['date'] = pd.to_datetime(columns['date'], unit='s', utc=True).tz_convert(tz)
+    data = pd.DataFrame(columns)
+    if not data['date'].is_monotonic_increasing:
+        data = data.sort_values(by='date', kind='stable')
+    if set_index:
+        data = data.set_index('date')
+    return data
+
+
+@timed("candle_parse_seconds")
+def candles_to_dataframe(candles, with_oi=False, set_index=True, tz='Asia/Kolkata'):
+    """Converts the raw Fyers `candles` list into a DataFrame sorted by date."""
+    return records_to_dataframe(candles_to_records(candles, with_oi=with_oi), set_index=set_index, tz=tz)
@@ -0,0 +1,191 @@
+"""
+Single entry point for the Fyers scripts.
+
+    python cli.py login
+    python cli.py health [--validate]
+    python cli.py fetch NSE:SBIN-EQ --resolution 1 --days 30
+    python cli.py run-strategy [--stream]
+    python cli.py backtest NSE:NIFTYBANK-INDEX --resolution 5 --from 2024-01-01 --to 2024-12-31
+
+Only argparse and the standard library are imported up front; pandas,
+fyers_apiv3 and the strategy modules are imported inside the subcommand that
+needs them, so cron jobs and health checks start in milliseconds.
+Pass --timings to print how long each deferred import took.
+"""
+import argparse
+import importlib
+import sys
+import time
+
+_started = time.perf_counter()
+_import_times = {}
+
+
+def _import(name):
+    """Imports a module and records how long it took."""
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    _import_times.setdefault(name, time.perf_counter() - start)
+    return module
+
+
+def _parse_range(value):
+    """Parses 'start:stop[:step]' into a range."""
+    return range(*[int(part) for part in value.split(':')])
+
+
+def cmd_login(args):
+    config_utils = _import('config_utils')
+    login = _import('LoginToGenerateSession')
+    token_manager = _import('token_manager')
+
+    config = config_utils.load_config(args.config)
+    auth_code, access_token = login.generate_access_token(config)
+    config_utils.save_auth_tokens(auth_code, access_token, expires_at=token_manager.token_expiry(access_token))
+    return 0
+
+
+def cmd_health(args):
+    config_utils = _import('config_utils')
+    token_manager = _import('token_manager')
+
+    config = config_utils.load_config(args.config)
+    if config is None:
+        print(f"Config check failed: {args.config} could not be loaded.")
+        return 1
+    try:
+        manager = token_manager.TokenManager(config, token_file=args.token_file)
+    except ValueError as e:
+        print(f"Config check failed: {e}")
+        return 1
+    if manager.is_expired():
+        print("Access token missing or expired.")
+        return 1
+    if manager.expires_at is not None:
+        print(f"Access token valid for {(manager.expires_at - time.time()) / 3600:.1f} more hours.")
+    if args.validate:
+        profile = manager.validate()
+        print(f"Profile: {profile.get('s')} {profile.get('data', {}).get('fy_id', '')}")
+    return 0
+
+
+def cmd_fetch(args):
+    from datetime import datetime, timedelta
+
+    config_utils = _import('config_utils')
+    http_utils = _import('http_utils')
+    token_manager = _import('token_manager')
+    history_store = _import('history_store')
+
+    config = config_utils.load_config(args.config)
+    if config is None:
+        print(f"Fetch failed: {args.config} could not be loaded.")
+        return 1
+    http_utils.install_fyers_transport()
+    fyers = token_manager.TokenManager(config).get_fyers()
+    end = datetime.now().date()
+    start = end - timedelta(days=args.days)
+    store = history_store.HistoryStore(args.store)
+    store.fill_gaps(fyers, args.symbols, args.resolution, start, end)
+    for symbol in args.symbols:
+        data = store.read_dataframe(symbol, args.resolution, start, end)
+        print(f"{symbol}: {len(data)} bars stored for {start}..{end}")
+    return 0
+
+
+def cmd_run_strategy(args):
+    strategy = _import('04')
+    broker_utils = _import('broker_utils')
+
+    strategy.setup_logger()
+    strategy.Config_reading(args.config)
+    strategy.doLogin(args.config)
+    strategy.notifier = broker_utils.TelegramNotifier(strategy.TelegramBotCredential, strategy.ReceiverTelegramID)
+    strategy.notifier.send("Login successfully!")
+    if strategy.trading_config.get('enabled'):
+        strategy.order_manager = strategy.create_order_manager(args.ticker)
+    if args.stream:
+        strategy.stream_strategy(ticker=args.ticker, interval=args.interval, record_path=args.record)
+    elif args.runtime:
+        strategy.runtime_strategy(ticker=args.ticker, interval=args.interval)
+    else:
+        strategy.strategy(ticker=args.ticker, interval=args.interval)
+    return 0
+
+
+def cmd_backtest(args):
+    history_store = _import('history_store')
+    backtest = _import('backtest')
+
+    data = history_store.HistoryStore(args.store).read_dataframe(args.symbol, args.resolution, args.range_from,
+                                                                 args.range_to, columns=['close'])
+    if data.empty:
+        print(f"No stored history for {args.symbol} ({args.resolution}), run 'cli.py fetch' first.")
+        return 1
+    table = backtest.parameter_sweep(data['close'].to_numpy(), args.short, args.long, max_workers=args.workers,
+                                     slippage_bps=args.slippage_bps, brokerage=args.brokerage,
+                                     quantity=args.quantity)
+    print(table.head(args.top).to_string())
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Fyers login, data and strategy tools.")
+    parser.add_argument('--config', default='Config.yaml')
+    parser.add_argument('--timings', action='store_true', help="print import and startup timings")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    login = commands.add_parser('login', help="run the OTP/PIN login and save auth_tokens.json")
+    login.set_defaults(func=cmd_login)
+
+    health = commands.add_parser('health', help="check the cached access token")
+    health.add_argument('--token-file', default='auth_tokens.json')
+    health.add_argument('--validate', action='store_true', help="also call get_profile")
+    health.set_defaults(func=cmd_health)
+
+    fetch = commands.add_parser('fetch', help="download missing history into the local store")
+    fetch.add_argument('symbols', nargs='+')
+    fetch.add_argument('--resolution', default='1')
+    fetch.add_argument('--days', type=int, default=30)
+    fetch.add_argument('--store', default='history_store')
+    fetch.set_defaults(func=cmd_fetch)
+
+    run = commands.add_parser('run-strategy', help="run the 04.py EMA crossover strategy")
+    run.add_argument('--stream', action='store_true', help="use websocket bars instead of polling")
+    run.add_argument('--record', default=None, metavar='PATH', help="with --stream, append every tick to a tick log")
+    run.add_argument('--runtime', action='store_true', help="run it as a plug-in of the strategy runtime")
+    run.add_argument('--ticker', default="NSE:NIFTYBANK-INDEX")
+    run.add_argument('--interval', default='5')
+    run.set_defaults(func=cmd_run_strategy)
+
+    backtest = commands.add_parser('backtest', help="sweep EMA lengths over stored history")
+    backtest.add_argument('symbol')
+    backtest.add_argument('--resolution', default='5')
+    backtest.add_argument('--from', dest='range_from', required=True)
+    backtest.add_argument('--to', dest='range_to', required=True)
+    backtest.add_argument('--short', type=_parse_range, default=range(2, 21), help="start:stop[:step]")
+    backtest.add_argument('--long', type=_parse_range, default=range(10, 101, 5), help="start:stop[:step]")
+    backtest.add_argument('--slippage-bps', type=float, default=1.0)
+    backtest.add_argument('--brokerage', type=float, default=20.0)
+    backtest.add_argument('--quantity', type=int, default=1)
+    backtest.add_argument('--workers', type=int, default=None)
+    backtest.add_argument('--top', type=int, default=20)
+    backtest.add_argument('--store', default='history_store')
+    backtest.set_defaults(func=cmd_backtest)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    ready = time.perf_counter()
+    try:
+        return args.func(args)
+    finally:
+        if args.timings:
+            print(f"cli start-up: {(ready - _started) * 1000:.1f} ms", file=sys.stderr)
+            for name, seconds in _import_times.items():
+                print(f"import {name}: {seconds * 1000:.1f} ms", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -17,12 +17,14 @@ def load_config(config_path="Config.yaml"):
         return None
     
 
-def save_auth_tokens(auth_code, access_token, file_path='auth_tokens.json'):
-    """Save the auth_code and access_token to a JSON file."""
+def save_auth_tokens(auth_code, access_token, file_path='auth_tokens.json', expires_at=None):
+    """Save the auth_code and access_token (and optionally its expiry epoch) to a JSON file."""
     tokens = {
         "auth_code": auth_code,
         "access_token": access_token
     }
+    if expires_at is not None:
+        tokens["expires_at"] = expires_at
     
     with open(file_path, 'w') as file:
         json.dump(tokens, file, indent=4)
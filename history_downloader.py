@@ -0,0 +1,137 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, datetime, timedelta
+
+import numpy as np
+from logzero import logger
+
+from candle_utils import candles_to_records, records_to_dataframe
+from rate_limiter import ScheduledFyers, TokenBucket
+
+# Longest range (in days) a single history request may cover per resolution
+MAX_DAYS_PER_REQUEST = {"D": 366, "1D": 366}
+DEFAULT_MAX_DAYS = 100
+
+# Fyers allows 10 requests per second per app
+DEFAULT_RATE_LIMIT = 10
+
+
+def _to_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value), "%Y-%m-%d").date()
+
+
+def split_date_range(range_from, range_to, resolution="1"):
+    """Splits an inclusive date range into windows the history API accepts for this resolution."""
+    start, end = _to_date(range_from), _to_date(range_to)
+    max_days = MAX_DAYS_PER_REQUEST.get(str(resolution).upper(), DEFAULT_MAX_DAYS)
+    windows = []
+    while start <= end:
+        window_end = min(start + timedelta(days=max_days - 1), end)
+        windows.append((start, window_end))
+        start = window_end + timedelta(days=1)
+    return windows
+
+
+def fetch_window(fyers, symbol, resolution, start, end, limiter=None, retries=3, backoff=1.0, with_oi=False):
+    """Fetches one history window, retrying with exponential backoff on errors and throttling."""
+    data = {
+        "symbol": symbol,
+        "resolution": resolution,
+        "date_format": "1",
+        "range_from": str(start),
+        "range_to": str(end),
+        "cont_flag": "1"
+    }
+    if with_oi:
+        data['oi_flag'] = "1"
+
+    for attempt in range(retries + 1):
+        if limiter is not None:
+            limiter.acquire()
+        try:
+            response = fyers.history(data=data)
+            if response.get('s') == 'no_data':
+                return []
+            if 'candles' in response:
+                return response['candles']
+            error = f"unexpected response {response}"
+        except Exception as e:
+            error = e
+        if attempt < retries:
+            delay = backoff * (2 ** attempt)
+            logger.warning(f"History {symbol} {start}..{end} failed ({error}), retrying in {delay:.1f}s")
+            time.sleep(delay)
+    raise RuntimeError(f"History {symbol} {start}..{end} failed after {retries + 1} attempts: {error}")
+
+
+def merge_candles(chunks, with_oi=False):
+    """Concatenates candle chunks once, sorts by date and drops duplicate bars (the last copy wins)."""
+    candles = [candle for chunk in chunks for candle in chunk]
+    records = candles_to_records(candles, with_oi=with_oi)
+    if len(records) == 0:
+        return records
+    # Reverse so np.unique keeps the last occurrence of each timestamp
+    reversed_dates = records['date'][::-1]
+    _, first_idx = np.unique(reversed_dates, return_index=True)
+    keep = np.sort(len(records) - 1 - first_idx)
+    return records[keep]
+
+
+def download_many(fyers, symbols, range_from, range_to, resolution="1", max_workers=8,
+                  limiter=None, retries=3, with_oi=False, as_records=False, skip_failed=False):
+    """
+    Downloads history for several symbols concurrently.
+
+    Every (symbol, window) pair is submitted to one bounded thread pool, all
+    requests share a token bucket so the pool never exceeds the API rate
+    limit (a ScheduledFyers already is rate limited, so no extra bucket is
+    added for it). Returns a dict of symbol -> DataFrame indexed by IST date, or
+    symbol -> candle structured array when `as_records` is set. A window that
+    still fails after all retries raises a RuntimeError naming every missing
+    window; with `skip_failed`, the affected symbols are left out of the
+    result instead.
+    """
+    if limiter is None and not isinstance(fyers, ScheduledFyers):
+        limiter = TokenBucket(DEFAULT_RATE_LIMIT)
+    windows = split_date_range(range_from, range_to, resolution)
+    chunks = {symbol: [None] * len(windows) for symbol in symbols}
+    failed = {}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {
+            pool.submit(fetch_window, fyers, symbol, resolution, start, end, limiter, retries, 1.0, with_oi): (symbol, i)
+            for symbol in symbols
+            for i, (start, end) in enumerate(windows)
+        }
+        for future in as_completed(futures):
+            symbol, i = futures[future]
+            try:
+                chunks[symbol][i] = future.result()
+            except Exception as e:
+                logger.error(f"Giving up on {symbol} window {windows[i][0]}..{windows[i][1]}: {e}")
+                failed.setdefault(symbol, []).append(windows[i])
+
+    if failed and not skip_failed:
+        missing = "; ".join(f"{symbol} " + ", ".join(f"{start}..{end}" for start, end in sorted(spans))
+                            for symbol, spans in failed.items())
+        raise RuntimeError(f"History download incomplete, missing windows: {missing}")
+
+    results = {}
+    for symbol in symbols:
+        if symbol in failed:
+            continue
+        records = merge_candles(chunks[symbol], with_oi=with_oi)
+        results[symbol] = records if as_records else records_to_dataframe(records)
+        logger.info(f"Downloaded {len(results[symbol])} bars for {symbol} ({len(windows)} windows).")
+    return results
+
+
+def download_history(fyers, symbol, range_from, range_to, resolution="1", max_workers=4,
+                     limiter=None, retries=3, with_oi=False):
+    """Downloads history for one symbol over any date range, raises if any window fails, see download_many."""
+    return download_many(fyers, [symbol], range_from, range_to, resolution, max_workers,
+                         limiter, retries, with_oi)[symbol]
@@ -0,0 +1,187 @@
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+
+import numpy as np
+from pytz import timezone
+from logzero import logger
+
+from candle_utils import CANDLE_OI_DTYPE, records_to_dataframe
+from history_downloader import _to_date, download_many
+
+IST_OFFSET_SECONDS = 19800  # UTC+05:30
+
+
+def _safe_name(value):
+    """Turns a symbol like NSE:NIFTYBANK-INDEX into a directory name."""
+    return str(value).replace(':', '_').replace('/', '_')
+
+
+def _ist_day(epochs):
+    """Returns the IST calendar day (days since epoch) for an array of epoch seconds."""
+    return (epochs + IST_OFFSET_SECONDS) // 86400
+
+
+class HistoryStore:
+    """
+    On-disk columnar candle store.
+
+    Bars are partitioned as <root>/<symbol>/<resolution>/<YYYY-MM-DD>/<column>.npy,
+    one plain .npy file per column so reads are memory-mapped and only the
+    requested columns are touched. Each (symbol, resolution) directory keeps an
+    index.json listing the days already fully downloaded, including days without
+    bars (weekends and holidays), so only the gaps are requested from Fyers.
+    """
+
+    def __init__(self, root='history_store'):
+        self.root = root
+        self._lock = threading.Lock()
+
+    def _series_dir(self, symbol, resolution):
+        return os.path.join(self.root, _safe_name(symbol), _safe_name(resolution))
+
+    def _index_path(self, symbol, resolution):
+        return os.path.join(self._series_dir(symbol, resolution), 'index.json')
+
+    def covered_days(self, symbol, resolution):
+        """Returns the set of days (YYYY-MM-DD strings) stored completely."""
+        path = self._index_path(symbol, resolution)
+        if not os.path.exists(path):
+            return set()
+        with open(path, 'r') as file:
+            return set(json.load(file).get('days', []))
+
+    def _save_index(self, symbol, resolution, days):
+        path = self._index_path(symbol, resolution)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as file:
+            json.dump({"days": sorted(days)}, file, indent=1)
+        os.replace(tmp_path, path)
+
+    def missing_ranges(self, symbol, resolution, start, end):
+        """Returns contiguous (start, end) date ranges inside [start, end] not yet stored."""
+        covered = self.covered_days(symbol, resolution)
+        start, end = _to_date(start), _to_date(end)
+        ranges = []
+        gap_start = None
+        day = start
+        while day <= end:
+            if str(day) in covered:
+                if gap_start is not None:
+                    ranges.append((gap_start, day - timedelta(days=1)))
+                    gap_start = None
+            elif gap_start is None:
+                gap_start = day
+            day += timedelta(days=1)
+        if gap_start is not None:
+            ranges.append((gap_start, end))
+        return ranges
+
+    def write_records(self, symbol, resolution, records, start, end):
+        """
+        Stores candle records and marks every day in [start, end] as covered.
+
+        Pass an `end` before today for complete days only, bars of the current
+        session are still forming and should not be marked as covered.
+        """
+        start, end = _to_date(start), _to_date(end)
+        series_dir = self._series_dir(symbol, resolution)
+        days = _ist_day(records['date']) if len(records) else np.empty(0, dtype=np.int64)
+
+        with self._lock:
+            os.makedirs(series_dir, exist_ok=True)
+            for day_number in np.unique(days):
+                day = (datetime(1970, 1, 1) + timedelta(days=int(day_number))).date()
+                if not start <= day <= end:
+                    continue
+                day_records = records[days == day_number]
+                day_dir = os.path.join(series_dir, str(day))
+                os.makedirs(day_dir, exist_ok=True)
+                for name in day_records.dtype.names:
+                    np.save(os.path.join(day_dir, f'{name}.npy'), np.ascontiguousarray(day_records[name]))
+
+            covered = self.covered_days(symbol, resolution)
+            day = start
+            while day <= end:
+                covered.add(str(day))
+                day += timedelta(days=1)
+            self._save_index(symbol, resolution, covered)
+
+    def read_columns(self, symbol, resolution, start, end, columns=None):
+        """
+        Reads stored bars in [start, end] as a dict of column -> NumPy array.
+
+        Only the requested columns are opened. A single day is returned as
+        read-only memory maps without copying, several days are concatenated.
+        A requested column missing on any stored day (e.g. 'oi' for a series
+        downloaded without it) raises KeyError.
+        """
+        start, end = _to_date(start), _to_date(end)
+        series_dir = self._series_dir(symbol, resolution)
+        read_all = columns is None
+        if read_all:
+            columns = list(CANDLE_OI_DTYPE.names)
+        elif 'date' not in columns:
+            columns = ['date'] + list(columns)
+
+        parts = {name: [] for name in columns}
+        if os.path.isdir(series_dir):
+            for entry in sorted(os.listdir(series_dir)):
+                day_dir = os.path.join(series_dir, entry)
+                if not os.path.isdir(day_dir) or not str(start) <= entry <= str(end):
+                    continue
+                for name in columns:
+                    path = os.path.join(day_dir, f'{name}.npy')
+                    if os.path.exists(path):
+                        parts[name].append(np.load(path, mmap_mode='r'))
+
+        for name in list(columns):
+            if len(parts[name]) == len(parts['date']):
+                continue
+            # OI is only stored for series downloaded with oi_flag
+            if read_all and name == 'oi':
+                columns.remove(name)
+            else:
+                raise KeyError(f"Column '{name}' is not stored for every day of {symbol} ({resolution}) "
+                               f"between {start} and {end}")
+        dtypes = dict(CANDLE_OI_DTYPE.descr)
+        result = {}
+        for name in columns:
+            if not parts[name]:
+                result[name] = np.empty(0, dtype=dtypes.get(name, np.float64))
+            elif len(parts[name]) == 1:
+                result[name] = parts[name][0]
+            else:
+                result[name] = np.concatenate(parts[name])
+        return result
+
+    def read_dataframe(self, symbol, resolution, start, end, columns=None):
+        """Reads stored bars in [start, end] as a DataFrame indexed by IST date."""
+        data = self.read_columns(symbol, resolution, start, end, columns)
+        records = np.empty(len(data['date']), dtype=[(name, data[name].dtype) for name in data])
+        for name in data:
+            records[name] = data[name]
+        return records_to_dataframe(records)
+
+    def load(self, fyers, symbol, resolution, start, end, columns=None, with_oi=False):
+        """Returns bars in [start, end], downloading and storing only the missing days first."""
+        self.fill_gaps(fyers, [symbol], resolution, start, end, with_oi=with_oi)
+        return self.read_dataframe(symbol, resolution, start, end, columns)
+
+    def fill_gaps(self, fyers, symbols, resolution, start, end, with_oi=False, max_workers=8):
+        """Downloads and stores every missing day in [start, end] for several symbols."""
+        # Today's bars are still forming, never mark the current session as covered
+        end = min(_to_date(end), datetime.now(timezone('Asia/Kolkata')).date() - timedelta(days=1))
+        # Symbols usually share the same gaps, download each gap for all of them at once
+        gaps = {}
+        for symbol in symbols:
+            for gap in self.missing_ranges(symbol, resolution, start, end):
+                gaps.setdefault(gap, []).append(symbol)
+        for (gap_start, gap_end), gap_symbols in gaps.items():
+            logger.info(f"History store gap {gap_start}..{gap_end} ({resolution}) for {len(gap_symbols)} symbols")
+            results = download_many(fyers, gap_symbols, gap_start, gap_end, resolution,
+                                    max_workers=max_workers, with_oi=with_oi, as_records=True,
+                                    skip_failed=True)
+            for symbol, records in results.items():
+                self.write_records(symbol, resolution, records, gap_start, gap_end)
@@ -0,0 +1,141 @@
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from logzero import logger
+
+from metrics import get_registry
+
+DEFAULT_TIMEOUT = 10
+
+
+class CountingRetry(Retry):
+    """urllib3 Retry that counts every retry in the `http_retries_total` metric."""
+
+    def increment(self, method=None, url=None, *args, **kwargs):
+        get_registry().inc("http_retries_total", method=method or "")
+        return super().increment(method, url, *args, **kwargs)
+
+
+class LatencyStats:
+    """Per-endpoint request counters and latency (count, errors, total/min/max/last seconds)."""
+
+    def __init__(self):
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, seconds, error=False):
+        with self._lock:
+            stats = self._stats.get(endpoint)
+            if stats is None:
+                stats = self._stats[endpoint] = {"count": 0, "errors": 0, "total": 0.0,
+                                                 "min": float('inf'), "max": 0.0, "last": 0.0}
+            stats['count'] += 1
+            stats['errors'] += int(error)
+            stats['total'] += seconds
+            stats['min'] = min(stats['min'], seconds)
+            stats['max'] = max(stats['max'], seconds)
+            stats['last'] = seconds
+
+    def snapshot(self):
+        """Returns endpoint -> stats dict, with the mean latency added."""
+        with self._lock:
+            return {endpoint: dict(stats, mean=stats['total'] / stats['count'])
+                    for endpoint, stats in self._stats.items()}
+
+
+class PooledSession(requests.Session):
+    """
+    requests.Session with keep-alive connection pools, retries with backoff,
+    a default timeout and latency tracking per endpoint (method + path),
+    also recorded in the `http_request_seconds` histogram of the metrics registry.
+
+    Idempotent requests are retried on connection errors and on 429/5xx
+    responses (honouring Retry-After). POSTs are only retried when the
+    connection could not be established, so an OTP is never sent twice.
+    """
+
+    def __init__(self, retries=3, backoff_factor=0.5, pool_maxsize=20, timeout=DEFAULT_TIMEOUT):
+        super().__init__()
+        self.timeout = timeout
+        self.latency = LatencyStats()
+        retry = CountingRetry(
+            total=retries,
+            connect=retries,
+            read=retries,
+            status=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(429, 500, 502, 503, 504),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=10, pool_maxsize=pool_maxsize, max_retries=retry)
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+
+    def request(self, method, url, *args, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        endpoint = f"{method.upper()} {urlparse(url).netloc}{urlparse(url).path}"
+        start = time.perf_counter()
+        try:
+            response = super().request(method, url, *args, **kwargs)
+        except Exception:
+            self._record(endpoint, time.perf_counter() - start, error=True)
+            raise
+        self._record(endpoint, time.perf_counter() - start, error=response.status_code >= 400)
+        return response
+
+    def _record(self, endpoint, seconds, error):
+        self.latency.record(endpoint, seconds, error=error)
+        registry = get_registry()
+        registry.observe("http_request_seconds", seconds, endpoint=endpoint)
+        if error:
+            registry.inc("http_errors_total", endpoint=endpoint)
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """Returns the process-wide PooledSession, creating it on first use."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = PooledSession()
+    return _session
+
+
+def get_latency_stats():
+    """Latency stats of every endpoint called through the shared session."""
+    return get_session().latency.snapshot()
+
+
+class _SessionRequests:
+    """Stand-in for the `requests` module that sends get/post/put/patch/delete through a session."""
+
+    def __init__(self, session):
+        self._session = session
+
+    def __getattr__(self, name):
+        if name in ('get', 'post', 'put', 'patch', 'delete', 'head', 'request'):
+            return getattr(self._session, name)
+        return getattr(requests, name)
+
+
+def install_fyers_transport(session=None):
+    """
+    Routes fyers_apiv3 REST calls through the shared pooled session.
+
+    The SDK calls requests.get/post for every API call, which opens a new
+    TLS connection each time and has no timeout. This swaps the `requests`
+    name inside fyers_apiv3.fyersModel for one bound to the session.
+    """
+    from fyers_apiv3 import fyersModel
+
+    fyersModel.requests = _SessionRequests(session or get_session())
+    logger.info("Fyers API calls now use the pooled HTTP session.")
@@ -0,0 +1,338 @@
+"""
+NumPy indicator library.
+
+Indicators are registered with @indicator and computed through an
+IndicatorContext, which holds the OHLCV columns of one symbol (1D arrays) or
+of many symbols at once ((symbols x bars) panels) and memoizes every
+intermediate result by name and parameters. Supertrend asking for the ATR
+therefore reuses the one (and its true range) already computed, and the EMAs
+of a crossover are computed once no matter how many strategies read them.
+
+    ctx = IndicatorContext.from_frame(data)
+    ctx.compute('supertrend', length=10, multiplier=3)
+
+Loops that cannot be vectorized (Supertrend) are compiled with numba when it
+is installed and fall back to a loop over bars vectorized across symbols.
+"""
+import numpy as np
+import pandas as pd
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+from metrics import timer
+
+IST_OFFSET_SECONDS = 19800  # UTC+05:30
+
+INDICATORS = {}
+
+
+def indicator(name):
+    """Registers `func(ctx, **params)` as indicator `name`."""
+    def register(func):
+        INDICATORS[name] = func
+        return func
+    return register
+
+
+def spec_name(name, params):
+    """Column name of an indicator result, e.g. ema_3 or supertrend_10_3."""
+    return "_".join([name] + [f"{value:g}" if isinstance(value, float) else str(value)
+                              for _, value in sorted(params.items())])
+
+
+class IndicatorContext:
+    """
+    OHLCV columns plus a memo of every indicator computed over them.
+
+    Columns are float64 arrays of shape (bars,) or (symbols, bars); `date`
+    holds the bar start in epoch seconds and is shared by all symbols.
+    """
+
+    def __init__(self, columns):
+        self.columns = {name: np.asarray(values, dtype=np.int64 if name == 'date' else np.float64)
+                        for name, values in columns.items()}
+        self._memo = {}
+
+    @classmethod
+    def from_frame(cls, data):
+        """Context over one candle DataFrame indexed by time."""
+        columns = {name: data[name].to_numpy(dtype=np.float64) for name in ('open', 'high', 'low', 'close', 'volume')
+                   if name in data}
+        columns['date'] = _index_epochs(data.index)
+        return cls(columns)
+
+    @classmethod
+    def from_frames(cls, frames):
+        """
+        Context over several candle frames aligned on their timestamps.
+
+        Returns (symbols, index, context); bars a symbol has not traded in carry
+        its last close forward with zero volume.
+        """
+        symbols = [symbol for symbol, frame in frames.items() if not frame.empty]
+        if not symbols:
+            return [], pd.DatetimeIndex([]), cls({})
+        close = pd.concat([frames[s]['close'] for s in symbols], axis=1, keys=symbols, sort=True).ffill()
+        columns = {'close': close.to_numpy(dtype=np.float64, copy=True).T}
+        for name in ('open', 'high', 'low'):
+            if all(name in frames[s] for s in symbols):
+                panel = pd.concat([frames[s][name] for s in symbols], axis=1, keys=symbols, sort=True)
+                columns[name] = panel.fillna(close).to_numpy(dtype=np.float64, copy=True).T
+        if all('volume' in frames[s] for s in symbols):
+            volume = pd.concat([frames[s]['volume'] for s in symbols], axis=1, keys=symbols, sort=True)
+            columns['volume'] = volume.fillna(0).to_numpy(dtype=np.float64, copy=True).T
+        columns['date'] = _index_epochs(close.index)
+        return symbols, close.index, cls(columns)
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def compute(self, name, **params):
+        """Result of indicator `name` (an array, or a dict of arrays), computed at most once per context."""
+        key = (name, tuple(sorted(params.items())))
+        if key not in self._memo:
+            with timer("indicator_seconds", indicator=name):
+                self._memo[key] = INDICATORS[name](self, **params)
+        return self._memo[key]
+
+    def compute_many(self, specs):
+        """Computes [(name, params), ...] and returns column name -> array, multi-output results flattened."""
+        results = {}
+        for name, params in specs:
+            value = self.compute(name, **params)
+            column = spec_name(name, params)
+            if isinstance(value, dict):
+                results.update({f"{column}_{part}": array for part, array in value.items()})
+            else:
+                results[column] = value
+        return results
+
+
+def _index_epochs(index):
+    if isinstance(index, pd.DatetimeIndex):
+        if index.tz is None:
+            index = index.tz_localize('Asia/Kolkata')
+        return index.as_unit('s').asi8
+    return np.asarray(index, dtype=np.int64)
+
+
+def seeded_ewm(values, length, alpha):
+    """
+    Exponential smoothing over the last axis of a 1D or 2D array.
+
+    The first `length` values are replaced by their SMA as a seed, then pandas'
+    ewm(adjust=False) runs the recursion in C. Leading NaNs (symbols with a
+    shorter history) are skipped per row before seeding.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    panel = np.array(np.atleast_2d(values), copy=True)
+    n_bars = panel.shape[1]
+    valid = ~np.isnan(panel)
+    first = np.where(valid.any(axis=1), valid.argmax(axis=1), n_bars)
+    seed_at = first + length - 1
+
+    # SMA seed of each row's first `length` values via a running sum
+    csum = np.cumsum(np.where(valid, panel, 0.0), axis=1)
+    rows = np.nonzero(seed_at < n_bars)[0]
+    before = np.where(first[rows] > 0, csum[rows, np.maximum(first[rows] - 1, 0)], 0.0)
+    seeds = (csum[rows, seed_at[rows]] - before) / length
+    panel[np.arange(n_bars) < seed_at[:, None]] = np.nan
+    panel[rows, seed_at[rows]] = seeds
+
+    out = pd.DataFrame(panel.T).ewm(alpha=alpha, adjust=False).mean().to_numpy().T
+    return out if values.ndim == 2 else out[0]
+
+
+def ema(values, length):
+    """
+    Exponential moving average over the last axis of a 1D or 2D array.
+
+    Same definition as pandas_ta.ema: SMA seed, then alpha = 2 / (length + 1).
+    """
+    return seeded_ewm(values, length, 2.0 / (length + 1))
+
+
+def rma(values, length):
+    """Wilder's moving average (alpha = 1 / length) with an SMA seed, as used by RSI and ATR."""
+    return seeded_ewm(values, length, 1.0 / length)
+
+
+def sma(values, length):
+    """Simple moving average over the last axis via a running sum."""
+    values = np.asarray(values, dtype=np.float64)
+    csum = np.cumsum(values, axis=-1)
+    out = np.full(values.shape, np.nan)
+    out[..., length - 1:] = csum[..., length - 1:]
+    out[..., length:] -= csum[..., :-length]
+    out[..., length - 1:] /= length
+    return out
+
+
+def _shift(values, fill=np.nan):
+    """Values of the previous bar along the last axis."""
+    shifted = np.empty_like(values)
+    shifted[..., 0] = fill
+    shifted[..., 1:] = values[..., :-1]
+    return shifted
+
+
+@indicator('sma')
+def _sma(ctx, length=20, source='close'):
+    return sma(ctx[source], length)
+
+
+@indicator('ema')
+def _ema(ctx, length=20, source='close'):
+    return ema(ctx[source], length)
+
+
+@indicator('rsi')
+def _rsi(ctx, length=14, source='close'):
+    change = np.diff(ctx[source], axis=-1, prepend=np.nan)
+    gain = rma(np.where(np.isnan(change), np.nan, np.maximum(change, 0.0))[..., 1:], length)
+    loss = rma(np.where(np.isnan(change), np.nan, np.maximum(-change, 0.0))[..., 1:], length)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rsi = 100.0 - 100.0 / (1.0 + gain / loss)
+    rsi = np.where(loss == 0, np.where(gain == 0, 50.0, 100.0), rsi)
+    rsi = np.where(np.isnan(gain), np.nan, rsi)
+    return np.concatenate([np.full(rsi.shape[:-1] + (1,), np.nan), rsi], axis=-1)
+
+
+@indicator('true_range')
+def _true_range(ctx):
+    high, low = ctx['high'], ctx['low']
+    prev_close = _shift(ctx['close'])
+    # fmax ignores the missing previous close of the first bar
+    return np.fmax(np.fmax(high - low, np.abs(high - prev_close)), np.abs(low - prev_close))
+
+
+@indicator('atr')
+def _atr(ctx, length=14):
+    return rma(ctx.compute('true_range'), length)
+
+
+@indicator('hl2')
+def _hl2(ctx):
+    return (ctx['high'] + ctx['low']) / 2.0
+
+
+def _supertrend_loop(close, upper, lower):
+    """Final bands and direction, one bar at a time, vectorized across symbols."""
+    final_upper, final_lower = upper.copy(), lower.copy()
+    direction = np.ones(close.shape, dtype=np.int8)
+    for i in range(1, close.shape[1]):
+        prev_close = close[:, i - 1]
+        keep_upper = (upper[:, i] > final_upper[:, i - 1]) & (prev_close <= final_upper[:, i - 1])
+        final_upper[:, i] = np.where(keep_upper, final_upper[:, i - 1], upper[:, i])
+        keep_lower = (lower[:, i] < final_lower[:, i - 1]) & (prev_close >= final_lower[:, i - 1])
+        final_lower[:, i] = np.where(keep_lower, final_lower[:, i - 1], lower[:, i])
+        prev = direction[:, i - 1]
+        direction[:, i] = np.where(close[:, i] > final_upper[:, i - 1], 1,
+                                   np.where(close[:, i] < final_lower[:, i - 1], -1, prev))
+    return final_upper, final_lower, direction
+
+
+def _supertrend_scalar(close, upper, lower):
+    final_upper, final_lower = upper.copy(), lower.copy()
+    direction = np.ones(close.shape, dtype=np.int8)
+    for s in range(close.shape[0]):
+        for i in range(1, close.shape[1]):
+            if upper[s, i] > final_upper[s, i - 1] and close[s, i - 1] <= final_upper[s, i - 1]:
+                final_upper[s, i] = final_upper[s, i - 1]
+            if lower[s, i] < final_lower[s, i - 1] and close[s, i - 1] >= final_lower[s, i - 1]:
+                final_lower[s, i] = final_lower[s, i - 1]
+            if close[s, i] > final_upper[s, i - 1]:
+                direction[s, i] = 1
+            elif close[s, i] < final_lower[s, i - 1]:
+                direction[s, i] = -1
+            else:
+                direction[s, i] = direction[s, i - 1]
+    return final_upper, final_lower, direction
+
+
+_supertrend_kernel = njit(cache=True)(_supertrend_scalar) if njit is not None else _supertrend_loop
+
+
+@indicator('supertrend')
+def _supertrend(ctx, length=10, multiplier=3.0):
+    """Supertrend line and direction (1 up, -1 down), bands from hl2 -/+ multiplier * ATR."""
+    atr = ctx.compute('atr', length=length)
+    hl2 = ctx.compute('hl2')
+    close = np.atleast_2d(ctx['close'])
+    upper = np.atleast_2d(hl2 + multiplier * atr)
+    lower = np.atleast_2d(hl2 - multiplier * atr)
+    final_upper, final_lower, direction = _supertrend_kernel(close, upper, lower)
+    line = np.where(direction > 0, final_lower, final_upper)
+    line[np.isnan(np.atleast_2d(atr))] = np.nan
+    if np.ndim(ctx['close']) == 1:
+        line, direction = line[0], direction[0]
+    return {"line": line, "direction": direction}
+
+
+@indicator('vwap')
+def _vwap(ctx):
+    """Session VWAP of the typical price, restarting at the first bar of every IST day."""
+    typical = (ctx['high'] + ctx['low'] + ctx['close']) / 3.0
+    volume = ctx['volume']
+    day = (ctx['date'] + IST_OFFSET_SECONDS) // 86400
+    starts = np.flatnonzero(np.r_[True, day[1:] != day[:-1]])
+    # Cumulative sums restarted per day: subtract the running total at each day's start
+    session = np.repeat(starts, np.diff(np.r_[starts, len(day)]))
+    pv = np.cumsum(typical * volume, axis=-1)
+    vv = np.cumsum(volume, axis=-1)
+    pv_before = np.where(session > 0, pv[..., np.maximum(session - 1, 0)], 0.0)
+    vv_before = np.where(session > 0, vv[..., np.maximum(session - 1, 0)], 0.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return (pv - pv_before) / (vv - vv_before)
+
+
+def compute_batch(frames, specs):
+    """
+    Computes `specs` ([(name, params), ...]) for many symbols in one pass over aligned panels.
+
+    Returns symbol -> DataFrame of indicator columns on the common index.
+    """
+    symbols, index, ctx = IndicatorContext.from_frames(frames)
+    results = ctx.compute_many(specs)
+    return {symbol: pd.DataFrame({column: np.atleast_2d(values)[row] for column, values in results.items()},
+                                 index=index)
+            for row, symbol in enumerate(symbols)}
+
+
+class IndicatorCache:
+    """
+    Memoizes indicator results per (symbol, resolution, last bar).
+
+    The last bar is identified by its time, close and volume, so a forming bar
+    that changed since the previous call is recomputed while repeated calls on
+    the same data (several strategies, or a poll that returned nothing new)
+    reuse the stored arrays.
+    """
+
+    def __init__(self):
+        self._entries = {}
+
+    def context(self, symbol, resolution, data):
+        """The IndicatorContext over `data`, reused while its last bar is unchanged."""
+        last = data.iloc[-1]
+        bar_key = (data.index[-1], len(data), float(last['close']), float(last.get('volume', 0)))
+        entry = self._entries.get((symbol, resolution))
+        if entry is None or entry[0] != bar_key:
+            entry = (bar_key, IndicatorContext.from_frame(data))
+            self._entries[(symbol, resolution)] = entry
+        return entry[1]
+
+    def compute(self, symbol, resolution, data, specs):
+        """Returns column name -> array for `specs` over the candle frame `data`."""
+        if data.empty:
+            return {}
+        return self.context(symbol, resolution, data).compute_many(specs)
+
+    def invalidate(self, symbol=None):
+        if symbol is None:
+            self._entries.clear()
+        else:
+            self._entries = {key: value for key, value in self._entries.items() if key[0] != symbol}
@@ -0,0 +1,185 @@
+import atexit
+import json
+import logging
+import queue
+import threading
+import traceback
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, TimedRotatingFileHandler
+
+import logzero
+
+from metrics import get_registry
+
+# Attributes every LogRecord has, anything else was passed through `extra=`
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+
+
+class Lazy:
+    """
+    Log argument that is only rendered when the record is written.
+
+        logger.debug("Bars: %s", Lazy(data.tail, 5))
+
+    Nothing is computed when the level is disabled or the record is sampled
+    out, and otherwise the work happens on the listener thread, so the
+    arguments must not be mutated after the call.
+    """
+
+    __slots__ = ('func', 'args', 'kwargs')
+
+    def __init__(self, func, *args, **kwargs):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+
+    def __str__(self):
+        return str(self.func(*self.args, **self.kwargs))
+
+    __repr__ = __str__
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, module, line, thread, message, extras and exception."""
+
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created).astimezone().isoformat(timespec='milliseconds'),
+            "level": record.levelname,
+            "logger": record.name,
+            "module": record.module,
+            "line": record.lineno,
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        for name, value in vars(record).items():
+            if name not in _RECORD_ATTRIBUTES:
+                entry[name] = value
+        if record.exc_info:
+            entry["exception"] = "".join(traceback.format_exception(*record.exc_info))
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps one in `every` records at or below `level` from each call site.
+
+    Records above `level` always pass, so a debug line inside a tick loop
+    can stay in the code without flooding the log.
+    """
+
+    def __init__(self, every=100, level=logging.DEBUG):
+        super().__init__()
+        self.every = every
+        self.level = level
+        self._seen = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno > self.level:
+            return True
+        key = (record.pathname, record.lineno)
+        with self._lock:
+            seen = self._seen.get(key, 0)
+            self._seen[key] = seen + 1
+        return seen % self.every == 0
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    QueueHandler that never formats or waits on the calling thread.
+
+    The record is queued as is (the listener formats it), and when the queue
+    is full the record is dropped instead of blocking, counted in `dropped`
+    and in the log_records_dropped_total metric.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            get_registry().inc("log_records_dropped_total")
+
+
+class _Listener(QueueListener):
+    def prepare(self, record):
+        # Render the message once, size rotation formats the record a second time
+        record.msg, record.args = record.getMessage(), None
+        return record
+
+
+def file_handler(path, max_bytes=20 * 1024 * 1024, backup_count=5, when=None):
+    """Rotating file handler: by time when `when` is given ('midnight', 'H', ...), by size otherwise."""
+    if when:
+        return TimedRotatingFileHandler(path, when=when, backupCount=backup_count, encoding='utf-8')
+    return RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8')
+
+
+_listener = None
+_atexit_registered = False
+
+
+def stop_logging():
+    """Writes out everything still queued and stops the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def setup_logging(path="fyers_strategy.log", level=logging.DEBUG, file_level=logging.INFO, json_format=True,
+                  max_bytes=20 * 1024 * 1024, backup_count=5, when=None, sample_every=None, console=True,
+                  queue_size=10000):
+    """
+    Moves logzero's default `logger` onto a queue-based backend.
+
+    Logging calls only put the record on a bounded queue; a QueueListener
+    thread formats it and writes it to the rotating file (JSON lines by
+    default) and the console. With `sample_every`, debug records are sampled
+    per call site before they are queued. Calling it again replaces the
+    previous setup. Returns the QueueListener, which is stopped (and the
+    queue drained) at exit.
+    """
+    global _listener, _atexit_registered
+    stop_logging()
+
+    handlers = []
+    if path:
+        handler = file_handler(path, max_bytes, backup_count, when)
+        handler.setLevel(file_level)
+        handler.setFormatter(JsonFormatter() if json_format else logzero.LogFormatter(color=False))
+        handlers.append(handler)
+    if console:
+        handler = logging.StreamHandler()
+        handler.setLevel(level)
+        handler.setFormatter(logzero.LogFormatter())
+        handlers.append(handler)
+
+    log_queue = queue.Queue(maxsize=queue_size)
+    queue_handler = NonBlockingQueueHandler(log_queue)
+    if sample_every:
+        queue_handler.addFilter(SamplingFilter(sample_every))
+
+    logger = logzero.logger
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    logger.addHandler(queue_handler)
+    logger.setLevel(min([level, file_level] if path else [level]))
+    logger.propagate = False
+
+    _listener = _Listener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    if not _atexit_registered:
+        atexit.register(stop_logging)
+        _atexit_registered = True
+    return _listener
@@ -0,0 +1,123 @@
+import threading
+import time
+from datetime import date, datetime, timedelta
+from datetime import time as dtime
+
+from logzero import logger
+
+from market_data import IST, RESOLUTION_SECONDS
+
+# NSE cash/F&O session, intraday bars are anchored at the open
+SESSION_OPEN = dtime(9, 15)
+SESSION_CLOSE = dtime(15, 30)
+
+
+def _to_date(value):
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value), "%Y-%m-%d").date()
+
+
+def seconds_to_boundary(period, now=None):
+    """Seconds left until the next multiple of `period` seconds of the epoch (e.g. a TOTP window)."""
+    now = time.time() if now is None else now
+    return period - (now % period)
+
+
+class MarketClock:
+    """
+    Knows the NSE session and sleeps until the next bar close.
+
+    Bars of every intraday resolution start at 09:15 IST, the last one of the
+    day is cut short by the 15:30 close. wait_for_bar_close() blocks until the
+    earliest upcoming close of the given resolutions plus `grace` seconds, so
+    the exchange has finalised the bar before it is fetched. Weekends and the
+    listed holidays are skipped entirely, so outside market hours the caller
+    simply sleeps until the first bar of the next session closes.
+    """
+
+    def __init__(self, holidays=(), grace=1.0, session_open=SESSION_OPEN, session_close=SESSION_CLOSE):
+        self.holidays = {_to_date(day) for day in holidays}
+        self.grace = grace
+        self.session_open = session_open
+        self.session_close = session_close
+        self._stop = threading.Event()
+
+    @classmethod
+    def from_config(cls, config):
+        """Reads an optional `market: {holidays: [YYYY-MM-DD, ...], grace: 1.0}` section."""
+        market = (config or {}).get('market') or {}
+        return cls(holidays=market.get('holidays') or (), grace=market.get('grace', 1.0))
+
+    def now(self):
+        return datetime.now(IST)
+
+    def is_trading_day(self, day):
+        return day.weekday() < 5 and day not in self.holidays
+
+    def session_bounds(self, day):
+        """(open, close) of `day` as IST datetimes."""
+        return (IST.localize(datetime.combine(day, self.session_open)),
+                IST.localize(datetime.combine(day, self.session_close)))
+
+    def is_open(self, now=None):
+        now = now or self.now()
+        if not self.is_trading_day(now.date()):
+            return False
+        session_open, session_close = self.session_bounds(now.date())
+        return session_open <= now < session_close
+
+    def next_session(self, now=None):
+        """(open, close) of the current session if it has not closed yet, otherwise of the next one."""
+        now = now or self.now()
+        day = now.date()
+        while True:
+            if self.is_trading_day(day):
+                session_open, session_close = self.session_bounds(day)
+                if now < session_close:
+                    return session_open, session_close
+            day += timedelta(days=1)
+
+    def next_bar_close(self, resolution, now=None):
+        """IST datetime at which the bar of `resolution` forming at `now` (or the next session's first bar) closes."""
+        now = now or self.now()
+        session_open, session_close = self.next_session(now)
+        bar_seconds = RESOLUTION_SECONDS[str(resolution)]
+        if bar_seconds >= RESOLUTION_SECONDS["D"]:
+            return session_close
+        elapsed = max((now - session_open).total_seconds(), 0)
+        close = session_open + timedelta(seconds=(int(elapsed // bar_seconds) + 1) * bar_seconds)
+        return min(close, session_close)
+
+    def next_close(self, resolutions, now=None):
+        """The earliest upcoming bar close of `resolutions` and the resolutions closing then."""
+        now = now or self.now()
+        closes = {str(r): self.next_bar_close(r, now) for r in resolutions}
+        earliest = min(closes.values())
+        return earliest, [r for r, close in closes.items() if close == earliest]
+
+    def sleep_until(self, moment):
+        """Sleeps until the IST datetime `moment`, returns False if stop() was called meanwhile."""
+        while True:
+            remaining = (moment - self.now()).total_seconds()
+            if remaining <= 0:
+                return True
+            # Re-check the wall clock at least once a minute so long idles do not drift
+            if self._stop.wait(min(remaining, 60)):
+                return False
+
+    def wait_for_bar_close(self, resolutions):
+        """
+        Blocks until the next bar close of any of `resolutions` plus the grace period.
+
+        Returns (close_time, closed_resolutions), or None if stop() was called.
+        """
+        close, closed = self.next_close(resolutions)
+        if not self.is_open():
+            logger.info(f"Market closed, idling until {close:%Y-%m-%d %H:%M}.")
+        if not self.sleep_until(close + timedelta(seconds=self.grace)):
+            return None
+        return close, closed
+
+    def stop(self):
+        self._stop.set()
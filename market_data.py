@@ -0,0 +1,130 @@
+from datetime import datetime, timedelta
+
+import pandas as pd
+from pytz import timezone
+from logzero import logger
+
+from candle_utils import candles_to_dataframe
+
+IST = timezone('Asia/Kolkata')
+
+# Resolution string -> bar length in seconds
+RESOLUTION_SECONDS = {
+    "1": 60, "2": 120, "3": 180, "5": 300, "10": 600, "15": 900, "20": 1200,
+    "30": 1800, "45": 2700, "60": 3600, "120": 7200, "180": 10800, "240": 14400,
+    "D": 86400, "1D": 86400,
+}
+
+
+# Fyers accepts up to 50 comma-separated symbols per quotes request
+MAX_QUOTES_PER_REQUEST = 50
+
+
+def batched(items, size):
+    """Yields consecutive chunks of at most `size` items."""
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def fetch_quotes(fyers, symbols, batch_size=MAX_QUOTES_PER_REQUEST, limiter=None):
+    """Fetches quotes for any number of symbols in as few requests as possible, returns symbol -> quote values."""
+    quotes = {}
+    for batch in batched(list(symbols), batch_size):
+        if limiter is not None:
+            limiter.acquire()
+        response = fyers.quotes(data={"symbols": ",".join(batch)})
+        if response.get('s') != 'ok':
+            logger.error(f"Quotes request failed for {len(batch)} symbols: {response}")
+            continue
+        for item in response.get('d', []):
+            if item.get('s') == 'ok':
+                quotes[item['n']] = item['v']
+    return quotes
+
+
+class CandleCache:
+    """
+    Keeps already-fetched candles per (symbol, resolution) in memory.
+
+    The first call downloads the whole lookback window. Later calls only ask
+    Fyers for the bars starting at the last cached candle, which is either the
+    still-forming bar or the last closed one, and overwrite it with the fresh
+    values before appending anything newer.
+
+    With a HistoryStore, the previous days of the lookback are read from disk
+    (downloading only the days it is missing) and only today's bars come from
+    the API on a cold start.
+    """
+
+    def __init__(self, fyers, with_oi=False, store=None):
+        self.fyers = fyers
+        self.with_oi = with_oi
+        self.store = store
+        self._frames = {}
+        self._last_epoch = {}
+
+    def _history(self, ticker, interval, range_from, range_to):
+        data = {
+            "symbol": ticker,
+            "resolution": interval,
+            "date_format": "0",
+            "range_from": str(int(range_from)),
+            "range_to": str(int(range_to)),
+            "cont_flag": "1"
+        }
+        if self.with_oi:
+            data['oi_flag'] = "1"
+        response = self.fyers.history(data=data)
+        if 'candles' not in response:
+            raise ValueError(f"Missing 'candles' key in response: {response}")
+        return response['candles']
+
+    def get_ohlc(self, ticker, interval, duration):
+        """Returns the last `duration` days of candles for ticker, fetching only what is new."""
+        key = (ticker, str(interval))
+        now = datetime.now(IST)
+        now_epoch = now.timestamp()
+        window_start = (now - timedelta(days=duration)).replace(hour=0, minute=0, second=0, microsecond=0)
+
+        cached = self._frames.get(key)
+        if cached is None and self.store is not None:
+            yesterday = now.date() - timedelta(days=1)
+            stored = self.store.load(self.fyers, ticker, interval, window_start.date(), yesterday,
+                                     with_oi=self.with_oi)
+            if not stored.empty:
+                cached = stored
+                self._last_epoch[key] = int(stored.index[-1].timestamp())
+
+        if cached is None:
+            logger.info(f"Candle cache miss for {ticker} ({interval}), fetching {duration} days.")
+            candles = self._history(ticker, interval, window_start.timestamp(), now_epoch)
+            frame = candles_to_dataframe(candles, with_oi=self.with_oi)
+            if candles:
+                self._last_epoch[key] = int(candles[-1][0])
+        else:
+            last_epoch = self._last_epoch.get(key, window_start.timestamp())
+            candles = self._history(ticker, interval, last_epoch, now_epoch)
+            frame = cached
+            if candles:
+                fresh = candles_to_dataframe(candles, with_oi=self.with_oi)
+                # Drop the cached copy of the forming bar (and anything after it) before appending
+                frame = pd.concat([cached[cached.index < fresh.index[0]], fresh])
+                self._last_epoch[key] = int(candles[-1][0])
+            logger.debug(f"Candle cache refreshed {ticker} ({interval}) with {len(candles)} bars.")
+
+        window_start = pd.Timestamp(window_start)
+        if not frame.empty and frame.index[0] < window_start:
+            frame = frame[frame.index >= window_start]
+        self._frames[key] = frame
+        # Callers add indicator columns to the result, keep the cached frame untouched
+        return frame.copy()
+
+    def invalidate(self, ticker=None, interval=None):
+        """Drops cached candles for one (ticker, interval) pair, or everything."""
+        if ticker is None:
+            self._frames.clear()
+            self._last_epoch.clear()
+            return
+        key = (ticker, str(interval))
+        self._frames.pop(key, None)
+        self._last_epoch.pop(key, None)
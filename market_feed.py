@@ -0,0 +1,207 @@
+import threading
+import time
+
+from logzero import logger
+
+from market_data import RESOLUTION_SECONDS
+
+IST_OFFSET_SECONDS = 19800      # UTC+05:30
+SESSION_START_SECONDS = 33300   # 09:15 IST, intraday bars are anchored here
+
+
+def bar_start(epoch, bar_seconds):
+    """Returns the start (epoch seconds) of the bar containing epoch, anchored at 09:15 IST."""
+    return epoch - ((epoch + IST_OFFSET_SECONDS - SESSION_START_SECONDS) % bar_seconds)
+
+
+class CandleAggregator:
+    """
+    Folds ticks into OHLCV candles for one or more resolutions.
+
+    A bar is closed and passed to `on_bar(symbol, resolution, bar)` as soon as a
+    tick for a later bar arrives, or when flush() is called after the bar end
+    plus `grace` seconds, so illiquid symbols still close on time. `bar` is a
+    dict with date (bar start, epoch seconds), open, high, low, close, volume.
+    """
+
+    def __init__(self, resolutions=('1', '5'), on_bar=None, grace=0.5):
+        self.resolutions = {str(r): RESOLUTION_SECONDS[str(r)] for r in resolutions}
+        self.on_bar = on_bar
+        self.grace = grace
+        self._bars = {}          # (symbol, resolution) -> forming bar
+        self._last_volume = {}   # symbol -> cumulative day volume seen last
+        self._closed = {}        # (symbol, resolution) -> start of the last closed bar
+        self._lock = threading.Lock()
+
+    def on_tick(self, symbol, price, epoch=None, cum_volume=None, oi=None):
+        """Adds one trade/quote; cum_volume is the exchange's cumulative day volume if available, oi is ignored."""
+        if epoch is None:
+            epoch = time.time()
+        volume = 0
+        closed = []
+        with self._lock:
+            if cum_volume is not None:
+                previous = self._last_volume.get(symbol)
+                if previous is not None and cum_volume >= previous:
+                    volume = cum_volume - previous
+                self._last_volume[symbol] = cum_volume
+
+            for resolution, seconds in self.resolutions.items():
+                key = (symbol, resolution)
+                start = bar_start(int(epoch), seconds)
+                bar = self._bars.get(key)
+                if start <= self._closed.get(key, -1) or (bar is not None and start < bar['date']):
+                    continue  # late tick for a bar already closed
+                if bar is None or start > bar['date']:
+                    if bar is not None:
+                        closed.append((symbol, resolution, bar))
+                        self._closed[key] = bar['date']
+                    self._bars[key] = {"date": start, "open": price, "high": price, "low": price,
+                                       "close": price, "volume": volume}
+                    continue
+                bar['high'] = max(bar['high'], price)
+                bar['low'] = min(bar['low'], price)
+                bar['close'] = price
+                bar['volume'] += volume
+        self._emit(closed)
+
+    def flush(self, now=None):
+        """Closes every bar whose end plus the grace period has passed."""
+        if now is None:
+            now = time.time()
+        closed = []
+        with self._lock:
+            for key, bar in list(self._bars.items()):
+                if bar['date'] + self.resolutions[key[1]] + self.grace <= now:
+                    closed.append((key[0], key[1], self._bars.pop(key)))
+                    self._closed[key] = bar['date']
+        self._emit(closed)
+
+    def forming_bar(self, symbol, resolution):
+        """Returns a copy of the bar currently being built, or None."""
+        with self._lock:
+            bar = self._bars.get((symbol, str(resolution)))
+            return dict(bar) if bar else None
+
+    def _emit(self, closed):
+        if self.on_bar is None:
+            return
+        for symbol, resolution, bar in sorted(closed, key=lambda item: item[2]['date']):
+            try:
+                self.on_bar(symbol, resolution, bar)
+            except Exception as e:
+                logger.error(f"Error in bar handler for {symbol} ({resolution}): {e}")
+
+
+def parse_tick(message):
+    """Extracts (symbol, price, epoch, cum_volume, oi) from a Fyers data socket message, None for control messages."""
+    if not isinstance(message, dict) or 'ltp' not in message or 'symbol' not in message:
+        return None
+    epoch = message.get('exch_feed_time') or message.get('last_traded_time') or time.time()
+    return message['symbol'], float(message['ltp']), epoch, message.get('vol_traded_today'), message.get('oi')
+
+
+class _FeedBase:
+    def __init__(self, aggregator, recorder=None):
+        self.aggregator = aggregator
+        self.recorder = recorder
+
+    def on_message(self, message):
+        tick = parse_tick(message)
+        if tick is not None:
+            if self.recorder is not None:
+                self.recorder.record(*tick)
+            symbol, price, epoch, cum_volume, oi = tick
+            self.aggregator.on_tick(symbol, price, epoch, cum_volume, oi)
+
+
+class FyersFeed(_FeedBase):
+    """
+    Live ticks from the Fyers data socket pushed into a CandleAggregator.
+
+    A background thread calls aggregator.flush() every `flush_interval`
+    seconds so bars close at bar end plus the aggregator grace, independent of
+    when the next tick arrives. With a tick_recorder.TickRecorder every tick is
+    also appended to its log for later replay.
+    """
+
+    def __init__(self, client_id, access_token, symbols, aggregator, flush_interval=0.1, log_path="",
+                 recorder=None):
+        super().__init__(aggregator, recorder)
+        self.client_id = client_id
+        self.access_token = access_token
+        self.symbols = list(symbols)
+        self.flush_interval = flush_interval
+        self.log_path = log_path
+        self.socket = None
+        self._stop = threading.Event()
+
+    def _on_connect(self):
+        logger.info(f"Data socket connected, subscribing to {len(self.symbols)} symbols.")
+        self.socket.subscribe(symbols=self.symbols, data_type="SymbolUpdate")
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.flush_interval):
+            self.aggregator.flush()
+
+    def start(self):
+        """Connects the socket and the flush thread, returns immediately."""
+        from fyers_apiv3.FyersWebsocket import data_ws
+
+        self.socket = data_ws.FyersDataSocket(
+            access_token=f"{self.client_id}:{self.access_token}",
+            log_path=self.log_path,
+            litemode=False,
+            write_to_file=False,
+            reconnect=True,
+            on_connect=self._on_connect,
+            on_close=lambda message: logger.warning(f"Data socket closed: {message}"),
+            on_error=lambda message: logger.error(f"Data socket error: {message}"),
+            on_message=self.on_message
+        )
+        threading.Thread(target=self._flush_loop, name="candle-flush", daemon=True).start()
+        self.socket.connect()
+
+    def run_forever(self):
+        """Starts the feed and blocks the calling thread, stopping it (and flushing the recorder) on the way out."""
+        try:
+            self.start()
+            self.socket.keep_running()
+        finally:
+            self.stop()
+
+    def stop(self):
+        self._stop.set()
+        if self.socket is not None:
+            self.socket.close_connection()
+        if self.recorder is not None:
+            self.recorder.close()
+
+
+class ReplayFeed(_FeedBase):
+    """
+    Offline stand-in for FyersFeed that replays recorded socket messages.
+
+    With `speed=None` messages are pushed as fast as possible, otherwise the
+    gaps between exch_feed_time values are slept, divided by `speed`.
+    """
+
+    def __init__(self, messages, aggregator, speed=None):
+        super().__init__(aggregator)
+        self.messages = messages
+        self.speed = speed
+
+    def run_forever(self):
+        last_epoch = None
+        for message in self.messages:
+            tick = parse_tick(message)
+            if tick is None:
+                continue
+            epoch = tick[2]
+            if self.speed and last_epoch is not None and epoch > last_epoch:
+                time.sleep((epoch - last_epoch) / self.speed)
+            last_epoch = epoch
+            # Close bars that ended before this tick, as the live flush thread would have
+            self.aggregator.flush(epoch)
+            self.on_message(message)
+        self.aggregator.flush(float('inf'))
@@ -0,0 +1,298 @@
+import atexit
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from logzero import logger
+
+# Histogram layout: exact below 2**SUB_BUCKET_BITS microseconds, then every
+# power of two is split into 2**(SUB_BUCKET_BITS - 1) linear sub-buckets, so a
+# recorded value is off by at most 1/64 (about 1.6%) up to 2**MAX_BITS us (~12 days).
+SUB_BUCKET_BITS = 7
+MAX_BITS = 40
+_SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+_HALF = _SUB_BUCKETS >> 1
+_BUCKETS = _SUB_BUCKETS + (MAX_BITS - SUB_BUCKET_BITS) * _HALF
+
+DEFAULT_QUANTILES = (0.5, 0.9, 0.99, 0.999)
+
+
+def bucket_index(micros):
+    """Histogram bucket of a value in whole microseconds."""
+    if micros < _SUB_BUCKETS:
+        return max(micros, 0)
+    shift = micros.bit_length() - SUB_BUCKET_BITS
+    return min(_SUB_BUCKETS + (shift - 1) * _HALF + (micros >> shift) - _HALF, _BUCKETS - 1)
+
+
+def bucket_value(index):
+    """Highest value in microseconds that falls in bucket `index`."""
+    if index < _SUB_BUCKETS:
+        return index
+    shift = (index - _SUB_BUCKETS) // _HALF + 1
+    sub = (index - _SUB_BUCKETS) % _HALF + _HALF
+    return ((sub + 1) << shift) - 1
+
+
+class LatencyHistogram:
+    """
+    HDR-style latency histogram with fixed log-linear buckets.
+
+    record() is an integer conversion, a bit_length and one list increment,
+    so it is cheap enough for every API call and indicator compute. Values are
+    seconds, stored with microsecond resolution; percentiles are within about
+    1.6% of the true value.
+    """
+
+    def __init__(self):
+        self.counts = [0] * _BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.min = float('inf')
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        index = bucket_index(int(seconds * 1e6))
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total += seconds
+            if seconds < self.min:
+                self.min = seconds
+            if seconds > self.max:
+                self.max = seconds
+
+    def percentile(self, q):
+        """Value in seconds below which a fraction `q` of the recorded values fall."""
+        with self._lock:
+            if not self.count:
+                return 0.0
+            rank = max(1, int(q * self.count + 0.5))
+            seen = 0
+            for index, count in enumerate(self.counts):
+                seen += count
+                if seen >= rank:
+                    return min(bucket_value(index) / 1e6, self.max)
+        return self.max
+
+    def snapshot(self, quantiles=DEFAULT_QUANTILES):
+        """count, sum, mean, min, max and the quantiles (as 'p50', 'p99', ...), in seconds."""
+        with self._lock:
+            count, total, low, high = self.count, self.total, self.min, self.max
+        stats = {"count": count, "sum": total, "mean": total / count if count else 0.0,
+                 "min": low if count else 0.0, "max": high}
+        for q in quantiles:
+            stats[f"p{q * 100:g}"] = self.percentile(q)
+        return stats
+
+
+class Counter:
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+
+def _escape_label(value):
+    """Escapes a label value as the Prometheus text format requires."""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _label_key(labels):
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+class MetricsRegistry:
+    """
+    Named latency histograms and counters, each optionally split by labels.
+
+    histogram()/counter() return the metric for a name and label set,
+    creating it on first use. timer() is a context manager and timed() a
+    decorator that record the elapsed time into a histogram and count
+    exceptions into `<name>_errors_total`.
+    """
+
+    def __init__(self):
+        self.histograms = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def _get(self, metrics, factory, name, labels):
+        key = (name, _label_key(labels))
+        metric = metrics.get(key)
+        if metric is None:
+            with self._lock:
+                metric = metrics.setdefault(key, factory())
+        return metric
+
+    def histogram(self, name, **labels):
+        return self._get(self.histograms, LatencyHistogram, name, labels)
+
+    def counter(self, name, **labels):
+        return self._get(self.counters, Counter, name, labels)
+
+    def observe(self, name, seconds, **labels):
+        self.histogram(name, **labels).record(seconds)
+
+    def inc(self, name, amount=1, **labels):
+        self.counter(name, **labels).inc(amount)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        histogram = self.histogram(name, **labels)
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.inc(f"{name}_errors_total", **labels)
+            raise
+        finally:
+            histogram.record(time.perf_counter() - start)
+
+    def timed(self, name, **labels):
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.timer(name, **labels):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def snapshot(self):
+        """JSON-ready dict: {"histograms": [...], "counters": [...]}, each entry with name and labels."""
+        with self._lock:
+            histograms, counters = list(self.histograms.items()), list(self.counters.items())
+        return {
+            "time": time.time(),
+            "histograms": [dict(name=name, labels=dict(labels), **histogram.snapshot())
+                           for (name, labels), histogram in histograms],
+            "counters": [{"name": name, "labels": dict(labels), "value": counter.value}
+                         for (name, labels), counter in counters],
+        }
+
+    def render_prometheus(self):
+        """Prometheus text exposition format, histograms as summaries with quantiles."""
+        def label_text(labels, extra=()):
+            pairs = list(labels) + list(extra)
+            if not pairs:
+                return ""
+            return "{" + ",".join(f'{key}="{_escape_label(value)}"' for key, value in pairs) + "}"
+
+        with self._lock:
+            histograms, counters = sorted(self.histograms.items()), sorted(self.counters.items())
+        lines, typed = [], set()
+        for (name, labels), histogram in histograms:
+            if name not in typed:
+                lines.append(f"# TYPE {name} summary")
+                typed.add(name)
+            stats = histogram.snapshot()
+            for q in DEFAULT_QUANTILES:
+                lines.append(f"{name}{label_text(labels, [('quantile', f'{q:g}')])} {stats[f'p{q * 100:g}']:.6f}")
+            lines.append(f"{name}_sum{label_text(labels)} {stats['sum']:.6f}")
+            lines.append(f"{name}_count{label_text(labels)} {stats['count']}")
+        for (name, labels), counter in counters:
+            if name not in typed:
+                lines.append(f"# TYPE {name} counter")
+                typed.add(name)
+            lines.append(f"{name}{label_text(labels)} {counter.value}")
+        return "\n".join(lines) + "\n"
+
+
+_registry = MetricsRegistry()
+
+
+def get_registry():
+    """Returns the process-wide MetricsRegistry."""
+    return _registry
+
+
+def timer(name, **labels):
+    """Context manager timing its block into the process-wide registry."""
+    return _registry.timer(name, **labels)
+
+
+def timed(name, **labels):
+    """Decorator timing every call into the process-wide registry."""
+    return _registry.timed(name, **labels)
+
+
+def start_http_server(port=9102, host="0.0.0.0", registry=None):
+    """Serves the registry in Prometheus text format on http://host:port/metrics from a daemon thread."""
+    registry = registry or _registry
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] not in ('/', '/metrics'):
+                self.send_error(404)
+                return
+            body = registry.render_prometheus().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    logger.info(f"Metrics served on http://{host}:{server.server_port}/metrics")
+    return server
+
+
+class JsonExporter:
+    """Writes registry snapshots to a JSON file every `interval` seconds from a daemon thread."""
+
+    def __init__(self, path="metrics.json", interval=60, registry=None):
+        self.path = path
+        self.interval = interval
+        self.registry = registry or _registry
+        self._stop = threading.Event()
+        self._thread = None
+
+    def export(self):
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as file:
+            json.dump(self.registry.snapshot(), file, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.export()
+            except Exception as e:
+                logger.error(f"Error exporting metrics to {self.path}: {e}")
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="metrics-json", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self.export()
+
+
+def start_exporters(config):
+    """
+    Starts the exporters enabled in the optional `metrics` config section:
+    metrics: {port: 9102, json_path: metrics.json, interval: 60}
+    """
+    section = config.get('metrics') or {}
+    if section.get('port'):
+        start_http_server(int(section['port']))
+    if section.get('json_path'):
+        exporter = JsonExporter(section['json_path'], section.get('interval', 60)).start()
+        # The last snapshot is written on the way out
+        atexit.register(exporter.stop)
+        return exporter
+    return None
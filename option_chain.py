@@ -0,0 +1,273 @@
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+from logzero import logger
+
+from market_data import IST, MAX_QUOTES_PER_REQUEST, batched, fetch_quotes
+
+SECONDS_PER_YEAR = 365.0 * 86400
+RISK_FREE_RATE = 0.065
+MIN_VOLATILITY = 1e-4
+MAX_VOLATILITY = 5.0
+# strikecount limit of the optionchain endpoint (strikes either side of ATM)
+MAX_OPTION_CHAIN_STRIKES = 50
+
+# Index underlyings in the symbol master -> spot symbol used for pricing
+SPOT_SYMBOLS = {
+    "NIFTY": "NSE:NIFTY50-INDEX",
+    "BANKNIFTY": "NSE:NIFTYBANK-INDEX",
+    "FINNIFTY": "NSE:FINNIFTY-INDEX",
+    "MIDCPNIFTY": "NSE:MIDCPNIFTY-INDEX",
+    "SENSEX": "BSE:SENSEX-INDEX",
+}
+
+
+def norm_cdf(x):
+    """Standard normal CDF, Abramowitz & Stegun 26.2.17 (absolute error < 7.5e-8), no SciPy needed."""
+    x = np.asarray(x, dtype=np.float64)
+    t = 1.0 / (1.0 + 0.2316419 * np.abs(x))
+    poly = t * (0.319381530 + t * (-0.356563782 + t * (1.781477937 + t * (-1.821255978 + t * 1.330274429))))
+    tail = norm_pdf(x) * poly
+    return np.where(x >= 0, 1.0 - tail, tail)
+
+
+def norm_pdf(x):
+    return np.exp(-0.5 * np.square(x)) / np.sqrt(2.0 * np.pi)
+
+
+def _d1_d2(spot, strike, t, rate, vol):
+    vol_sqrt_t = vol * np.sqrt(t)
+    d1 = (np.log(spot / strike) + (rate + 0.5 * vol * vol) * t) / vol_sqrt_t
+    return d1, d1 - vol_sqrt_t
+
+
+def bs_price(spot, strike, t, rate, vol, option_code):
+    """Black-Scholes price, option_code 1 for calls and -1 for puts, all arguments broadcast."""
+    d1, d2 = _d1_d2(spot, strike, t, rate, vol)
+    discount = np.exp(-rate * t)
+    call = spot * norm_cdf(d1) - strike * discount * norm_cdf(d2)
+    put = strike * discount * norm_cdf(-d2) - spot * norm_cdf(-d1)
+    return np.where(option_code > 0, call, put)
+
+
+def implied_volatility(price, spot, strike, t, rate, option_code, tol=1e-6, max_iter=50):
+    """
+    Vectorized implied volatility.
+
+    Newton iterations on vega for the whole chain at once; options where
+    Newton leaves the bracket or vega vanishes (deep ITM/OTM) are finished by
+    bisection on [MIN_VOLATILITY, MAX_VOLATILITY]. Prices outside the
+    no-arbitrage bounds give NaN.
+    """
+    price, spot, strike, t, option_code = np.broadcast_arrays(
+        *(np.asarray(a, dtype=np.float64) for a in (price, spot, strike, t, option_code)))
+    discount = np.exp(-rate * t)
+    lower = np.where(option_code > 0, np.maximum(spot - strike * discount, 0.0),
+                     np.maximum(strike * discount - spot, 0.0))
+    upper = np.where(option_code > 0, spot, strike * discount)
+    valid = (price > lower) & (price < upper) & (t > 0) & (price > 0)
+
+    vol = np.full(price.shape, np.nan)
+    s, k, tt, p, c = (a[valid] for a in (spot, strike, t, price, option_code))
+    sigma = np.full(s.shape, 0.3)
+    done = np.zeros(s.shape, dtype=bool)
+    for _ in range(max_iter):
+        d1, _ = _d1_d2(s, k, tt, rate, sigma)
+        diff = bs_price(s, k, tt, rate, sigma, c) - p
+        vega = s * norm_pdf(d1) * np.sqrt(tt)
+        done |= np.abs(diff) < tol
+        if done.all():
+            break
+        with np.errstate(divide='ignore', invalid='ignore'):
+            step = np.where(done, 0.0, diff / vega)
+        sigma = sigma - step
+        # Newton went astray, park it inside the bracket and let bisection finish
+        astray = ~np.isfinite(sigma) | (sigma <= MIN_VOLATILITY) | (sigma >= MAX_VOLATILITY)
+        sigma[astray] = np.nan
+        done |= astray
+
+    stuck = np.isnan(sigma) | (np.abs(bs_price(s, k, tt, rate, np.nan_to_num(sigma, nan=0.3), c) - p) >= tol)
+    if stuck.any():
+        low = np.full(stuck.sum(), MIN_VOLATILITY)
+        high = np.full(stuck.sum(), MAX_VOLATILITY)
+        for _ in range(60):
+            mid = 0.5 * (low + high)
+            above = bs_price(s[stuck], k[stuck], tt[stuck], rate, mid, c[stuck]) > p[stuck]
+            high = np.where(above, mid, high)
+            low = np.where(above, low, mid)
+        sigma[stuck] = 0.5 * (low + high)
+    vol[valid] = sigma
+    return vol
+
+
+def greeks(spot, strike, t, rate, vol, option_code):
+    """Delta, gamma, theta (per calendar day) and vega (per 1 vol point) for every option."""
+    d1, d2 = _d1_d2(spot, strike, t, rate, vol)
+    pdf = norm_pdf(d1)
+    sqrt_t = np.sqrt(t)
+    discount = np.exp(-rate * t)
+    is_call = option_code > 0
+    delta = np.where(is_call, norm_cdf(d1), norm_cdf(d1) - 1.0)
+    gamma = pdf / (spot * vol * sqrt_t)
+    decay = -spot * pdf * vol / (2.0 * sqrt_t)
+    theta = np.where(is_call, decay - rate * strike * discount * norm_cdf(d2),
+                     decay + rate * strike * discount * norm_cdf(-d2)) / 365.0
+    vega = spot * pdf * sqrt_t / 100.0
+    return {"delta": delta, "gamma": gamma, "theta": theta, "vega": vega}
+
+
+def max_pain(strikes, option_codes, open_interest):
+    """Strike at which option writers pay out the least at expiry, NaN without open interest."""
+    strikes = np.asarray(strikes, dtype=np.float64)
+    open_interest = np.asarray(open_interest, dtype=np.float64)
+    if not open_interest.sum():
+        return np.nan
+    candidates = np.unique(strikes)
+    settle = candidates[:, None]
+    payout = np.where(option_codes > 0, np.maximum(settle - strikes, 0.0), np.maximum(strikes - settle, 0.0))
+    return float(candidates[(payout * open_interest).sum(axis=1).argmin()])
+
+
+def chain_analytics(spot, strikes, option_codes, prices, t, rate=RISK_FREE_RATE, open_interest=None, volume=None):
+    """
+    IV, Greeks, PCR and max pain for a whole chain in one vectorized pass.
+
+    Returns (frame, summary): one row per option with iv and Greeks, and a
+    dict with the put/call ratios by OI and volume, max pain and ATM IV.
+    """
+    strikes = np.asarray(strikes, dtype=np.float64)
+    option_codes = np.asarray(option_codes, dtype=np.int8)
+    open_interest = np.zeros(len(strikes)) if open_interest is None else np.asarray(open_interest, np.float64)
+    volume = np.zeros(len(strikes)) if volume is None else np.asarray(volume, dtype=np.float64)
+
+    iv = implied_volatility(prices, spot, strikes, t, rate, option_codes)
+    frame = pd.DataFrame({"strike": strikes, "option_code": option_codes, "price": prices, "iv": iv,
+                          "oi": open_interest, "volume": volume})
+    for name, values in greeks(spot, strikes, t, rate, iv, option_codes).items():
+        frame[name] = values
+
+    calls, puts = option_codes > 0, option_codes < 0
+    atm = strikes[np.abs(strikes - spot).argmin()] if len(strikes) else np.nan
+    with np.errstate(divide='ignore', invalid='ignore'):
+        summary = {
+            "spot": float(spot),
+            "pcr_oi": float(open_interest[puts].sum() / open_interest[calls].sum()),
+            "pcr_volume": float(volume[puts].sum() / volume[calls].sum()),
+            "max_pain": max_pain(strikes, option_codes, open_interest),
+            "atm_strike": float(atm),
+            "atm_iv": float(np.nanmean(iv[strikes == atm])) if len(strikes) else np.nan,
+        }
+    return frame, summary
+
+
+class OptionChain:
+    """
+    Live option chain of one underlying and expiry.
+
+    The chain's tickers come from the symbol master index; refresh() pulls
+    quotes for the spot and all strikes in concurrent 50-symbol batches and
+    recomputes IV, Greeks, PCR and max pain for every strike in one NumPy pass.
+    Quotes carry no OI, so open interest comes from one optionchain call.
+    """
+
+    def __init__(self, fyers, index, underlying, expiry=None, strikes=None, spot_symbol=None,
+                 rate=RISK_FREE_RATE, max_workers=4):
+        self.fyers = fyers
+        self.index = index
+        self.underlying = underlying
+        self.spot_symbol = spot_symbol or SPOT_SYMBOLS.get(underlying, f"NSE:{underlying}-EQ")
+        self.strikes = strikes
+        self.rate = rate
+        self.max_workers = max_workers
+        if expiry is None:
+            upcoming = index.expiries(underlying)
+            if not len(upcoming):
+                raise ValueError(f"No upcoming option expiries for {underlying} in the symbol master")
+            expiry = upcoming[0]
+        self.expiry = expiry
+        # Options expire at the 15:30 close of their expiry day
+        expiry_day = datetime.fromtimestamp(int(self.expiry), IST).date()
+        self.expires_at = IST.localize(datetime.combine(expiry_day, datetime.min.time())
+                                       + timedelta(hours=15, minutes=30)).timestamp()
+        self.summary = {}
+        self.frame = pd.DataFrame()
+
+    def _quotes(self, symbols):
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            parts = pool.map(lambda batch: fetch_quotes(self.fyers, batch),
+                             batched(list(symbols), MAX_QUOTES_PER_REQUEST))
+            return {symbol: values for part in parts for symbol, values in part.items()}
+
+    def _open_interest(self):
+        """Ticker -> open interest from the Fyers option chain endpoint, empty if it fails."""
+        data = {"symbol": self.spot_symbol, "strikecount": min(self.strikes or MAX_OPTION_CHAIN_STRIKES,
+                                                               MAX_OPTION_CHAIN_STRIKES),
+                "timestamp": str(int(self.expiry))}
+        try:
+            response = self.fyers.optionchain(data=data)
+        except Exception as e:
+            logger.error(f"Option chain request for {self.underlying} failed: {e}")
+            return {}
+        if response.get('s') != 'ok':
+            logger.error(f"Option chain request for {self.underlying} failed: {response}")
+            return {}
+        return {entry['symbol']: float(entry.get('oi') or 0)
+                for entry in (response.get('data') or {}).get('optionsChain') or [] if entry.get('symbol')}
+
+    def refresh(self):
+        """Fetches quotes and recomputes the chain, returns (frame, summary)."""
+        spot_quote = fetch_quotes(self.fyers, [self.spot_symbol]).get(self.spot_symbol)
+        if not spot_quote:
+            logger.error(f"No spot quote for {self.spot_symbol}.")
+            return self.frame, self.summary
+        spot = float(spot_quote['lp'])
+
+        rows = self.index.options(self.underlying, expiry=self.expiry, spot=spot, strikes=self.strikes)
+        columns = self.index.columns
+        tickers = columns['ticker'][rows]
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            oi_future = pool.submit(self._open_interest)
+            quotes = self._quotes(tickers.tolist())
+            oi = oi_future.result()
+
+        prices = np.array([_quote_price(quotes.get(ticker)) for ticker in tickers])
+        open_interest = np.array([oi.get(ticker, 0.0) for ticker in tickers])
+        volume = np.array([float((quotes.get(ticker) or {}).get('volume', 0) or 0) for ticker in tickers])
+        t = max(self.expires_at - time.time(), 60.0) / SECONDS_PER_YEAR
+
+        frame, summary = chain_analytics(spot, columns['strike'][rows], columns['option_code'][rows], prices, t,
+                                         self.rate, open_interest, volume)
+        frame.insert(0, 'ticker', tickers)
+        summary['expiry'] = int(self.expiry)
+        self.frame, self.summary = frame, summary
+        return frame, summary
+
+
+def _quote_price(values):
+    """Last traded price, or the bid/ask mid when the option has not traded yet."""
+    if not values:
+        return np.nan
+    if values.get('lp'):
+        return float(values['lp'])
+    bid, ask = values.get('bid') or 0, values.get('ask') or 0
+    return (bid + ask) / 2.0 if bid and ask else np.nan
+
+
+if __name__ == "__main__":
+    # python option_chain.py BANKNIFTY [strikes]
+    from config_utils import load_config
+    from rate_limiter import ScheduledFyers
+    from symbol_master import SymbolMaster
+    from token_manager import TokenManager
+
+    fyers = ScheduledFyers(TokenManager(load_config()).get_fyers())
+    chain = OptionChain(fyers, SymbolMaster().load(), sys.argv[1] if len(sys.argv) > 1 else "BANKNIFTY",
+                        strikes=int(sys.argv[2]) if len(sys.argv) > 2 else 20)
+    while True:
+        frame, summary = chain.refresh()
+        logger.info(f"{chain.underlying} chain: {summary}")
+        time.sleep(5)
@@ -0,0 +1,329 @@
+import itertools
+import threading
+import time
+
+import numpy as np
+from logzero import logger
+
+from metrics import get_registry
+
+# Fyers order fields
+SIDE_BUY = 1
+SIDE_SELL = -1
+ORDER_TYPE_LIMIT = 1
+ORDER_TYPE_MARKET = 2
+
+# Fyers order status codes
+STATUS_CANCELLED = 1
+STATUS_FILLED = 2
+STATUS_TRANSIT = 4
+STATUS_REJECTED = 5
+STATUS_PENDING = 6
+FINAL_STATUSES = (STATUS_CANCELLED, STATUS_FILLED, STATUS_REJECTED)
+
+
+def order_payload(symbol, qty, side, product_type="INTRADAY", order_type=ORDER_TYPE_MARKET, limit_price=0,
+                  tag=None):
+    """Request body for fyers.place_order."""
+    data = {
+        "symbol": symbol,
+        "qty": int(qty),
+        "type": order_type,
+        "side": side,
+        "productType": product_type,
+        "limitPrice": limit_price,
+        "stopPrice": 0,
+        "validity": "DAY",
+        "disclosedQty": 0,
+        "offlineOrder": False,
+        "stopLoss": 0,
+        "takeProfit": 0,
+    }
+    if tag:
+        data["orderTag"] = tag
+    return data
+
+
+class OrderManager:
+    """
+    Turns strategy signal transitions into orders and keeps order/position state in memory.
+
+    on_signal() takes the event dicts produced by EmaCrossoverEngine, works out
+    the quantity needed to reach the target position (signal * quantity) and
+    places one market order for the difference. Orders live in a dict keyed by
+    order id, positions in a dict keyed by symbol, so neither placing an order
+    nor looking one up touches the tradebook. reconcile() pulls the tradebook
+    and applies only trades it has not seen yet; sync_positions() compares the
+    in-memory net quantities with the broker's. Signal-to-acknowledgement
+    latency of every order is recorded, here and in the metrics registry.
+
+    `symbol_map` maps the symbol a signal was computed on to the instrument
+    that is traded, e.g. {"NSE:NIFTYBANK-INDEX": "NSE:BANKNIFTY24JUNFUT"}:
+    indices are only a data feed, orders on them are refused.
+    """
+
+    def __init__(self, broker, quantity=1, product_type="INTRADAY", long_only=False, tag="emacross",
+                 symbol_map=None):
+        self.broker = broker
+        self.symbol_map = dict(symbol_map or {})
+        self.quantity = quantity
+        self.product_type = product_type
+        self.long_only = long_only
+        self.tag = tag
+        self.orders = {}
+        self.positions = {}
+        self._working = {}
+        self._seen_trades = set()
+        self._latencies = []
+        self._lock = threading.RLock()
+
+    def target_position(self, signal):
+        if signal < 0 and self.long_only:
+            return 0
+        return int(np.sign(signal)) * self.quantity
+
+    def on_signal(self, event, signal_time=None):
+        """
+        Places the order that moves `event['symbol']` to the target position of `event['signal']`.
+
+        `signal_time` is the time.perf_counter() at which the signal was
+        produced, by default the time of this call. Returns the order dict, or
+        None when no order was needed.
+        """
+        signal_time = signal_time if signal_time is not None else time.perf_counter()
+        symbol = self.symbol_map.get(event['symbol'], event['symbol'])
+        if symbol.endswith('-INDEX'):
+            logger.error(f"Not placing an order on index {symbol}, map it to a tradable symbol")
+            return None
+        with self._lock:
+            current = self.positions.get(symbol, 0) + self._working.get(symbol, 0)
+            delta = self.target_position(event['signal']) - current
+            if delta == 0:
+                return None
+            return self.place(symbol, abs(delta), SIDE_BUY if delta > 0 else SIDE_SELL, signal_time=signal_time)
+
+    def place(self, symbol, qty, side, order_type=ORDER_TYPE_MARKET, limit_price=0, signal_time=None):
+        """Places an order and records it as working until trades for it are reconciled."""
+        signal_time = signal_time if signal_time is not None else time.perf_counter()
+        data = order_payload(symbol, qty, side, self.product_type, order_type, limit_price, self.tag)
+        response = self.broker.place_order(data=data)
+        latency = time.perf_counter() - signal_time
+        registry = get_registry()
+        registry.observe("order_latency_seconds", latency)
+
+        with self._lock:
+            if response.get('s') != 'ok':
+                registry.inc("orders_rejected_total")
+                logger.error(f"Order rejected for {symbol} ({side * qty}): {response}")
+                return None
+            order = {
+                "id": response['id'],
+                "symbol": symbol,
+                "side": side,
+                "qty": int(qty),
+                "filled_qty": 0,
+                "avg_price": 0.0,
+                "status": STATUS_PENDING,
+                "placed_at": time.time(),
+                "latency": latency,
+            }
+            self.orders[order['id']] = order
+            self._working[symbol] = self._working.get(symbol, 0) + side * order['qty']
+            self._latencies.append(latency)
+        registry.inc("orders_placed_total")
+        logger.info(f"Order {order['id']} placed: {symbol} {side * qty} in {latency * 1000:.1f} ms")
+        return order
+
+    def get_order(self, order_id):
+        return self.orders.get(order_id)
+
+    def _apply_fill(self, order, qty, price):
+        filled = order['filled_qty'] + qty
+        order['avg_price'] = (order['avg_price'] * order['filled_qty'] + price * qty) / filled
+        order['filled_qty'] = filled
+        symbol = order['symbol']
+        self.positions[symbol] = self.positions.get(symbol, 0) + order['side'] * qty
+        self._working[symbol] = self._working.get(symbol, 0) - order['side'] * qty
+        if filled >= order['qty']:
+            order['status'] = STATUS_FILLED
+
+    def _close_order(self, order, status):
+        """Releases the unfilled part of a cancelled or rejected order."""
+        remaining = order['qty'] - order['filled_qty']
+        self._working[order['symbol']] = self._working.get(order['symbol'], 0) - order['side'] * remaining
+        order['status'] = status
+
+    def reconcile(self):
+        """
+        Applies trades from the tradebook that were not seen before, returns how many were new.
+
+        Orders still working afterwards are checked against one orderbook
+        call, so the quantity of an order the broker rejected or cancelled
+        after acknowledging it is released instead of counting as working forever.
+        """
+        response = self.broker.tradebook()
+        if response.get('s') != 'ok':
+            logger.error(f"Tradebook request failed: {response}")
+            return 0
+        new = 0
+        with self._lock:
+            for trade in response.get('tradeBook') or []:
+                trade_id = trade.get('tradeNumber')
+                if trade_id in self._seen_trades:
+                    continue
+                self._seen_trades.add(trade_id)
+                order = self.orders.get(trade.get('orderNumber'))
+                if order is None:
+                    continue  # placed outside this manager
+                self._apply_fill(order, int(trade['tradedQty']), float(trade['tradePrice']))
+                new += 1
+            working = any(order['status'] not in FINAL_STATUSES for order in self.orders.values())
+        if working:
+            response = self.broker.orderbook()
+            if response.get('s') != 'ok':
+                logger.error(f"Orderbook request failed: {response}")
+            else:
+                self._apply_orderbook(response.get('orderBook') or [])
+        return new
+
+    def _apply_orderbook(self, entries):
+        """Closes the working orders that the orderbook shows as cancelled or rejected."""
+        with self._lock:
+            for entry in entries:
+                order = self.orders.get(entry.get('id'))
+                if order is None or order['status'] in FINAL_STATUSES:
+                    continue
+                if entry.get('status') in (STATUS_CANCELLED, STATUS_REJECTED):
+                    self._close_order(order, entry['status'])
+                    logger.warning(f"Order {order['id']} closed by broker: {entry.get('message', '')}")
+
+    def refresh_order(self, order_id):
+        """Updates one order from the broker's orderbook entry for it, e.g. to pick up a rejection."""
+        response = self.broker.orderbook(data={"id": order_id})
+        if response.get('s') != 'ok':
+            logger.error(f"Orderbook request for {order_id} failed: {response}")
+            return None
+        self._apply_orderbook([entry for entry in response.get('orderBook') or [] if entry.get('id') == order_id])
+        return self.orders.get(order_id)
+
+    def sync_positions(self):
+        """
+        Compares net quantities with the broker's positions, adopting the broker's on mismatch.
+
+        Trades are reconciled first, and symbols that still have working
+        orders are skipped: the broker may already count fills that are not
+        applied here yet, adopting its quantity would count them twice.
+        """
+        self.reconcile()
+        response = self.broker.positions()
+        if response.get('s') != 'ok':
+            logger.error(f"Positions request failed: {response}")
+            return {}
+        broker_positions = {p['symbol']: int(p['netQty']) for p in response.get('netPositions') or []}
+        mismatches = {}
+        with self._lock:
+            for symbol in set(broker_positions) | set(self.positions):
+                if self._working.get(symbol, 0):
+                    continue
+                ours, theirs = self.positions.get(symbol, 0), broker_positions.get(symbol, 0)
+                if ours != theirs:
+                    mismatches[symbol] = (ours, theirs)
+                    self.positions[symbol] = theirs
+        for symbol, (ours, theirs) in mismatches.items():
+            logger.warning(f"Position mismatch on {symbol}: local {ours}, broker {theirs}")
+        return mismatches
+
+    def latency_stats(self):
+        """Signal-to-acknowledgement latency in seconds: count, mean, p50, p99 and max."""
+        with self._lock:
+            latencies = np.asarray(self._latencies)
+        if not len(latencies):
+            return {"count": 0}
+        return {
+            "count": len(latencies),
+            "mean": float(latencies.mean()),
+            "p50": float(np.percentile(latencies, 50)),
+            "p99": float(np.percentile(latencies, 99)),
+            "max": float(latencies.max()),
+        }
+
+
+class MockBroker:
+    """
+    In-memory stand-in for FyersModel's order endpoints.
+
+    Market orders fill immediately at the price set with set_price(), limit
+    orders stay pending until fill(), which can also fill them partially;
+    cancel() cancels one on the broker side. `latency` adds an artificial
+    round-trip delay.
+    Responses use the Fyers v3 field names, so OrderManager cannot tell the
+    difference.
+    """
+
+    def __init__(self, latency=0.0, reject_symbols=()):
+        self.latency = latency
+        self.reject_symbols = set(reject_symbols)
+        self.prices = {}
+        self.orderbook_entries = {}
+        self.trades = []
+        self.net_positions = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def set_price(self, symbol, price):
+        self.prices[symbol] = price
+
+    def place_order(self, data):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            order_id = f"MOCK{next(self._ids):08d}"
+            entry = {"id": order_id, "symbol": data['symbol'], "qty": data['qty'], "side": data['side'],
+                     "type": data['type'], "status": STATUS_PENDING, "message": ""}
+            self.orderbook_entries[order_id] = entry
+            if data['symbol'] in self.reject_symbols:
+                entry['status'] = STATUS_REJECTED
+                entry['message'] = "RMS: rejected by mock broker"
+            elif data['type'] == ORDER_TYPE_MARKET:
+                self._trade(entry, data['qty'], self.prices.get(data['symbol'], 0.0))
+            return {"s": "ok", "code": 1101, "message": "Order submitted successfully", "id": order_id}
+
+    def _trade(self, entry, qty, price):
+        self.trades.append({"tradeNumber": f"T{len(self.trades) + 1:08d}", "orderNumber": entry['id'],
+                            "symbol": entry['symbol'], "side": entry['side'], "tradedQty": qty,
+                            "tradePrice": price})
+        self.net_positions[entry['symbol']] = self.net_positions.get(entry['symbol'], 0) + entry['side'] * qty
+        entry['filled_qty'] = entry.get('filled_qty', 0) + qty
+        if entry['filled_qty'] >= entry['qty']:
+            entry['status'] = STATUS_FILLED
+
+    def fill(self, order_id, qty=None, price=None):
+        """Fills `qty` (the rest by default) of a pending order, e.g. to simulate a partial limit fill."""
+        with self._lock:
+            entry = self.orderbook_entries[order_id]
+            qty = entry['qty'] - entry.get('filled_qty', 0) if qty is None else qty
+            self._trade(entry, qty, self.prices.get(entry['symbol'], 0.0) if price is None else price)
+
+    def cancel(self, order_id, message="Cancelled by mock broker"):
+        """Cancels the unfilled rest of a pending order on the broker side."""
+        with self._lock:
+            entry = self.orderbook_entries[order_id]
+            entry['status'] = STATUS_CANCELLED
+            entry['message'] = message
+
+    def orderbook(self, data=None):
+        with self._lock:
+            if data and data.get('id'):
+                entries = [self.orderbook_entries[data['id']]] if data['id'] in self.orderbook_entries else []
+            else:
+                entries = list(self.orderbook_entries.values())
+            return {"s": "ok", "orderBook": [dict(entry) for entry in entries]}
+
+    def tradebook(self):
+        with self._lock:
+            return {"s": "ok", "tradeBook": [dict(trade) for trade in self.trades]}
+
+    def positions(self):
+        with self._lock:
+            return {"s": "ok", "netPositions": [{"symbol": symbol, "netQty": qty}
+                                                for symbol, qty in self.net_positions.items()]}
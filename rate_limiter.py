@@ -0,0 +1,249 @@
+import heapq
+import itertools
+import json
+import threading
+import time
+from concurrent.futures import Future
+
+from metrics import get_registry
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket.
+
+    `rate` tokens are added per second up to `capacity`. acquire() blocks the
+    calling thread until enough tokens are available.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = now - self._updated
+        if elapsed > 0:
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+            self._updated = now
+
+    def try_acquire(self, tokens=1):
+        """Takes tokens if they are available right now, returns False otherwise."""
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def wait_time(self, tokens=1):
+        """Seconds until `tokens` are available, 0 when they are available now. Takes nothing."""
+        with self._lock:
+            self._refill(time.monotonic())
+            return max(0.0, (tokens - self._tokens) / self.rate)
+
+    def acquire(self, tokens=1):
+        """Blocks until tokens are available, returns the time spent waiting in seconds."""
+        start = time.monotonic()
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return now - start
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+# Fyers API limits per app: 10 requests/second and 200 requests/minute overall
+GLOBAL_LIMITS = ((10, 10), (200 / 60, 200))
+
+# Endpoint class -> (rate per second, burst)
+ENDPOINT_LIMITS = {
+    "orders": (10, 10),
+    "quotes": (10, 10),
+    "account": (5, 5),
+    "history": (5, 5),
+}
+
+# Lower runs first: orders > quotes > account > history backfill
+PRIORITIES = {"orders": 0, "quotes": 1, "account": 2, "history": 3}
+
+FYERS_METHOD_CLASSES = {
+    "place_order": "orders", "modify_order": "orders", "cancel_order": "orders",
+    "place_basket_orders": "orders", "modify_basket_orders": "orders", "cancel_basket_orders": "orders",
+    "exit_positions": "orders", "convert_position": "orders",
+    "quotes": "quotes", "depth": "quotes", "optionchain": "quotes",
+    "history": "history",
+}
+
+
+class _Job:
+    __slots__ = ('endpoint_class', 'func', 'args', 'kwargs', 'future', 'key', 'queued_at')
+
+    def __init__(self, endpoint_class, func, args, kwargs, future, key):
+        self.endpoint_class = endpoint_class
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.future = future
+        self.key = key
+        self.queued_at = time.monotonic()
+
+
+class RequestScheduler:
+    """
+    Central queue every API call can pass through.
+
+    Jobs wait per endpoint class, ordered by priority (orders before quotes
+    before account calls before history backfill). Each endpoint class has its
+    own token bucket and all classes share the global per-second and
+    per-minute buckets. A worker only takes a job once the job's buckets have
+    tokens, picking the highest-priority such job, so rate-limited backfill
+    waits in the queue instead of parking the workers; `order_workers` more
+    threads only ever run order calls, so an order never waits for a slow
+    data call either. Calls submitted with the same `key` while an identical
+    one is queued or running share its Future instead of hitting the API
+    twice. Queue wait times are tracked per endpoint class; waits, call
+    latencies and failed calls also go to the metrics registry
+    (scheduler_wait_seconds, api_call_seconds, api_call_seconds_errors_total).
+    """
+
+    def __init__(self, workers=4, endpoint_limits=None, global_limits=GLOBAL_LIMITS, order_workers=1):
+        self._buckets = {name: TokenBucket(rate, burst)
+                         for name, (rate, burst) in (endpoint_limits or ENDPOINT_LIMITS).items()}
+        self._global_buckets = [TokenBucket(rate, burst) for rate, burst in global_limits]
+        self._pending = {}      # endpoint class -> heap of (priority, sequence, job)
+        self._sequence = itertools.count()
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self._ready = threading.Condition(self._lock)
+        self._wait_stats = {}
+        self._threads = [threading.Thread(target=self._worker, name=f"api-scheduler-{i}", daemon=True)
+                         for i in range(workers)]
+        self._threads += [threading.Thread(target=self._worker, args=(("orders",),), name=f"api-orders-{i}",
+                                           daemon=True) for i in range(order_workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, endpoint_class, func, *args, key=None, priority=None, **kwargs):
+        """Queues func(*args, **kwargs) and returns a concurrent.futures.Future."""
+        if priority is None:
+            priority = PRIORITIES.get(endpoint_class, len(PRIORITIES))
+        with self._ready:
+            if key is not None and key in self._in_flight:
+                return self._in_flight[key]
+            future = Future()
+            job = _Job(endpoint_class, func, args, kwargs, future, key)
+            if key is not None:
+                self._in_flight[key] = future
+            heapq.heappush(self._pending.setdefault(endpoint_class, []), (priority, next(self._sequence), job))
+            self._ready.notify_all()
+        return future
+
+    def call(self, endpoint_class, func, *args, key=None, priority=None, timeout=None, **kwargs):
+        """Like submit() but blocks for the result."""
+        return self.submit(endpoint_class, func, *args, key=key, priority=priority, **kwargs).result(timeout)
+
+    def _record_wait(self, endpoint_class, seconds):
+        with self._lock:
+            stats = self._wait_stats.setdefault(endpoint_class, {"count": 0, "total": 0.0, "max": 0.0})
+            stats['count'] += 1
+            stats['total'] += seconds
+            stats['max'] = max(stats['max'], seconds)
+        get_registry().observe("scheduler_wait_seconds", seconds, endpoint_class=endpoint_class)
+
+    def wait_stats(self):
+        """Queue wait (including rate limiting) per endpoint class: count, mean and max seconds."""
+        with self._lock:
+            return {name: dict(stats, mean=stats['total'] / stats['count'])
+                    for name, stats in self._wait_stats.items()}
+
+    def _class_buckets(self, endpoint_class):
+        bucket = self._buckets.get(endpoint_class)
+        return ([bucket] if bucket is not None else []) + self._global_buckets
+
+    def _next_job(self, classes):
+        """Blocks until a job of `classes` (any when None) has rate tokens, takes the tokens and the job."""
+        with self._ready:
+            while True:
+                best, wait = None, None
+                for endpoint_class, heap in self._pending.items():
+                    if not heap or (classes is not None and endpoint_class not in classes):
+                        continue
+                    delay = max(bucket.wait_time() for bucket in self._class_buckets(endpoint_class))
+                    if delay > 0:
+                        wait = delay if wait is None else min(wait, delay)
+                    elif best is None or heap[0][:2] < self._pending[best][0][:2]:
+                        best = endpoint_class
+                if best is not None:
+                    # Buckets are private to the scheduler and checked under its lock, so this cannot fail
+                    for bucket in self._class_buckets(best):
+                        bucket.try_acquire()
+                    return heapq.heappop(self._pending[best])[2]
+                self._ready.wait(wait)
+
+    def _worker(self, classes=None):
+        while True:
+            job = self._next_job(classes)
+            self._record_wait(job.endpoint_class, time.monotonic() - job.queued_at)
+
+            if job.future.set_running_or_notify_cancel():
+                try:
+                    with get_registry().timer("api_call_seconds", endpoint_class=job.endpoint_class):
+                        result = job.func(*job.args, **job.kwargs)
+                    job.future.set_result(result)
+                except BaseException as e:
+                    job.future.set_exception(e)
+            if job.key is not None:
+                with self._lock:
+                    self._in_flight.pop(job.key, None)
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """Returns the process-wide RequestScheduler, creating it on first use."""
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = RequestScheduler()
+    return _scheduler
+
+
+class ScheduledFyers:
+    """
+    Drop-in FyersModel proxy that sends every API method through a RequestScheduler.
+
+    Methods are mapped to endpoint classes by FYERS_METHOD_CLASSES (anything
+    else is an account call). Identical read-only calls in flight are
+    coalesced; order calls never are. Error responses are counted per method
+    in `api_errors_total`.
+    """
+
+    def __init__(self, fyers, scheduler=None):
+        self.fyers = fyers
+        self.scheduler = scheduler or get_scheduler()
+
+    def __getattr__(self, name):
+        attribute = getattr(self.fyers, name)
+        if not callable(attribute):
+            return attribute
+        endpoint_class = FYERS_METHOD_CLASSES.get(name, "account")
+
+        def scheduled(*args, **kwargs):
+            key = None
+            if endpoint_class != "orders":
+                key = (name, json.dumps([args, kwargs], sort_keys=True, default=str))
+            response = self.scheduler.call(endpoint_class, attribute, *args, key=key, **kwargs)
+            if isinstance(response, dict) and response.get('s') == 'error':
+                get_registry().inc("api_errors_total", method=name)
+            return response
+
+        return scheduled
@@ -0,0 +1,209 @@
+import math
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+from logzero import logger
+
+from candle_utils import CANDLE_OI_DTYPE
+from indicators import IndicatorContext
+from market_data import RESOLUTION_SECONDS
+from market_feed import bar_start
+
+SESSION_SECONDS = 22500  # 09:15 - 15:30
+
+
+class BarRingBuffer:
+    """
+    Fixed-capacity bars of one resolution for many symbols.
+
+    Every column (date, open, high, low, close, volume, oi, typed as in
+    CANDLE_OI_DTYPE) is one (max_symbols x 2 * capacity) array allocated up
+    front, a symbol owns one row. The forming bar is updated in place at the
+    row's write position; when the position reaches the end of the row the
+    last `capacity` bars are moved back to its start, so the newest
+    `capacity` bars are always contiguous and views() never copies. Views stay
+    valid until that compaction, i.e. read them before feeding more ticks.
+    """
+
+    def __init__(self, resolution, capacity, max_symbols=512):
+        self.resolution = str(resolution)
+        self.seconds = RESOLUTION_SECONDS[self.resolution]
+        self.capacity = capacity
+        self.max_symbols = max_symbols
+        self.columns = {name: np.zeros((max_symbols, 2 * capacity), dtype=CANDLE_OI_DTYPE[name])
+                        for name in CANDLE_OI_DTYPE.names}
+        self.count = np.zeros(max_symbols, dtype=np.int64)      # bars held, forming bar included
+        self.position = np.full(max_symbols, -1, dtype=np.int64)  # slot of the newest bar
+        self.forming = np.zeros(max_symbols, dtype=bool)
+
+    @property
+    def nbytes(self):
+        return sum(column.nbytes for column in self.columns.values())
+
+    def open_bar(self, row, start, price, volume, oi):
+        """Starts a new bar in `row`, compacting the row first when it is full."""
+        position = self.position[row] + 1
+        if position == 2 * self.capacity:
+            keep = self.capacity - 1
+            for column in self.columns.values():
+                column[row, :keep] = column[row, position - keep:position]
+            position = keep
+        self.position[row] = position
+        self.count[row] = min(self.count[row] + 1, self.capacity)
+        self.forming[row] = True
+        columns = self.columns
+        columns['date'][row, position] = start
+        columns['open'][row, position] = price
+        columns['high'][row, position] = price
+        columns['low'][row, position] = price
+        columns['close'][row, position] = price
+        columns['volume'][row, position] = volume
+        columns['oi'][row, position] = oi
+
+    def update_bar(self, row, price, volume, oi):
+        position = self.position[row]
+        columns = self.columns
+        if price > columns['high'][row, position]:
+            columns['high'][row, position] = price
+        if price < columns['low'][row, position]:
+            columns['low'][row, position] = price
+        columns['close'][row, position] = price
+        columns['volume'][row, position] += volume
+        if oi:
+            columns['oi'][row, position] = oi
+
+    def bar(self, row, position=None):
+        """The bar at `position` (newest by default) of `row` as a dict."""
+        position = self.position[row] if position is None else position
+        return {name: column[row, position].item() for name, column in self.columns.items()}
+
+    def views(self, row, n=None, include_forming=True):
+        """Column name -> view of the last `n` bars of `row`, oldest first, without copying."""
+        stop, held = self.position[row] + 1, self.count[row]
+        if not include_forming and self.forming[row]:
+            stop, held = stop - 1, held - 1
+        n = held if n is None else min(n, held)
+        return {name: column[row, stop - n:stop] for name, column in self.columns.items()}
+
+
+class RingBufferAggregator:
+    """
+    Folds ticks into OHLCV+OI bars of several resolutions, stored in BarRingBuffers.
+
+    Same interface as market_feed.CandleAggregator (on_tick, flush,
+    forming_bar, on_bar callback), so FyersFeed and ReplayFeed can drive it,
+    but no bar is ever allocated: ticks update the forming bar in place and
+    history stays in fixed arrays. `capacity` defaults to one session of
+    bars per resolution; 500 symbols x (1, 5, 15) minute bars fit in about
+    27 MB. Strategies read the stored bars through views(), frame() or
+    indicator_context().
+    """
+
+    def __init__(self, resolutions=('1', '5'), capacity=None, max_symbols=512, on_bar=None, grace=0.5):
+        self.buffers = {}
+        for resolution in map(str, resolutions):
+            bars = capacity or math.ceil(SESSION_SECONDS / RESOLUTION_SECONDS[resolution]) + 1
+            self.buffers[resolution] = BarRingBuffer(resolution, bars, max_symbols)
+        self.max_symbols = max_symbols
+        self.on_bar = on_bar
+        self.grace = grace
+        self.rows = {}           # symbol -> row in every buffer
+        self.symbols = []
+        self._last_volume = np.full(max_symbols, -1, dtype=np.int64)
+        self._lock = threading.Lock()
+
+    @property
+    def nbytes(self):
+        return sum(buffer.nbytes for buffer in self.buffers.values())
+
+    def _row(self, symbol):
+        row = self.rows.get(symbol)
+        if row is None:
+            if len(self.symbols) == self.max_symbols:
+                raise ValueError(f"Ring buffers are full ({self.max_symbols} symbols), cannot add {symbol}")
+            row = self.rows[symbol] = len(self.symbols)
+            self.symbols.append(symbol)
+        return row
+
+    def on_tick(self, symbol, price, epoch=None, cum_volume=None, oi=None):
+        """Adds one trade/quote; cum_volume is the exchange's cumulative day volume if available."""
+        if epoch is None:
+            epoch = time.time()
+        closed = []
+        with self._lock:
+            row = self._row(symbol)
+            volume = 0
+            if cum_volume is not None:
+                previous = self._last_volume[row]
+                if 0 <= previous <= cum_volume:
+                    volume = cum_volume - previous
+                self._last_volume[row] = cum_volume
+
+            for resolution, buffer in self.buffers.items():
+                start = bar_start(int(epoch), buffer.seconds)
+                position = buffer.position[row]
+                current = buffer.columns['date'][row, position] if position >= 0 else -1
+                if start < current or (start == current and not buffer.forming[row]):
+                    continue  # late tick for a bar already closed
+                if start > current:
+                    if buffer.forming[row]:
+                        buffer.forming[row] = False
+                        # Read before open_bar, a compaction would move it
+                        closed.append((symbol, resolution, buffer.bar(row, position)))
+                    buffer.open_bar(row, start, price, volume, oi or 0)
+                    continue
+                buffer.update_bar(row, price, volume, oi)
+        self._emit(closed)
+
+    def flush(self, now=None):
+        """Closes every forming bar whose end plus the grace period has passed."""
+        if now is None:
+            now = time.time()
+        closed = []
+        with self._lock:
+            for resolution, buffer in self.buffers.items():
+                rows = np.flatnonzero(buffer.forming)
+                if not len(rows):
+                    continue
+                ends = buffer.columns['date'][rows, buffer.position[rows]] + buffer.seconds + self.grace
+                for row in rows[ends <= now]:
+                    buffer.forming[row] = False
+                    closed.append((self.symbols[row], resolution, buffer.bar(row)))
+        self._emit(closed)
+
+    def forming_bar(self, symbol, resolution):
+        """Returns the bar currently being built as a dict, or None."""
+        with self._lock:
+            row, buffer = self.rows.get(symbol), self.buffers[str(resolution)]
+            if row is None or not buffer.forming[row]:
+                return None
+            return buffer.bar(row)
+
+    def views(self, symbol, resolution, n=None, include_forming=True):
+        """Column name -> zero-copy view of the last `n` stored bars of `symbol`."""
+        row = self.rows.get(symbol)
+        if row is None:
+            return {name: np.empty(0, dtype=CANDLE_OI_DTYPE[name]) for name in CANDLE_OI_DTYPE.names}
+        return self.buffers[str(resolution)].views(row, n, include_forming)
+
+    def frame(self, symbol, resolution, n=None, include_forming=True):
+        """The stored bars as a candle DataFrame indexed by IST time, like CandleCache.get_ohlc (a copy)."""
+        views = self.views(symbol, resolution, n, include_forming)
+        index = pd.to_datetime(views['date'], unit='s', utc=True).tz_convert('Asia/Kolkata')
+        return pd.DataFrame({name: views[name] for name in CANDLE_OI_DTYPE.names if name != 'date'},
+                            index=pd.Index(index, name='date'))
+
+    def indicator_context(self, symbol, resolution, n=None, include_forming=False):
+        """IndicatorContext over the stored bars, closed ones only by default."""
+        return IndicatorContext(self.views(symbol, resolution, n, include_forming))
+
+    def _emit(self, closed):
+        if self.on_bar is None:
+            return
+        for symbol, resolution, bar in sorted(closed, key=lambda item: item[2]['date']):
+            try:
+                self.on_bar(symbol, resolution, bar)
+            except Exception as e:
+                logger.error(f"Error in bar handler for {symbol} ({resolution}): {e}")
@@ -0,0 +1,120 @@
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from time import sleep
+
+import pandas as pd
+from logzero import logger
+
+from config_utils import load_config
+from http_utils import install_fyers_transport
+from indicators import IndicatorContext
+from market_data import CandleCache, fetch_quotes
+from rate_limiter import ScheduledFyers, TokenBucket
+from strategy_utils import ema_crossover_panel
+from token_manager import TokenManager
+
+
+class Scanner:
+    """
+    Runs the EMA crossover strategy over a whole watchlist.
+
+    History is refreshed through one CandleCache fanned out over a worker pool,
+    the forming bar is topped up with the latest traded price from batched
+    quotes requests, and the strategy is evaluated for all symbols at once on a
+    (symbols x bars) close panel.
+    """
+
+    def __init__(self, fyers, watchlist, interval='5', duration=5, short_length=3, long_length=30,
+                 max_workers=8, rate_limit=10):
+        self.fyers = fyers
+        self.watchlist = list(dict.fromkeys(watchlist))
+        self.interval = interval
+        self.duration = duration
+        self.short_length = short_length
+        self.long_length = long_length
+        self.max_workers = max_workers
+        # A ScheduledFyers is already rate limited by the shared scheduler
+        self.limiter = None if isinstance(fyers, ScheduledFyers) else TokenBucket(rate_limit)
+        self.candle_cache = CandleCache(fyers)
+        self._last_signals = {}
+
+    def _refresh(self, symbol):
+        if self.limiter is not None:
+            self.limiter.acquire()
+        try:
+            return symbol, self.candle_cache.get_ohlc(symbol, self.interval, self.duration)
+        except Exception as e:
+            logger.error(f"Error refreshing history for {symbol}: {e}")
+            return symbol, pd.DataFrame()
+
+    def refresh_history(self):
+        """Refreshes the candle cache for every watchlist symbol concurrently."""
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            return dict(pool.map(self._refresh, self.watchlist))
+
+    def scan(self):
+        """Returns one row per symbol with the latest EMAs, signal and whether it just flipped."""
+        frames = self.refresh_history()
+        quotes = fetch_quotes(self.fyers, self.watchlist, limiter=self.limiter)
+        symbols, index, ctx = IndicatorContext.from_frames(frames)
+        if not symbols:
+            return pd.DataFrame()
+        panel = ctx['close']
+
+        # Top up the forming bar with the latest traded price
+        last_close = panel[:, -1].copy()
+        for i, symbol in enumerate(symbols):
+            ltp = quotes.get(symbol, {}).get('lp')
+            if ltp is not None:
+                last_close[i] = ltp
+        panel[:, -1] = last_close
+
+        ema_short, ema_long, signal = ema_crossover_panel(panel, self.short_length, self.long_length)
+        result = pd.DataFrame({
+            'symbol': symbols,
+            'time': index[-1],
+            'close': last_close,
+            'ema_short': ema_short[:, -1],
+            'ema_long': ema_long[:, -1],
+            'signal': signal[:, -1],
+        })
+        result['crossed'] = [s in self._last_signals and self._last_signals[s] != sig
+                             for s, sig in zip(symbols, result['signal'])]
+        self._last_signals.update(zip(symbols, result['signal']))
+        return result.set_index('symbol')
+
+    def run(self, interval_seconds=10):
+        """Scans the watchlist forever, logging symbols whose signal flipped."""
+        logger.info(f"##### Scanning {len(self.watchlist)} symbols #####")
+        while True:
+            try:
+                result = self.scan()
+                crossed = result[result['crossed']] if not result.empty else result
+                for symbol, row in crossed.iterrows():
+                    logger.info(f"{symbol}: signal {row['signal']} (EMA {row['ema_short']:.2f}/{row['ema_long']:.2f})")
+            except Exception as e:
+                logger.error(f"Error in scanner loop: {e}")
+            sleep(interval_seconds)
+
+
+def load_watchlist(config, path=None):
+    """Reads the watchlist from a text file (one symbol per line) or the `watchlist` key of Config.yaml."""
+    if path:
+        with open(path, 'r') as file:
+            return [line.strip() for line in file if line.strip() and not line.startswith('#')]
+    return config.get('watchlist', [])
+
+
+if __name__ == "__main__":
+    config = load_config()
+    # Same client as 04.doLogin: pooled transport, auto-refreshed token, shared scheduler
+    install_fyers_transport()
+    token_manager = TokenManager(config)
+    token_manager.start_auto_refresh()
+    fyers = ScheduledFyers(token_manager.get_fyers())
+
+    watchlist = load_watchlist(config, sys.argv[1] if len(sys.argv) > 1 else None)
+    if not watchlist:
+        logger.error("Watchlist is empty, pass a file or add a 'watchlist' list to Config.yaml.")
+        sys.exit(1)
+    Scanner(fyers, watchlist).run()
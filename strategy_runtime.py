@@ -0,0 +1,154 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+from logzero import logger
+
+from indicators import IndicatorCache
+from market_clock import MarketClock
+from market_data import RESOLUTION_SECONDS
+
+
+class Strategy:
+    """
+    Base class of a strategy run by StrategyRuntime.
+
+    A strategy lists the (symbol, resolution) streams it wants in
+    `subscriptions` and how many days of bars it needs in `lookback_days`.
+    on_bar() is called with the shared candle frame of a stream (treat it as
+    read-only, every subscriber gets the same object) and the shared
+    IndicatorContext over it, so indicators another strategy already asked for
+    are not recomputed. Return an event dict, a list of them, or None.
+    """
+
+    name = None
+    lookback_days = 5
+
+    def __init__(self, subscriptions=(), name=None):
+        self.subscriptions = [(symbol, str(resolution)) for symbol, resolution in subscriptions]
+        self.name = name or self.name or type(self).__name__
+
+    def on_start(self, runtime):
+        pass
+
+    def on_bar(self, symbol, resolution, data, ctx, closed):
+        """`closed` is the number of leading rows of `data` that are completed bars."""
+        raise NotImplementedError
+
+    def on_stop(self):
+        pass
+
+
+class EmaCrossoverStrategy(Strategy):
+    """EMA crossover on closed bars, emitting the same event dicts as EmaCrossoverEngine."""
+
+    def __init__(self, subscriptions=(("NSE:NIFTYBANK-INDEX", '5'),), short_length=3, long_length=30, name=None):
+        super().__init__(subscriptions, name)
+        self.short_length = short_length
+        self.long_length = long_length
+        self._signals = {}
+
+    def on_bar(self, symbol, resolution, data, ctx, closed):
+        if closed == 0:
+            return None
+        i = closed - 1
+        ema_short = ctx.compute('ema', length=self.short_length)[i]
+        ema_long = ctx.compute('ema', length=self.long_length)[i]
+        signal = 0 if np.isnan(ema_short) or np.isnan(ema_long) else int(np.sign(ema_short - ema_long))
+
+        key = (symbol, resolution)
+        previous = self._signals.get(key)
+        self._signals[key] = signal
+        # The first evaluation only establishes the current state
+        if previous is None or signal == previous:
+            return None
+        return {
+            "symbol": symbol,
+            "time": data.index[i],
+            "close": float(data['close'].iat[i]),
+            "ema_short": float(ema_short),
+            "ema_long": float(ema_long),
+            "signal": signal,
+            "previous_signal": previous,
+            "strategy": self.name,
+        }
+
+
+class StrategyRuntime:
+    """
+    Runs any number of strategies on one data feed.
+
+    Subscriptions are merged by (symbol, resolution): every stream is fetched
+    once per bar close through the shared CandleCache, one IndicatorContext is
+    built over it and both are handed to every subscribed strategy, so adding
+    strategies on an already subscribed stream costs no API calls or copies.
+    Events returned by strategies go to `on_event`.
+    """
+
+    def __init__(self, candle_cache, clock=None, on_event=None, max_workers=8):
+        self.candle_cache = candle_cache
+        self.clock = clock or MarketClock()
+        self.on_event = on_event
+        self.max_workers = max_workers
+        self.strategies = []
+        self.streams = {}       # (symbol, resolution) -> subscribed strategies
+        self.lookback = {}      # (symbol, resolution) -> days of bars needed
+        self.indicators = IndicatorCache()
+
+    def add(self, strategy):
+        self.strategies.append(strategy)
+        for stream in strategy.subscriptions:
+            self.streams.setdefault(stream, []).append(strategy)
+            self.lookback[stream] = max(self.lookback.get(stream, 0), strategy.lookback_days)
+        strategy.on_start(self)
+        logger.info(f"Strategy {strategy.name} subscribed to {strategy.subscriptions}")
+        return strategy
+
+    def _fetch(self, stream):
+        symbol, resolution = stream
+        try:
+            return stream, self.candle_cache.get_ohlc(symbol, resolution, self.lookback[stream])
+        except Exception as e:
+            logger.error(f"Error fetching {symbol} ({resolution}): {e}")
+            return stream, pd.DataFrame()
+
+    def poll(self, resolutions=None, now=None):
+        """Fetches the streams of `resolutions` (all by default) and fans them out, returns the events."""
+        streams = [s for s in self.streams if resolutions is None or s[1] in resolutions]
+        now = time.time() if now is None else now
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            fetched = list(pool.map(self._fetch, streams))
+
+        events = []
+        for (symbol, resolution), data in fetched:
+            if data.empty:
+                continue
+            ctx = self.indicators.context(symbol, resolution, data)
+            # Bars whose end is not past `now` are still forming
+            closed = int(np.searchsorted(ctx['date'] + RESOLUTION_SECONDS[resolution], now, side='right'))
+            for strategy in self.streams[(symbol, resolution)]:
+                try:
+                    result = strategy.on_bar(symbol, resolution, data, ctx, closed)
+                except Exception as e:
+                    logger.error(f"Strategy {strategy.name} failed on {symbol} ({resolution}): {e}")
+                    continue
+                for event in ([result] if isinstance(result, dict) else result or []):
+                    events.append(event)
+                    if self.on_event is not None:
+                        self.on_event(event)
+        return events
+
+    def run(self):
+        """Polls every subscribed resolution right after its bars close, until the clock is stopped."""
+        resolutions = sorted({resolution for _, resolution in self.streams}, key=RESOLUTION_SECONDS.get)
+        self.poll()
+        try:
+            while True:
+                woke = self.clock.wait_for_bar_close(resolutions)
+                if woke is None:
+                    return
+                self.poll(woke[1])
+        finally:
+            for strategy in self.strategies:
+                strategy.on_stop()
@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+from logzero import logger
+
+from indicators import IndicatorContext, ema
+
+
+def crossover_signals(ema_short, ema_long):
+    """1 where the short EMA is above the long one, -1 where below, 0 otherwise (NaN included)."""
+    signal = np.zeros(np.shape(ema_short), dtype=np.int8)
+    signal[ema_short > ema_long] = 1
+    signal[ema_short < ema_long] = -1
+    return signal
+
+
+def ema_crossover_strategy(data, short_length=3, long_length=30, ctx=None):
+    """Implements EMA Crossover Strategy, `ctx` shares EMAs already computed by other strategies"""
+    logger.info("Calculating EMA Crossover Strategy.")
+    try:
+        if ctx is None:
+            ctx = IndicatorContext({'close': data['close'].to_numpy(dtype=np.float64)})
+
+        # Calculate EMAs
+        data['EMA_Short'] = ctx.compute('ema', length=short_length)
+        data['EMA_Long'] = ctx.compute('ema', length=long_length)
+
+        # Generate signals, 1 = Buy, -1 = Sell
+        data['Signal'] = crossover_signals(data['EMA_Short'].to_numpy(), data['EMA_Long'].to_numpy())
+
+        logger.info("EMA Crossover strategy calculated.")
+        return data
+
+    except Exception as e:
+        logger.error(f"Error in EMA Crossover Strategy: {e}")
+        return data
+
+
+def ema_crossover_panel(closes, short_length=3, long_length=30):
+    """
+    Evaluates the EMA crossover over a (symbols x bars) close panel in one pass.
+
+    Returns (ema_short, ema_long, signal) arrays with the panel's shape.
+    """
+    ctx = IndicatorContext({'close': closes})
+    ema_short = ctx.compute('ema', length=short_length)
+    ema_long = ctx.compute('ema', length=long_length)
+    return ema_short, ema_long, crossover_signals(ema_short, ema_long)
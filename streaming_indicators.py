@@ -0,0 +1,132 @@
+import math
+
+from logzero import logger
+
+
+class StreamingEMA:
+    """
+    Exponential moving average updated one value at a time in O(1).
+
+    Matches pandas_ta.ema defaults: the first `length` values are averaged into
+    an SMA seed, after that ema = alpha * price + (1 - alpha) * ema with
+    alpha = 2 / (length + 1). The value is None until the seed is complete.
+    """
+
+    def __init__(self, length):
+        self.length = length
+        self.alpha = 2.0 / (length + 1)
+        self.count = 0
+        self._seed_sum = 0.0
+        self.value = None
+
+    def peek(self, price):
+        """Returns the EMA as if price were added, without changing the state."""
+        if self.value is not None:
+            return self.alpha * price + (1 - self.alpha) * self.value
+        if self.count + 1 == self.length:
+            return (self._seed_sum + price) / self.length
+        return None
+
+    def update(self, price):
+        """Adds a closed price and returns the new EMA value."""
+        self.value = self.peek(price)
+        if self.value is None:
+            self._seed_sum += price
+        self.count += 1
+        return self.value
+
+
+class _CrossoverState:
+    __slots__ = ('short', 'long', 'bar_time', 'close', 'signal')
+
+    def __init__(self, short_length, long_length):
+        self.short = StreamingEMA(short_length)
+        self.long = StreamingEMA(long_length)
+        self.bar_time = None   # time of the bar not yet folded into the EMAs
+        self.close = None
+        self.signal = 0
+
+
+class EmaCrossoverEngine:
+    """
+    Incremental EMA crossover signals for any number of symbols.
+
+    Keeps two StreamingEMA per symbol. The latest bar is held as pending so the
+    still-forming candle can be re-evaluated on every update; it is folded into
+    the EMAs once a newer bar arrives or it is reported as closed. Signals follow
+    ema_crossover_strategy: 1 when the short EMA is above the long one, -1 when
+    below and 0 otherwise. on_bar() returns an event only when the signal flips.
+    """
+
+    def __init__(self, short_length=3, long_length=30):
+        self.short_length = short_length
+        self.long_length = long_length
+        self._states = {}
+
+    def _state(self, symbol):
+        state = self._states.get(symbol)
+        if state is None:
+            state = self._states[symbol] = _CrossoverState(self.short_length, self.long_length)
+        return state
+
+    @staticmethod
+    def _signal(ema_short, ema_long):
+        if ema_short is None or ema_long is None or math.isnan(ema_short) or math.isnan(ema_long):
+            return 0
+        if ema_short > ema_long:
+            return 1
+        if ema_short < ema_long:
+            return -1
+        return 0
+
+    def on_bar(self, symbol, bar_time, close, closed=False):
+        """
+        Feeds the latest value of a bar and returns a crossover event dict or None.
+
+        Repeated calls with the same bar_time overwrite the forming bar. Bars
+        older than the pending one are ignored.
+        """
+        state = self._state(symbol)
+        if state.bar_time is not None and bar_time < state.bar_time:
+            return None
+        if state.bar_time is not None and bar_time > state.bar_time:
+            state.short.update(state.close)
+            state.long.update(state.close)
+
+        close = float(close)
+        if closed:
+            ema_short, ema_long = state.short.update(close), state.long.update(close)
+            state.bar_time, state.close = None, None
+        else:
+            ema_short, ema_long = state.short.peek(close), state.long.peek(close)
+            state.bar_time, state.close = bar_time, close
+
+        signal = self._signal(ema_short, ema_long)
+        if signal == state.signal:
+            return None
+        previous, state.signal = state.signal, signal
+        event = {
+            "symbol": symbol,
+            "time": bar_time,
+            "close": close,
+            "ema_short": ema_short,
+            "ema_long": ema_long,
+            "signal": signal,
+            "previous_signal": previous,
+        }
+        logger.debug(f"EMA crossover on {symbol} at {bar_time}: {previous} -> {signal}")
+        return event
+
+    def warm_up(self, symbol, data):
+        """Feeds a DataFrame of candles (indexed by date, with a close column) through the engine."""
+        event = None
+        for bar_time, close in zip(data.index, data['close'].to_numpy()):
+            event = self.on_bar(symbol, bar_time, close) or event
+        return event
+
+    def values(self, symbol):
+        """Returns (ema_short, ema_long, signal) including the forming bar."""
+        state = self._state(symbol)
+        if state.close is None:
+            return state.short.value, state.long.value, state.signal
+        return state.short.peek(state.close), state.long.peek(state.close), state.signal
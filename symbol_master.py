@@ -0,0 +1,253 @@
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from logzero import logger
+
+from http_utils import get_session
+from market_data import IST
+
+SYMBOL_MASTER_URL = "https://public.fyers.in/sym_details/{segment}.csv"
+DEFAULT_SEGMENTS = ("NSE_CM", "NSE_FO")
+
+# Positions of the columns used from the header-less Fyers symbol master CSVs
+CSV_COLUMNS = {
+    0: "fytoken",
+    3: "lot_size",
+    4: "tick_size",
+    8: "expiry",
+    9: "ticker",
+    13: "underlying",
+    15: "strike",
+    16: "option_type",
+}
+
+OPTION_CODES = {"CE": 1, "PE": -1}
+INDEX_COLUMNS = ("fytoken", "ticker", "underlying", "expiry", "strike", "option_code", "lot_size", "tick_size")
+
+
+def parse_symbol_master(path):
+    """Parses one symbol master CSV into a dict of NumPy columns."""
+    frame = pd.read_csv(path, header=None, usecols=list(CSV_COLUMNS), dtype={0: str, 9: str, 13: str, 16: str},
+                        low_memory=False).rename(columns=CSV_COLUMNS)
+    return {
+        "fytoken": frame['fytoken'].fillna('').to_numpy(dtype=str),
+        "ticker": frame['ticker'].fillna('').to_numpy(dtype=str),
+        "underlying": frame['underlying'].fillna('').to_numpy(dtype=str),
+        "expiry": pd.to_numeric(frame['expiry'], errors='coerce').fillna(0).to_numpy(dtype=np.int64),
+        "strike": pd.to_numeric(frame['strike'], errors='coerce').fillna(0).to_numpy(dtype=np.float64),
+        "option_code": frame['option_type'].map(OPTION_CODES).fillna(0).to_numpy(dtype=np.int8),
+        "lot_size": pd.to_numeric(frame['lot_size'], errors='coerce').fillna(0).to_numpy(dtype=np.int32),
+        "tick_size": pd.to_numeric(frame['tick_size'], errors='coerce').fillna(0).to_numpy(dtype=np.float64),
+    }
+
+
+class InstrumentIndex:
+    """
+    Columnar, sorted instrument index.
+
+    Rows are sorted by (underlying, expiry, strike, option type), so the rows of
+    one underlying are a contiguous slice found through a dict and everything
+    inside it is a binary search. The option rows of every (underlying,
+    expiry) chain and its distinct strikes are precomputed, so a strike window
+    around ATM costs two binary searches. Tickers and fytokens map to row
+    numbers through dicts.
+    """
+
+    def __init__(self, columns):
+        order = np.lexsort((columns['option_code'], columns['strike'], columns['expiry'], columns['underlying']))
+        self.columns = {name: np.ascontiguousarray(columns[name][order]) for name in INDEX_COLUMNS}
+        self._by_ticker = {ticker: row for row, ticker in enumerate(self.columns['ticker'].tolist())}
+        self._by_token = {token: row for row, token in enumerate(self.columns['fytoken'].tolist())}
+
+        underlying = self.columns['underlying']
+        starts = np.flatnonzero(np.r_[True, underlying[1:] != underlying[:-1]]) if len(underlying) else []
+        stops = np.r_[starts[1:], len(underlying)] if len(underlying) else []
+        self._slices = {underlying[start]: (int(start), int(stop)) for start, stop in zip(starts, stops)}
+
+        # (underlying, expiry) -> (start, stop, distinct strikes) of its option rows, which are
+        # contiguous because futures of the same expiry sort before them on strike
+        self._chains = {}
+        self._expiries = {}
+        options = np.flatnonzero(self.columns['option_code'] != 0)
+        if len(options):
+            keys_changed = ((underlying[options][1:] != underlying[options][:-1])
+                            | (self.columns['expiry'][options][1:] != self.columns['expiry'][options][:-1]))
+            chain_starts = np.r_[0, np.flatnonzero(keys_changed) + 1]
+            chain_stops = np.r_[chain_starts[1:], len(options)]
+            for chain_start, chain_stop in zip(chain_starts, chain_stops):
+                start, stop = int(options[chain_start]), int(options[chain_stop - 1]) + 1
+                key = (underlying[start], int(self.columns['expiry'][start]))
+                self._chains[key] = (start, stop, np.unique(self.columns['strike'][start:stop]))
+                self._expiries.setdefault(key[0], []).append(key[1])
+        self._expiries = {name: np.array(expiries, dtype=np.int64) for name, expiries in self._expiries.items()}
+
+    def __len__(self):
+        return len(self.columns['ticker'])
+
+    def __contains__(self, ticker):
+        return ticker in self._by_ticker
+
+    def row(self, row):
+        """The instrument at row number `row` as a dict."""
+        return {name: values[row].item() for name, values in self.columns.items()}
+
+    def get(self, ticker):
+        row = self._by_ticker.get(ticker)
+        return None if row is None else self.row(row)
+
+    def by_token(self, fytoken):
+        row = self._by_token.get(str(fytoken))
+        return None if row is None else self.row(row)
+
+    def rows(self, underlying):
+        """Row numbers of every instrument of `underlying` (equity, futures and options)."""
+        return np.arange(*self._slices.get(underlying, (0, 0)))
+
+    def expiries(self, underlying, after=None):
+        """Sorted option expiries (epoch seconds) of `underlying` that have not passed yet."""
+        after = time.time() if after is None else after
+        expiries = self._expiries.get(underlying, np.empty(0, dtype=np.int64))
+        return expiries[np.searchsorted(expiries, after):]
+
+    def options(self, underlying, expiry=None, spot=None, strikes=None, after=None):
+        """
+        Row numbers of the options of `underlying` for `expiry` (the nearest one by default).
+
+        With `spot` and `strikes`, only the `strikes` strikes either side of the
+        strike nearest to spot are returned.
+        """
+        if expiry is None:
+            upcoming = self.expiries(underlying, after)
+            if not len(upcoming):
+                return np.empty(0, dtype=np.int64)
+            expiry = upcoming[0]
+        chain = self._chains.get((underlying, int(expiry)))
+        if chain is None:
+            return np.empty(0, dtype=np.int64)
+        start, stop, unique_strikes = chain
+        if spot is None or strikes is None:
+            return np.arange(start, stop)
+
+        # Nearest listed strike to spot, then `strikes` listed strikes either side of it
+        atm = int(np.searchsorted(unique_strikes, spot))
+        if atm == len(unique_strikes) or (atm > 0 and spot - unique_strikes[atm - 1] <= unique_strikes[atm] - spot):
+            atm -= 1
+        low = unique_strikes[max(atm - strikes, 0)]
+        high = unique_strikes[min(atm + strikes, len(unique_strikes) - 1)]
+        chain_strikes = self.columns['strike'][start:stop]
+        return np.arange(start + int(np.searchsorted(chain_strikes, low, side='left')),
+                         start + int(np.searchsorted(chain_strikes, high, side='right')))
+
+    def frame(self, rows):
+        """The given rows as a DataFrame, expiry converted to an IST date."""
+        frame = pd.DataFrame({name: values[rows] for name, values in self.columns.items()})
+        frame['expiry_date'] = pd.to_datetime(frame['expiry'], unit='s', utc=True).dt.tz_convert(IST).dt.date
+        return frame
+
+
+class SymbolMaster:
+    """
+    Downloads the Fyers symbol master CSVs and keeps an InstrumentIndex over them.
+
+    Files are cached under `root`; a segment is checked at most once per IST
+    day with a conditional GET (ETag / Last-Modified) and only re-downloaded
+    when Fyers published a new file. The parsed columns are cached next to the
+    CSV as .npz, so later start-ups skip the CSV parse entirely.
+    """
+
+    def __init__(self, root='symbol_master', segments=DEFAULT_SEGMENTS):
+        self.root = root
+        self.segments = tuple(segments)
+        self.index = None
+        self._lock = threading.Lock()
+
+    def _paths(self, segment):
+        base = os.path.join(self.root, segment)
+        return base + '.csv', base + '.meta.json', base + '.npz'
+
+    def refresh(self, segment, force=False):
+        """Downloads `segment` if it changed since the last check, returns True if a new file was saved."""
+        csv_path, meta_path, _ = self._paths(segment)
+        meta = {}
+        if os.path.exists(meta_path):
+            with open(meta_path, 'r') as file:
+                meta = json.load(file)
+        today = str(datetime.now(IST).date())
+        if not force and os.path.exists(csv_path) and meta.get('checked') == today:
+            return False
+
+        headers = {}
+        if os.path.exists(csv_path) and not force:
+            if meta.get('etag'):
+                headers['If-None-Match'] = meta['etag']
+            if meta.get('last_modified'):
+                headers['If-Modified-Since'] = meta['last_modified']
+        response = get_session().get(SYMBOL_MASTER_URL.format(segment=segment), headers=headers, timeout=60)
+        changed = response.status_code == 200
+        if changed:
+            os.makedirs(self.root, exist_ok=True)
+            tmp_path = csv_path + '.tmp'
+            with open(tmp_path, 'wb') as file:
+                file.write(response.content)
+            os.replace(tmp_path, csv_path)
+            meta['etag'] = response.headers.get('ETag')
+            meta['last_modified'] = response.headers.get('Last-Modified')
+            logger.info(f"Symbol master {segment} downloaded ({len(response.content)} bytes).")
+        elif response.status_code != 304:
+            logger.error(f"Symbol master {segment} download failed: {response.status_code}")
+            return False
+        meta['checked'] = today
+        with open(meta_path, 'w') as file:
+            json.dump(meta, file)
+        return changed
+
+    def _columns(self, segment):
+        csv_path, _, npz_path = self._paths(segment)
+        if os.path.exists(npz_path) and os.path.getmtime(npz_path) >= os.path.getmtime(csv_path):
+            with np.load(npz_path) as cached:
+                return {name: cached[name] for name in INDEX_COLUMNS}
+        columns = parse_symbol_master(csv_path)
+        np.savez(npz_path, **columns)
+        return columns
+
+    def load(self, refresh=True):
+        """Refreshes (at most daily) and indexes every segment, returns the InstrumentIndex."""
+        with self._lock:
+            parts = []
+            for segment in self.segments:
+                if refresh:
+                    try:
+                        self.refresh(segment)
+                    except Exception as e:
+                        # Offline: fall back to the cached copy, if there is one
+                        logger.warning(f"Symbol master {segment} refresh failed: {e}")
+                if not os.path.exists(self._paths(segment)[0]):
+                    logger.error(f"No symbol master file for {segment}.")
+                    continue
+                parts.append(self._columns(segment))
+            columns = {name: np.concatenate([part[name] for part in parts]) if parts else np.empty(0)
+                       for name in INDEX_COLUMNS}
+            self.index = InstrumentIndex(columns)
+            logger.info(f"Symbol master loaded: {len(self.index)} instruments.")
+            return self.index
+
+    def validate(self, ticker):
+        """Raises ValueError if `ticker` is not a listed Fyers symbol."""
+        index = self.index or self.load()
+        if ticker not in index:
+            raise ValueError(f"Unknown Fyers symbol: {ticker}")
+        return ticker
+
+
+if __name__ == "__main__":
+    # python symbol_master.py NIFTY 24500 [strikes]
+    index = SymbolMaster().load()
+    underlying, spot = sys.argv[1], float(sys.argv[2])
+    strikes = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+    print(index.frame(index.options(underlying, spot=spot, strikes=strikes)).to_string())
@@ -0,0 +1,19 @@
+import pytest
+
+from backtest import run_backtest
+
+
+def test_flip_books_each_bar_to_the_position_held_over_it():
+    # Long 100 -> 120 (+20), flipped short at 120 and covered at 125 (-5)
+    summary, _ = run_backtest([100, 110, 120, 125, 125], [1, 1, -1, -1, 0], slippage_bps=0, brokerage=0)
+    assert summary['trades'] == 2
+    assert summary['win_rate'] == 0.5
+    assert summary['net_pnl'] == pytest.approx(15)
+
+
+def test_flip_exit_cost_goes_to_the_closed_trade():
+    # One order per bar: the flip order is the long's exit, so the +20 long pays 50 in brokerage
+    summary, _ = run_backtest([100, 110, 120, 100, 100], [1, 1, -1, -1, 0], slippage_bps=0, brokerage=25)
+    assert summary['trades'] == 2
+    assert summary['win_rate'] == 0.0
+    assert summary['net_pnl'] == pytest.approx(40 - 3 * 25)
@@ -0,0 +1,102 @@
+from order_manager import (ORDER_TYPE_LIMIT, SIDE_BUY, STATUS_CANCELLED, STATUS_FILLED, STATUS_REJECTED,
+                           MockBroker, OrderManager)
+
+INDEX = "NSE:NIFTYBANK-INDEX"
+FUTURE = "NSE:BANKNIFTY24JUNFUT"
+
+
+def make_manager(broker, quantity=10, **kwargs):
+    return OrderManager(broker, quantity=quantity, symbol_map={INDEX: FUTURE}, **kwargs)
+
+
+def test_signals_trade_the_mapped_symbol_and_reverse():
+    broker = MockBroker()
+    broker.set_price(FUTURE, 50000.0)
+    manager = make_manager(broker)
+
+    order = manager.on_signal({"symbol": INDEX, "signal": 1})
+    assert order['symbol'] == FUTURE and order['side'] * order['qty'] == 10
+    assert manager.reconcile() == 1
+    assert manager.positions == {FUTURE: 10}
+
+    order = manager.on_signal({"symbol": INDEX, "signal": -1})
+    assert order['side'] * order['qty'] == -20
+    manager.reconcile()
+    assert manager.positions == {FUTURE: -10}
+    assert manager.orders[order['id']]['status'] == STATUS_FILLED
+    # Trades already applied are not applied again
+    assert manager.reconcile() == 0
+
+
+def test_unmapped_index_signal_places_no_order():
+    broker = MockBroker()
+    manager = OrderManager(broker, quantity=10)
+    assert manager.on_signal({"symbol": INDEX, "signal": 1}) is None
+    assert broker.orderbook_entries == {}
+
+
+def test_rejection_after_ack_releases_working_quantity():
+    broker = MockBroker(reject_symbols=[FUTURE])
+    manager = make_manager(broker)
+
+    order = manager.on_signal({"symbol": INDEX, "signal": 1})
+    manager.reconcile()
+    assert manager.orders[order['id']]['status'] == STATUS_REJECTED
+
+    broker.reject_symbols.clear()
+    order = manager.on_signal({"symbol": INDEX, "signal": -1})
+    assert order['side'] * order['qty'] == -10
+    manager.reconcile()
+    assert manager.positions == {FUTURE: -10}
+
+
+def test_partial_fill_then_cancel():
+    broker = MockBroker()
+    manager = make_manager(broker)
+
+    order = manager.place(FUTURE, 10, SIDE_BUY, order_type=ORDER_TYPE_LIMIT, limit_price=49990.0)
+    broker.fill(order['id'], qty=4, price=49990.0)
+    manager.reconcile()
+    assert manager.positions == {FUTURE: 4}
+    assert order['filled_qty'] == 4 and order['avg_price'] == 49990.0
+    # The unfilled 6 still count towards the target position
+    assert manager.on_signal({"symbol": INDEX, "signal": 1}) is None
+
+    broker.cancel(order['id'])
+    manager.reconcile()
+    assert order['status'] == STATUS_CANCELLED
+    follow_up = manager.on_signal({"symbol": INDEX, "signal": 1})
+    assert follow_up['side'] * follow_up['qty'] == 6
+
+
+def test_sync_positions_adopts_broker_quantity():
+    broker = MockBroker()
+    manager = make_manager(broker)
+    manager.on_signal({"symbol": INDEX, "signal": 1})
+    manager.reconcile()
+
+    broker.net_positions[FUTURE] = 7  # e.g. squared off partly outside the manager
+    assert manager.sync_positions() == {FUTURE: (10, 7)}
+    assert manager.positions == {FUTURE: 7}
+
+
+def test_sync_positions_counts_unreconciled_fills_once():
+    broker = MockBroker()
+    manager = make_manager(broker)
+    # Filled at the broker but not reconciled yet
+    manager.on_signal({"symbol": INDEX, "signal": 1})
+
+    assert manager.sync_positions() == {}
+    assert manager.positions == {FUTURE: 10}
+    assert manager.on_signal({"symbol": INDEX, "signal": 1}) is None
+
+
+def test_sync_positions_skips_symbols_with_working_orders():
+    broker = MockBroker()
+    manager = make_manager(broker)
+    order = manager.place(FUTURE, 10, SIDE_BUY, order_type=ORDER_TYPE_LIMIT, limit_price=49990.0)
+    broker.fill(order['id'], qty=4)
+    broker.net_positions[FUTURE] = 99
+
+    manager.sync_positions()
+    assert manager.positions == {FUTURE: 4}
@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from strategy_utils import ema_crossover_strategy
+from streaming_indicators import EmaCrossoverEngine, StreamingEMA
+
+SYMBOL = "NSE:NIFTYBANK-INDEX"
+
+
+def make_bars(bars=300, seed=0):
+    rng = np.random.default_rng(seed)
+    index = pd.date_range("2024-01-01 09:15", periods=bars, freq="5min", tz="Asia/Kolkata")
+    # A slow sine on top of noise so the short and long EMAs cross several times
+    close = 45000 + 200 * np.sin(np.arange(bars) / 15) + np.cumsum(rng.normal(0, 5, bars))
+    return pd.DataFrame({"close": close}, index=index)
+
+
+def test_streaming_ema_matches_sma_seeded_ewm():
+    close = make_bars()['close'].to_numpy()
+    length = 10
+    ema = StreamingEMA(length)
+    values = [ema.update(price) for price in close]
+
+    # Warm-up: nothing until `length` values are in, then their SMA
+    assert values[:length - 1] == [None] * (length - 1)
+    assert values[length - 1] == pytest.approx(close[:length].mean())
+
+    # After the seed it is the adjust=False recurrence
+    expected = pd.Series(np.r_[close[:length].mean(), close[length:]]).ewm(span=length, adjust=False).mean()
+    np.testing.assert_allclose(values[length - 1:], expected.to_numpy(), rtol=1e-12)
+
+
+def test_engine_matches_batch_strategy_bar_by_bar():
+    data = make_bars()
+    batch = ema_crossover_strategy(data.copy())
+    engine = EmaCrossoverEngine(short_length=3, long_length=30)
+
+    events = []
+    for bar_time, close in zip(data.index, data['close']):
+        event = engine.on_bar(SYMBOL, bar_time, close, closed=True)
+        ema_short, ema_long, signal = engine.values(SYMBOL)
+        row = batch.loc[bar_time]
+        if np.isnan(row['EMA_Long']):
+            assert ema_long is None
+        else:
+            assert ema_short == pytest.approx(row['EMA_Short'], rel=1e-12)
+            assert ema_long == pytest.approx(row['EMA_Long'], rel=1e-12)
+        assert signal == row['Signal']
+        if event:
+            events.append(event)
+
+    # Events fire exactly on the bars where the batch signal changes
+    flips = batch['Signal'].diff().fillna(batch['Signal']).ne(0)
+    assert [event['time'] for event in events] == list(batch.index[flips])
+    assert len(events) > 2
+    for event in events:
+        assert event['signal'] == batch.loc[event['time'], 'Signal']
+
+
+def test_warm_up_seeds_engine_like_a_full_replay():
+    data = make_bars()
+    history, live = data.iloc[:200], data.iloc[200:]
+    batch = ema_crossover_strategy(data.copy())
+
+    engine = EmaCrossoverEngine(short_length=3, long_length=30)
+    engine.warm_up(SYMBOL, history)
+    # The last history bar is pending until a newer bar arrives
+    ema_short, ema_long, signal = engine.values(SYMBOL)
+    assert ema_long == pytest.approx(batch['EMA_Long'].iloc[199], rel=1e-12)
+    assert signal == batch['Signal'].iloc[199]
+
+    for bar_time, close in zip(live.index, live['close']):
+        engine.on_bar(SYMBOL, bar_time, close, closed=True)
+        ema_short, ema_long, signal = engine.values(SYMBOL)
+        assert ema_short == pytest.approx(batch.loc[bar_time, 'EMA_Short'], rel=1e-12)
+        assert ema_long == pytest.approx(batch.loc[bar_time, 'EMA_Long'], rel=1e-12)
+        assert signal == batch.loc[bar_time, 'Signal']
+
+
+def test_forming_bar_is_overwritten_not_accumulated():
+    data = make_bars(60)
+    batch = ema_crossover_strategy(data.copy())
+    engine = EmaCrossoverEngine(short_length=3, long_length=30)
+
+    for bar_time, close in zip(data.index, data['close']):
+        # Intra-bar updates with other prices must not leak into the EMAs
+        engine.on_bar(SYMBOL, bar_time, close + 50)
+        engine.on_bar(SYMBOL, bar_time, close - 50)
+        engine.on_bar(SYMBOL, bar_time, close)
+
+    ema_short, ema_long, _ = engine.values(SYMBOL)
+    assert ema_short == pytest.approx(batch['EMA_Short'].iloc[-1], rel=1e-12)
+    assert ema_long == pytest.approx(batch['EMA_Long'].iloc[-1], rel=1e-12)
@@ -0,0 +1,230 @@
+import json
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+from logzero import logger
+
+from market_data import RESOLUTION_SECONDS
+from market_feed import bar_start, parse_tick
+
+# One fixed-width record per tick, 40 bytes
+TICK_DTYPE = np.dtype([
+    ('epoch', np.float64),
+    ('symbol', np.uint32),
+    ('price', np.float64),
+    ('cum_volume', np.int64),
+    ('oi', np.int64),
+], align=True)
+
+
+def _symbols_path(path):
+    return path + '.symbols.json'
+
+
+class TickRecorder:
+    """
+    Append-only binary tick log.
+
+    Ticks are buffered in a preallocated TICK_DTYPE array and appended to
+    `path` as raw fixed-width records once `flush_every` are pending (and on
+    flush()/close()), so the file can be memory-mapped as-is by TickLog.
+    Symbols are stored as ids; the id -> symbol table lives next to it in
+    <path>.symbols.json, rewritten on flush when new symbols appeared.
+    Recording into an existing log appends to it.
+    """
+
+    def __init__(self, path, flush_every=4096):
+        self.path = path
+        self.symbols = []
+        if os.path.exists(_symbols_path(path)):
+            with open(_symbols_path(path), 'r') as file:
+                self.symbols = json.load(file)
+        self._ids = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self._buffer = np.zeros(flush_every, dtype=TICK_DTYPE)
+        self._pending = 0
+        self._symbols_dirty = False
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._file = open(path, 'ab')
+        self.recorded = 0
+
+    def record(self, symbol, price, epoch=None, cum_volume=None, oi=None):
+        with self._lock:
+            symbol_id = self._ids.get(symbol)
+            if symbol_id is None:
+                symbol_id = self._ids[symbol] = len(self.symbols)
+                self.symbols.append(symbol)
+                self._symbols_dirty = True
+            self._buffer[self._pending] = (time.time() if epoch is None else epoch, symbol_id, price,
+                                           -1 if cum_volume is None else cum_volume, oi or 0)
+            self._pending += 1
+            self.recorded += 1
+            if self._pending == len(self._buffer):
+                self._write()
+
+    def on_message(self, message):
+        """Records a raw Fyers data socket message, control messages are ignored."""
+        tick = parse_tick(message)
+        if tick is not None:
+            self.record(*tick)
+
+    def _save_symbols(self):
+        tmp_path = _symbols_path(self.path) + '.tmp'
+        with open(tmp_path, 'w') as file:
+            json.dump(self.symbols, file)
+        os.replace(tmp_path, _symbols_path(self.path))
+
+    def _write(self):
+        # The symbol table goes first, so every id in the file can be resolved
+        if self._symbols_dirty:
+            self._save_symbols()
+            self._symbols_dirty = False
+        self._file.write(self._buffer[:self._pending].tobytes())
+        self._pending = 0
+
+    def flush(self):
+        with self._lock:
+            if self._file.closed:
+                return
+            self._write()
+            self._file.flush()
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            self._file.close()
+
+
+class TickLog:
+    """
+    Read side of a TickRecorder file, memory-mapped and replayable.
+
+    replay_ticks() pushes every tick into an aggregator (anything with
+    on_tick/flush, e.g. CandleAggregator or RingBufferAggregator) in real time,
+    `speed` times faster or as fast as possible. replay_bars() builds the bars
+    of the whole log in one vectorized pass and calls on_bar(symbol,
+    resolution, bar) in bar-close order, the fast path for strategy tests.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(_symbols_path(path), 'r') as file:
+            self.symbols = json.load(file)
+        # A record cut short by a crash while recording is ignored
+        count = os.path.getsize(path) // TICK_DTYPE.itemsize
+        self.ticks = np.memmap(path, dtype=TICK_DTYPE, mode='r', shape=(count,)) if count else \
+            np.zeros(0, dtype=TICK_DTYPE)
+
+    def __len__(self):
+        return len(self.ticks)
+
+    def _pace(self, speed, start_wall, start_epoch, epoch):
+        if speed:
+            delay = (epoch - start_epoch) / speed - (time.perf_counter() - start_wall)
+            if delay > 0:
+                time.sleep(delay)
+
+    def replay_ticks(self, aggregator, speed=None, chunk_size=65536):
+        """Feeds every tick into `aggregator`, closing bars as the live flush thread would."""
+        if not len(self.ticks):
+            return
+        start_wall, start_epoch = time.perf_counter(), float(self.ticks['epoch'][0])
+        last_second = None
+        for offset in range(0, len(self.ticks), chunk_size):
+            chunk = self.ticks[offset:offset + chunk_size]
+            for epoch, symbol_id, price, cum_volume, oi in zip(chunk['epoch'].tolist(), chunk['symbol'].tolist(),
+                                                               chunk['price'].tolist(), chunk['cum_volume'].tolist(),
+                                                               chunk['oi'].tolist()):
+                self._pace(speed, start_wall, start_epoch, epoch)
+                # Bars only end on whole seconds, flushing once per second is enough
+                second = int(epoch)
+                if second != last_second:
+                    aggregator.flush(epoch)
+                    last_second = second
+                aggregator.on_tick(self.symbols[symbol_id], price, epoch,
+                                   None if cum_volume < 0 else cum_volume, oi or None)
+        aggregator.flush(float('inf'))
+
+    def bars(self, resolution):
+        """
+        All bars of `resolution` as a dict of arrays (symbol id, date, open, high, low, close, volume, oi).
+
+        Volume is the increase of each symbol's cumulative day volume between
+        ticks, as in the live aggregators.
+        """
+        seconds = RESOLUTION_SECONDS[str(resolution)]
+        ticks = self.ticks
+        symbol = ticks['symbol'].astype(np.int64)
+        price = ticks['price']
+
+        # Per-tick volume from the cumulative volume of the same symbol's previous tick
+        by_symbol = np.lexsort((np.arange(len(ticks)), symbol))
+        cum = ticks['cum_volume'][by_symbol]
+        previous = np.r_[-1, cum[:-1]]
+        delta = cum - previous
+        first_of_symbol = np.r_[True, symbol[by_symbol][1:] != symbol[by_symbol][:-1]]
+        delta[first_of_symbol | (delta < 0) | (cum < 0) | (previous < 0)] = 0
+        volume = np.empty_like(delta)
+        volume[by_symbol] = delta
+
+        start = bar_start(ticks['epoch'].astype(np.int64), seconds)
+        order = np.lexsort((np.arange(len(ticks)), start, symbol))
+        key_symbol, key_start = symbol[order], start[order]
+        bounds = np.flatnonzero(np.r_[True, (key_symbol[1:] != key_symbol[:-1]) | (key_start[1:] != key_start[:-1])])
+        lasts = np.r_[bounds[1:], len(order)] - 1
+        ordered_price = price[order]
+        return {
+            "symbol": key_symbol[bounds],
+            "date": key_start[bounds],
+            "open": ordered_price[bounds],
+            "high": np.maximum.reduceat(ordered_price, bounds),
+            "low": np.minimum.reduceat(ordered_price, bounds),
+            "close": ordered_price[lasts],
+            "volume": np.add.reduceat(volume[order], bounds),
+            "oi": ticks['oi'][order][lasts],
+        }
+
+    def replay_bars(self, resolutions, on_bar, speed=None):
+        """Calls on_bar(symbol, resolution, bar) for every bar of the log, ordered by bar end."""
+        if not len(self.ticks):
+            return 0
+        parts = []
+        for resolution in map(str, resolutions):
+            bars = self.bars(resolution)
+            bars['resolution'] = np.full(len(bars['date']), resolution, dtype=object)
+            bars['end'] = bars['date'] + RESOLUTION_SECONDS[resolution]
+            parts.append(bars)
+        merged = {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+        order = np.lexsort((merged['symbol'], merged['end']))
+        columns = ('date', 'open', 'high', 'low', 'close', 'volume', 'oi')
+        rows = zip(*(merged[name][order].tolist() for name in ('symbol', 'resolution', 'end') + columns))
+
+        start_wall, start_epoch = time.perf_counter(), float(self.ticks['epoch'][0])
+        for symbol_id, resolution, end, *values in rows:
+            self._pace(speed, start_wall, start_epoch, end)
+            on_bar(self.symbols[symbol_id], resolution, dict(zip(columns, values)))
+        return len(order)
+
+
+if __name__ == "__main__":
+    # python tick_recorder.py ticks.bin [resolution] -> replays the log through the EMA crossover as fast as possible
+    from streaming_indicators import EmaCrossoverEngine
+    import pandas as pd
+
+    log = TickLog(sys.argv[1])
+    resolution = sys.argv[2] if len(sys.argv) > 2 else '5'
+    engine = EmaCrossoverEngine()
+    signals = []
+
+    def on_bar(symbol, resolution, bar):
+        event = engine.on_bar(symbol, pd.Timestamp(bar['date'], unit='s', tz='Asia/Kolkata'), bar['close'], closed=True)
+        if event:
+            signals.append(event)
+
+    started = time.perf_counter()
+    count = log.replay_bars([resolution], on_bar)
+    logger.info(f"Replayed {len(log)} ticks into {count} bars and {len(signals)} signals "
+                f"in {time.perf_counter() - started:.2f}s")
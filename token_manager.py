@@ -0,0 +1,137 @@
+import base64
+import json
+import os
+import threading
+import time
+
+from logzero import logger
+
+from config_utils import load_config, save_auth_tokens
+
+
+def token_expiry(access_token):
+    """Returns the `exp` claim (epoch seconds) of a Fyers JWT access token, or None."""
+    try:
+        payload = access_token.split('.')[1]
+        payload += '=' * (-len(payload) % 4)
+        return json.loads(base64.urlsafe_b64decode(payload)).get('exp')
+    except Exception:
+        return None
+
+
+class TokenManager:
+    """
+    Caches the Fyers access token with its expiry in memory and in auth_tokens.json.
+
+    Startup only reads the token file, no API round-trip is made until a caller
+    asks for validate(). get_fyers() hands out one shared FyersModel; when the
+    token is refreshed the model's token and header are swapped in place, so
+    callers holding it keep working. start_auto_refresh() re-runs the
+    LoginToGenerateSession OTP/PIN/TOTP flow in a background thread
+    `refresh_margin` seconds before the token expires.
+    """
+
+    def __init__(self, config=None, token_file='auth_tokens.json', refresh_margin=600, log_path=None):
+        self.config = config if config is not None else load_config()
+        if not self.config or not (self.config.get('fyers') or {}).get('client_id'):
+            raise ValueError("Config is missing or has no fyers.client_id, check Config.yaml")
+        self.client_id = self.config['fyers']['client_id']
+        self.token_file = token_file
+        self.refresh_margin = refresh_margin
+        self.log_path = log_path if log_path is not None else os.getcwd()
+        self.auth_code = None
+        self._access_token = None
+        self.expires_at = None
+        self._fyers = None
+        self._lock = threading.RLock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.token_file):
+            logger.warning(f"Token file {self.token_file} not found, a login will be needed.")
+            return
+        with open(self.token_file, 'r') as file:
+            tokens = json.load(file)
+        self.auth_code = tokens.get('auth_code')
+        self._access_token = tokens.get('access_token')
+        self.expires_at = tokens.get('expires_at') or token_expiry(self._access_token or '')
+
+    def is_expired(self, margin=0):
+        """True when there is no token or it expires within `margin` seconds."""
+        if not self._access_token:
+            return True
+        if self.expires_at is None:
+            return False  # unknown expiry, rely on validate()
+        return time.time() + margin >= self.expires_at
+
+    @property
+    def access_token(self):
+        """The current access token, logging in synchronously first if it has expired."""
+        with self._lock:
+            if self.is_expired():
+                self.refresh()
+            return self._access_token
+
+    def refresh(self):
+        """Runs the full login flow, saves the new token and updates the shared FyersModel."""
+        # Deferred so processes with a valid cached token never import the login stack
+        from LoginToGenerateSession import generate_access_token
+
+        with self._lock:
+            logger.info("Refreshing Fyers access token...")
+            auth_code, access_token = generate_access_token(self.config)
+            self.auth_code = auth_code
+            self._access_token = access_token
+            self.expires_at = token_expiry(access_token)
+            save_auth_tokens(auth_code, access_token, file_path=self.token_file, expires_at=self.expires_at)
+            if self._fyers is not None:
+                self._fyers.token = access_token
+                self._fyers.header = f"{self.client_id}:{access_token}"
+            logger.info(f"Fyers access token refreshed, expires at {self.expires_at}.")
+            return access_token
+
+    def get_fyers(self):
+        """Returns the shared FyersModel, creating it on first use without any API call."""
+        with self._lock:
+            if self._fyers is None:
+                from fyers_apiv3 import fyersModel
+
+                self._fyers = fyersModel.FyersModel(client_id=self.client_id, is_async=False,
+                                                    token=self.access_token, log_path=self.log_path)
+            return self._fyers
+
+    def validate(self):
+        """Checks the token with a get_profile call, refreshing it if Fyers rejects it."""
+        profile = self.get_fyers().get_profile()
+        if profile.get('s') != 'ok':
+            logger.warning(f"Access token rejected ({profile.get('message')}), logging in again.")
+            self.refresh()
+            profile = self.get_fyers().get_profile()
+        return profile
+
+    def _refresh_loop(self):
+        while not self._stop.is_set():
+            if self.expires_at is None:
+                # Expiry unknown, the token is only replaced when validate() sees it rejected
+                if self._stop.wait(3600):
+                    return
+                continue
+            if self._stop.wait(max(self.expires_at - self.refresh_margin - time.time(), 0)):
+                return
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Background token refresh failed: {e}")
+                self._stop.wait(60)
+
+    def start_auto_refresh(self):
+        """Starts the background thread that refreshes the token before it expires."""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._refresh_loop, name="token-refresh", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()